@@ -0,0 +1,312 @@
+import argparse
+import base64
+import io
+import json
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rcon.rcon_client import SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE, SERVERDATA_RESPONSE_VALUE
+from utility.config import *
+
+SERVER_VERSION = "v0.3.11.1"
+
+
+class MockPalworld:
+    """
+    Game server state shared by the mock REST API and RCON server.
+      Every request waits 'latency' seconds plus up to 'jitter' more, then fails with
+      probability 'failure_rate'. A shutdown takes the server down after its wait time, a wrapper
+      'start' brings it back 'start_delay' seconds later, and a wrapper 'restart' does both at once.
+      While down, game requests get 503.
+      Counts every request by command and records when the server went down and came back up.
+    Args:
+        players (int): Players reported online.
+        save_delay (float): Seconds a 'save' takes.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, players=8, start_delay=1.0, save_delay=0.5,
+                 user=ADMIN_USER, password=ADMIN_PASS, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.players = [{"name": f"player{i}", "accountName": f"player{i}", "playerId": f"{i + 1:08X}" + "0" * 24,
+                         "userId": f"steam_7656119{i:010d}", "ip": "127.0.0.1", "ping": 30.0, "location_x": 0.0,
+                         "location_y": 0.0, "level": 10, "building_count": 0} for i in range(players)]
+        self.start_delay = start_delay
+        self.save_delay = save_delay
+        self.user = user
+        self.password = password
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.running = True
+        self.started_at = time.time()
+        self.requests = {}
+        self.failures = 0
+        # (time, "down" | "up") transitions
+        self.events = []
+        self.rest_server = None
+        self.rcon_server = None
+        # Open client connections, closed with the server so no keep-alive connection outlives it
+        self.connections = set()
+
+    def _delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.failure_rate
+        time.sleep(delay)
+        return fail
+
+    def _set_running(self, running):
+        with self.lock:
+            self.running = running
+            self.events.append((time.time(), "up" if running else "down"))
+            if running:
+                self.started_at = time.time()
+
+    def _later(self, delay, running):
+        timer = threading.Timer(delay, self._set_running, (running,))
+        timer.daemon = True
+        timer.start()
+
+    def handle(self, method, command, payload):
+        """
+        Runs one command against the mock state.
+        Returns:
+            tuple: (HTTP status, reply dict or None)
+        """
+        with self.lock:
+            self.requests[command] = self.requests.get(command, 0) + 1
+        if self._delay():
+            with self.lock:
+                self.failures += 1
+            return 500, {"message": "Injected failure"}
+        if command == "start" and method == "POST":
+            if not self.running:
+                self._later(self.start_delay, True)
+            return 200, None
+        if command == "restart" and method == "POST":
+            self._set_running(False)
+            self._later(self.start_delay, True)
+            return 200, None
+        if not self.running:
+            return 503, {"message": "Server is not running"}
+        if method == "GET":
+            if command == "info":
+                return 200, {"version": SERVER_VERSION, "servername": "Benchmark Server", "description": "",
+                             "worldguid": "0" * 32}
+            if command == "players":
+                return 200, {"players": self.players}
+            if command == "metrics":
+                return 200, {"serverfps": self.random.randint(55, 60), "currentplayernum": len(self.players),
+                             "serverframetime": round(self.random.uniform(16.0, 18.0), 2), "maxplayernum": 32,
+                             "uptime": int(time.time() - self.started_at), "days": 3}
+            if command == "settings":
+                return 200, {"Difficulty": "None", "DayTimeSpeedRate": 1.0, "ServerPlayerMaxNum": 32}
+            return 404, None
+        if command == "save":
+            time.sleep(self.save_delay)
+        elif command == "shutdown":
+            self._later(payload.get("waittime", 0), False)
+        elif command in ["stop", "force-stop"]:
+            self._set_running(False)
+        elif command == "kick" and not any(p["userId"] == payload.get("userid") for p in self.players):
+            return 400, {"message": "Player not found"}
+        elif command not in ["announce", "kick", "ban", "unban"]:
+            return 404, None
+        return 200, None
+
+    def rcon(self, line):
+        """
+        Returns:
+            str: Reply to one RCON command line.
+        """
+        name, _, argument = line.partition(" ")
+        rest_command = {"Info": "info", "ShowPlayers": "players", "Save": "save", "Broadcast": "announce",
+                        "KickPlayer": "kick", "BanPlayer": "ban", "UnBanPlayer": "unban", "Shutdown": "shutdown",
+                        "DoExit": "force-stop"}.get(name)
+        if rest_command is None:
+            return f"Unknown command: {name}"
+        payload = {"userid": argument}
+        if rest_command == "shutdown":
+            wait_time, _, message = argument.partition(" ")
+            payload = {"waittime": int(wait_time or 0), "message": message}
+        status, reply = self.handle("GET" if rest_command in ["info", "players"] else "POST", rest_command, payload)
+        if status != 200:
+            return (reply or {}).get("message", f"Error {status}")
+        if rest_command == "info":
+            return f"Welcome to Pal Server[{SERVER_VERSION}] Benchmark Server"
+        if rest_command == "players":
+            return "name,playeruid,steamid\n" + "".join(f"{p['name']},{p['playerId']},{p['userId']}\n"
+                                                         for p in reply["players"])
+        return f"{name} done."
+
+    def downtime(self):
+        """
+        Returns:
+            float: Seconds between the last 'down' and the following 'up', None if there was none.
+        """
+        with self.lock:
+            events = list(self.events)
+        for i in range(len(events) - 1, 0, -1):
+            if events[i][1] == "up" and events[i - 1][1] == "down":
+                return events[i][0] - events[i - 1][0]
+        return None
+
+    def serve(self, host=SERVER_IP, rest_port=REST_PORT, rcon_port=None):
+        """
+        Starts the REST API (and RCON, if 'rcon_port' is given) on background threads.
+          Port 0 picks a free port, see rest_address / rcon_address.
+        """
+        self.rest_server = ThreadingHTTPServer((host, rest_port), _rest_handler(self))
+        self.rest_server.daemon_threads = True
+        threading.Thread(target=self.rest_server.serve_forever, daemon=True).start()
+        if rcon_port is not None:
+            self.rcon_server = socketserver.ThreadingTCPServer((host, rcon_port), _rcon_handler(self))
+            self.rcon_server.daemon_threads = True
+            threading.Thread(target=self.rcon_server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def rest_address(self):
+        return self.rest_server.server_address
+
+    @property
+    def rcon_address(self):
+        return self.rcon_server.server_address
+
+    def close(self):
+        for server in [self.rest_server, self.rcon_server]:
+            if server:
+                server.shutdown()
+                server.server_close()
+        with self.lock:
+            connections, self.connections = self.connections, set()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _rest_handler(mock):
+    expected_auth = f'Basic {base64.b64encode(f"{mock.user}:{mock.password}".encode()).decode()}'
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Buffer the reply and flush it once per request: headers and body leave in one segment,
+        # so Nagle's algorithm and delayed ACKs never add 40 ms to a keep-alive request
+        wbufsize = io.DEFAULT_BUFFER_SIZE
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with mock.lock:
+                mock.connections.add(self.connection)
+
+        def finish(self):
+            super().finish()
+            with mock.lock:
+                mock.connections.discard(self.connection)
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            if data:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if self.headers.get("Authorization") != expected_auth:
+                self._reply(401, {"message": "Unauthorized"})
+                return
+            if not self.path.startswith("/v1/api/"):
+                self._reply(404, None)
+                return
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                self._reply(400, {"message": "Invalid JSON"})
+                return
+            self._reply(*mock.handle(method, self.path[len("/v1/api/"):], payload))
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+def _rcon_handler(mock):
+    class Handler(socketserver.StreamRequestHandler):
+        disable_nagle_algorithm = True
+
+        def _send(self, request_id, packet_type, body):
+            # Like the game server, split long replies into packets of at most 4096 bytes of body
+            data = body.encode()
+            for start in range(0, max(len(data), 1), 4096):
+                payload = struct.pack("<ii", request_id, packet_type) + data[start:start + 4096] + b"\x00\x00"
+                self.wfile.write(struct.pack("<i", len(payload)) + payload)
+
+        def handle(self):
+            authenticated = False
+            while True:
+                header = self.rfile.read(4)
+                if len(header) < 4:
+                    return
+                (size,) = struct.unpack("<i", header)
+                packet = self.rfile.read(size)
+                request_id, packet_type = struct.unpack("<ii", packet[:8])
+                body = packet[8:-2].decode("utf-8", errors="replace")
+                if packet_type == SERVERDATA_AUTH:
+                    authenticated = body == mock.password
+                    self._send(request_id if authenticated else -1, SERVERDATA_AUTH_RESPONSE, "")
+                elif authenticated and packet_type == SERVERDATA_RESPONSE_VALUE:
+                    # Mirrored, so clients can tell where a multi-packet reply ends
+                    self._send(request_id, SERVERDATA_RESPONSE_VALUE, "")
+                elif authenticated:
+                    self._send(request_id, SERVERDATA_RESPONSE_VALUE, mock.rcon(body))
+                else:
+                    return
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Palworld REST API and RCON server")
+    parser.add_argument("--host", default=SERVER_IP)
+    parser.add_argument("--rest-port", type=int, default=REST_PORT)
+    parser.add_argument("--rcon-port", type=int, default=RCON_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many more seconds, uniformly")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--start-delay", type=float, default=1.0)
+    parser.add_argument("--save-delay", type=float, default=0.5)
+    args = parser.parse_args()
+    server = MockPalworld(args.latency, args.jitter, args.failure_rate, args.players, args.start_delay,
+                          args.save_delay).serve(args.host, args.rest_port, args.rcon_port)
+    print(f"Mock Palworld server on {args.host}: REST {args.rest_port}, RCON {args.rcon_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.close()
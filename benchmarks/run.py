@@ -0,0 +1,295 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.mock_server import MockPalworld
+from benchmarks.synthetic_saves import pack_sav, write_save_tree
+from rcon.rcon_client import RconClient
+from utility import backup_catalog, compression, dedup_store, load_test, readiness, response_cache, retention, \
+    save_inspector
+from utility.config import *
+
+BENCHMARKS = ["startup", "commands", "load", "compression", "dedup", "retention", "downtime"]
+# Benchmarks that read a save directory
+SAVE_BENCHMARKS = ["compression", "dedup", "downtime"]
+
+
+def _check_port_free():
+    # run_command and the service control code talk to SERVER_IP:REST_PORT, never benchmark a real server
+    if readiness.tcp_probe(SERVER_IP, REST_PORT):
+        sys.exit(f"Something is already listening on {SERVER_IP}:{REST_PORT}, stop it before benchmarking.")
+
+
+def bench_startup(args, save_dir):
+    """
+    Wall time of short palworld_util.py invocations in a new interpreter, 'status' against the mock server on
+    SERVER_IP:REST_PORT. The bare interpreter is timed too, as the floor.
+    """
+    _check_port_free()
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "palworld_util.py")
+    runs = {"python": [sys.executable, "-c", "pass"], "help": [sys.executable, script, "--help"],
+            "status": [sys.executable, script, "--no-cache", "status"]}
+    results = {}
+    with MockPalworld(args.latency, args.jitter, args.failure_rate).serve(SERVER_IP, REST_PORT):
+        for name, command in runs.items():
+            latencies, errors = [], 0
+            for _ in range(args.startup_runs):
+                start_time = time.perf_counter()
+                if subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                    errors += 1
+                latencies.append(time.perf_counter() - start_time)
+            results[name] = dict(load_test.latency_summary(latencies), errors=errors)
+    return results
+
+
+def bench_commands(args, save_dir):
+    """
+    Latency of run_command for each read-only command, and of the same requests over RCON,
+    against the mock server on SERVER_IP:REST_PORT.
+    """
+    from utility.detect_api import run_command
+    _check_port_free()
+    response_cache.disable()
+    results = {}
+    with MockPalworld(args.latency, args.jitter, args.failure_rate).serve(SERVER_IP, REST_PORT, 0) as mock:
+        for command in ["info", "players", "metrics", "settings"]:
+            latencies, errors = [], 0
+            for _ in range(args.requests):
+                start_time = time.perf_counter()
+                if run_command(command) != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - start_time)
+            results[f"rest_{command}"] = dict(load_test.latency_summary(latencies), errors=errors)
+        client = RconClient(*mock.rcon_address, ADMIN_PASS)
+        try:
+            for command in ["Info", "ShowPlayers"]:
+                latencies = []
+                for _ in range(args.requests):
+                    start_time = time.perf_counter()
+                    client.execute(command)
+                    latencies.append(time.perf_counter() - start_time)
+                results[f"rcon_{command}"] = load_test.latency_summary(latencies)
+        finally:
+            client.close()
+    return results
+
+
+def bench_load(args, save_dir):
+    """
+    Throughput and latency of the default request mix from several threads, against a mock server on a free port.
+    """
+    with MockPalworld(args.latency, args.jitter, args.failure_rate).serve(SERVER_IP, 0) as mock:
+        report = load_test.run_load_test(duration=args.load_seconds, concurrency=args.concurrency,
+                                         interval=args.load_seconds, host=mock.rest_address[0],
+                                         port=mock.rest_address[1], seed=0)
+    return dict({"requests_per_s": report["requests_per_s"], "error_rate": report["error_rate"]},
+                **report["commands"])
+
+
+def bench_compression(args, save_dir):
+    """
+    Archive throughput and ratio of every available codec on the synthetic saves, and the time to verify each archive.
+    """
+    results = {}
+    output_dir = tempfile.mkdtemp(prefix="palworld_bench_")
+    try:
+        for codec in compression.available_codecs():
+            output_file = os.path.join(output_dir, f"bench{compression.CODEC_EXTENSIONS[codec]}")
+            stats = compression.compress_tree(save_dir, output_file, codec, workers=args.workers)
+            start_time = time.perf_counter()
+            problems = compression.verify_backup(output_file, stats.sha256)
+            results[codec] = {"level": stats.level, "mb_per_s": round(stats.bytes_per_second / 1e6, 1),
+                              "ratio": round(stats.bytes_out / stats.bytes_in, 4),
+                              "compress_s": round(stats.seconds, 3),
+                              "verify_s": round(time.perf_counter() - start_time, 3), "verified": not problems}
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def bench_dedup(args, save_dir):
+    """
+    Chunking throughput on the largest save file, and a dedup snapshot of the saves into an empty repository
+    followed by one after a change in the middle of Level.sav's world data, re-saved and recompressed the way
+    the game writes it.
+    """
+    files = [os.path.join(root, name) for root, _, names in os.walk(save_dir) for name in names]
+    largest = max(files, key=os.path.getsize)
+    start_time = time.perf_counter()
+    chunks = sum(1 for _ in dedup_store.iter_chunks(largest))
+    chunk_seconds = time.perf_counter() - start_time
+    results = {"chunk_mb_per_s": round(os.path.getsize(largest) / 1e6 / chunk_seconds, 1), "chunks": chunks}
+
+    work_dir = tempfile.mkdtemp(prefix="palworld_bench_")
+    try:
+        source = os.path.join(work_dir, "saves")
+        shutil.copytree(save_dir, source)
+        repo = os.path.join(work_dir, "repository")
+        start_time = time.perf_counter()
+        dedup_store.store_backup(source, repo, "first")
+        results["first_snapshot_s"] = round(time.perf_counter() - start_time, 3)
+        level = os.path.join(source, os.path.relpath(largest, save_dir))
+        gvas = io.BytesIO()
+        save_inspector.decompress_sav(level, gvas)
+        body = bytearray(gvas.getvalue())
+        body[len(body) // 2:len(body) // 2 + 7] = b"changed"
+        with open(level, "rb") as f:
+            twice = f.read(12)[11] == save_inspector.SAVE_TYPE_ZLIB_TWICE
+        with open(level, "wb") as f:
+            f.write(pack_sav(bytes(body), twice))
+        results["level_mb"] = round(os.path.getsize(level) / 1e6, 2)
+        start_time = time.perf_counter()
+        dedup_store.store_backup(source, repo, "second")
+        results["second_snapshot_s"] = round(time.perf_counter() - start_time, 3)
+        results["second_stored_mb"] = round(dedup_store.load_manifest(repo, "second")["stored"] / 1e6, 2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def bench_retention(args, save_dir):
+    """
+    Retention over 'args.archives' empty archives spread over the last months, from a directory listing
+    and through the catalog.
+    """
+    backups_dir = tempfile.mkdtemp(prefix="palworld_bench_")
+    try:
+        now = datetime.now().replace(microsecond=0)
+        for i in range(args.archives):
+            created = now - timedelta(minutes=30 * i)
+            open(os.path.join(backups_dir, f"Palworld_{created.strftime('%Y-%m-%d_%H-%M-%S')}.tar.gz"), "w").close()
+
+        start_time = time.perf_counter()
+        old = retention.select_old_backups(retention.list_archives(backups_dir))
+        listing_seconds = time.perf_counter() - start_time
+
+        conn = backup_catalog.open_catalog(backups_dir)
+        try:
+            start_time = time.perf_counter()
+            backup_catalog.rebuild_catalog(conn, backups_dir)
+            rebuild_seconds = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            for path in retention.select_old_backups(backup_catalog.list_backups(conn)):
+                backup_catalog.remove_backup(conn, path)
+            prune_seconds = time.perf_counter() - start_time
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(backups_dir, ignore_errors=True)
+    return {"archives": args.archives, "deleted": len(old), "select_from_listing_s": round(listing_seconds, 4),
+            "catalog_rebuild_s": round(rebuild_seconds, 4), "catalog_prune_s": round(prune_seconds, 4)}
+
+
+def bench_downtime(args, save_dir):
+    """
+    A full 'backup' (stop, snapshot, start, compress, verify, retention) of the synthetic saves, with the
+    server stopped and started through the mock's REST API. Downtime is measured by the mock, from the moment
+    it went down to the moment it answered again.
+    """
+    import palworld_util
+    _check_port_free()
+    response_cache.disable()
+    work_dir = tempfile.mkdtemp(prefix="palworld_bench_")
+    # Point the utility at the synthetic saves, and control the mock over the API rather than systemd
+    palworld_util.GAMESAVE_PATH = save_dir
+    palworld_util.BACKUPS_PATH = os.path.join(work_dir, "backups")
+    palworld_util.STAGING_PATH = os.path.join(work_dir, "staging")
+    palworld_util.BACKUP_FORMAT = "tar"
+    palworld_util.is_local = False
+    try:
+        with MockPalworld(args.latency, args.jitter, start_delay=args.start_delay).serve(SERVER_IP, REST_PORT) as mock:
+            start_time = time.perf_counter()
+            try:
+                succeeded = palworld_util.cold_backup()
+            except SystemExit:
+                succeeded = False
+            total_seconds = time.perf_counter() - start_time
+            downtime = mock.downtime()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"succeeded": bool(succeeded), "downtime_s": round(downtime, 3) if downtime is not None else None,
+            "total_s": round(total_seconds, 3), "start_delay_s": args.start_delay}
+
+
+def compare(results, baseline):
+    """
+    Returns:
+        list: (benchmark, metric, baseline value, current value, change in %) for every numeric metric in both.
+    """
+    changes = []
+    for name, section in results.items():
+        for key, value in section.items():
+            values = value.items() if isinstance(value, dict) else [(None, value)]
+            for metric, current in values:
+                previous = baseline.get(name, {}).get(key)
+                if metric is not None:
+                    previous = previous.get(metric) if isinstance(previous, dict) else None
+                if isinstance(current, bool) or not isinstance(current, (int, float)) \
+                        or not isinstance(previous, (int, float)) or not previous:
+                    continue
+                label = f"{key}.{metric}" if metric else key
+                changes.append((name, label, previous, current, (current - previous) / previous * 100))
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark palworld_util against a local mock server and "
+                                                 "synthetic saves")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)}. All by default")
+    parser.add_argument("--save-dir", help="Existing save directory to use instead of synthetic saves")
+    parser.add_argument("--level-mb", type=float, default=40, help="Size of the synthetic Level.sav")
+    parser.add_argument("--players", type=int, default=64, help="Players in the synthetic saves")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per command")
+    parser.add_argument("--startup-runs", type=int, default=20, help="Runs of each command in the startup benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Mock server latency jitter in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of mock requests that fail")
+    parser.add_argument("--load-seconds", type=float, default=10, help="Length of the load benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads in the load benchmark")
+    parser.add_argument("--start-delay", type=float, default=1.0, help="Seconds the mock server takes to start")
+    parser.add_argument("--archives", type=int, default=5000, help="Archives for the retention benchmark")
+    parser.add_argument("--workers", type=int, default=COMPRESSION_WORKERS)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark '{name}', choose from {', '.join(BENCHMARKS)}")
+
+    save_root = None
+    save_dir = args.save_dir
+    if save_dir is None and set(args.benchmarks or BENCHMARKS) & set(SAVE_BENCHMARKS):
+        save_root = tempfile.mkdtemp(prefix="palworld_bench_saves_")
+        save_dir = os.path.join(save_root, "0")
+        written = write_save_tree(save_dir, args.level_mb, args.players)
+        print(f"Synthetic saves: {written / 1e6:.1f} MB in {save_dir}")
+    results = {}
+    try:
+        for name in args.benchmarks or BENCHMARKS:
+            results[name] = globals()[f"bench_{name}"](args, save_dir)
+    finally:
+        if save_root:
+            shutil.rmtree(save_root, ignore_errors=True)
+
+    for name, section in results.items():
+        print(f"\n{name}")
+        for key, value in section.items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{k}={v}" for k, v in value.items())
+            print(f"  {key}: {value}")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print("\nChange from baseline")
+        for name, label, previous, current, change in compare(results, baseline):
+            print(f"  {name} {label}: {previous} -> {current} ({change:+.1f}%)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
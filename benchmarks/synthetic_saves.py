@@ -0,0 +1,181 @@
+import argparse
+import os
+import random
+import struct
+import uuid
+import zlib
+
+from utility.save_inspector import SAV_MAGIC, SAVE_TYPE_ZLIB, SAVE_TYPE_ZLIB_TWICE
+
+# Shape of a mid-sized dedicated server world
+DEFAULT_LEVEL_MB = 40
+DEFAULT_PLAYERS = 64
+DEFAULT_PALS = 3000
+DEFAULT_GUILDS = 20
+DEFAULT_BASES = 60
+
+PAL_SPECIES = ["SheepBall", "PinkCat", "ChickenPal", "Carbunclo", "Kitsunebi", "Penguin", "Anubis", "Jetragon"]
+
+
+def _fstring(text):
+    if not text:
+        return struct.pack("<i", 0)
+    data = text.encode() + b"\0"
+    return struct.pack("<i", len(data)) + data
+
+
+def _property(name, property_type, value, header=b""):
+    return _fstring(name) + _fstring(property_type) + struct.pack("<q", len(value)) + header + value
+
+
+def _none():
+    return _fstring("None")
+
+
+def _guid(name, raw):
+    return _property(name, "StructProperty", raw, _fstring("Guid") + b"\0" * 17)
+
+
+def _str(name, value):
+    return _property(name, "StrProperty", _fstring(value), b"\0")
+
+
+def _name(name, value):
+    return _property(name, "NameProperty", _fstring(value), b"\0")
+
+
+def _bool(name, value):
+    return _fstring(name) + _fstring("BoolProperty") + struct.pack("<q", 0) + bytes([value]) + b"\0"
+
+
+def _int(name, value):
+    return _property(name, "IntProperty", struct.pack("<i", value), b"\0")
+
+
+def _enum(name, enum, value):
+    return _property(name, "EnumProperty", _fstring(value), _fstring(enum) + b"\0")
+
+
+def _struct(name, struct_type, body):
+    return _property(name, "StructProperty", body, _fstring(struct_type) + b"\0" * 17)
+
+
+def _bytes(name, data):
+    return _property(name, "ArrayProperty", struct.pack("<I", len(data)) + data, _fstring("ByteProperty") + b"\0")
+
+
+def _map(name, entries):
+    body = struct.pack("<II", 0, len(entries)) + b"".join(entries)
+    return _property(name, "MapProperty", body, _fstring("StructProperty") + _fstring("StructProperty") + b"\0")
+
+
+def _blob(rng, size):
+    # Half repeated structure, half noise: roughly how well real save payloads compress
+    pattern = bytes(rng.randrange(256) for _ in range(64))
+    noise = rng.randbytes(size // 2)
+    return (pattern * (size // 128 + 1))[:size - len(noise)] + noise
+
+
+def _character(rng, index, player_uid, owner_uid, padding):
+    key = _guid("PlayerUId", player_uid) + _guid("InstanceId", uuid.UUID(int=rng.getrandbits(128)).bytes) \
+        + _str("DebugName", "") + _none()
+    if owner_uid is None:
+        params = _bool("IsPlayer", 1) + _str("NickName", f"player{index}")
+    else:
+        params = _name("CharacterID", rng.choice(PAL_SPECIES)) + _guid("OwnerPlayerUId", owner_uid)
+    params += _int("Level", rng.randint(1, 50))
+    if padding:
+        params += _bytes("SaveData", _blob(rng, padding))
+    raw = _struct("SaveParameter", "PalIndividualCharacterSaveParameter", params + _none()) + _none() \
+        + b"\0" * 20
+    return key + _bytes("RawData", raw) + _none()
+
+
+def _gvas(save_class, body):
+    header = b"GVAS" + struct.pack("<iii", 3, 522, 1009) + struct.pack("<HHHI", 5, 1, 1, 0) \
+        + _fstring("++UE5+Release-5.1") + struct.pack("<ii", 3, 0) + _fstring(save_class)
+    return header + body + _none() + b"\0" * 4
+
+
+def level_gvas(level_bytes, players, pals, guilds, bases, seed=0):
+    """
+    Builds an uncompressed Level.sav body whose character map holds 'players' players and 'pals'
+    pals, padded so the whole body is about 'level_bytes'.
+    """
+    rng = random.Random(seed)
+    # Matches the Players/<player id>.sav names written by write_save_tree
+    uids = [struct.pack("<4I", i + 1, 0, 0, 0) for i in range(players)]
+    padding = max(0, level_bytes // max(1, players + pals) - 400)
+    characters = [_character(rng, i, uid, None, padding) for i, uid in enumerate(uids)]
+    characters += [_character(rng, i, b"\0" * 16, rng.choice(uids) if uids else b"\0" * 16, padding)
+                   for i in range(pals)]
+    groups = [uuid.UUID(int=rng.getrandbits(128)).bytes
+              + _enum("GroupType", "EPalGroupType", "EPalGroupType::Guild" if i < guilds else "EPalGroupType::Neutral")
+              + _bytes("RawData", rng.randbytes(64)) + _none() for i in range(guilds + 3)]
+    camps = [uuid.UUID(int=rng.getrandbits(128)).bytes + _bytes("RawData", rng.randbytes(256)) + _none()
+             for _ in range(bases)]
+    world = _map("CharacterSaveParameterMap", characters) + _map("GroupSaveDataMap", groups) \
+        + _map("BaseCampSaveData", camps) + _none()
+    return _gvas("/Script/Pal.PalWorldSaveGame", _struct("worldSaveData", "PalWorldSaveData", world))
+
+
+def pack_sav(gvas, twice=True, level=1):
+    """
+    Wraps a GVAS body in the PlZ container Palworld writes.
+    """
+    compressed = zlib.compress(gvas, level)
+    if twice:
+        return struct.pack("<II", len(gvas), len(compressed)) + SAV_MAGIC + bytes([SAVE_TYPE_ZLIB_TWICE]) \
+            + zlib.compress(compressed, level)
+    return struct.pack("<II", len(gvas), len(compressed)) + SAV_MAGIC + bytes([SAVE_TYPE_ZLIB]) + compressed
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_save_tree(save_dir, level_mb=DEFAULT_LEVEL_MB, players=DEFAULT_PLAYERS, pals=DEFAULT_PALS,
+                    guilds=DEFAULT_GUILDS, bases=DEFAULT_BASES, seed=0):
+    """
+    Writes a save directory laid out like the server's SaveGames/0:
+      <world id>/Level.sav, LevelMeta.sav, WorldOption.sav and Players/<player id>.sav per player.
+    Args:
+        level_mb (float): Uncompressed size of Level.sav's GVAS body in MiB.
+    Returns:
+        int: Total bytes written.
+    """
+    rng = random.Random(seed)
+    world_dir = os.path.join(save_dir, uuid.UUID(int=rng.getrandbits(128)).hex.upper())
+    files = {
+        "Level.sav": pack_sav(level_gvas(int(level_mb * 1024 * 1024), players, pals, guilds, bases, seed)),
+        "LevelMeta.sav": pack_sav(_gvas("/Script/Pal.PalWorldBaseInfoSaveGame",
+                                        _str("WorldName", "Benchmark World"))),
+        "WorldOption.sav": pack_sav(_gvas("/Script/Pal.PalWorldOptionSaveGame", _bytes("OptionWorldData",
+                                                                                        _blob(rng, 2048)))),
+    }
+    for i in range(players):
+        player_id = f"{i + 1:08X}000000000000000000000000"
+        files[os.path.join("Players", f"{player_id}.sav")] = pack_sav(
+            _gvas("/Script/Pal.PalWorldPlayerSaveGame", _bytes("SaveData", _blob(rng, 16 * 1024))), twice=False)
+    total = 0
+    for name, data in files.items():
+        _write(os.path.join(world_dir, name), data)
+        total += len(data)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Palworld save directory")
+    parser.add_argument("save_dir")
+    parser.add_argument("--level-mb", type=float, default=DEFAULT_LEVEL_MB)
+    parser.add_argument("--players", type=int, default=DEFAULT_PLAYERS)
+    parser.add_argument("--pals", type=int, default=DEFAULT_PALS)
+    parser.add_argument("--guilds", type=int, default=DEFAULT_GUILDS)
+    parser.add_argument("--bases", type=int, default=DEFAULT_BASES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    written = write_save_tree(args.save_dir, args.level_mb, args.players, args.pals, args.guilds, args.bases,
+                              args.seed)
+    print(f"Wrote {written} bytes to {args.save_dir}")
@@ -1,16 +1,46 @@
+import argparse
+import atexit
+import json
 import math
 import os
 import re
+import shutil
 import subprocess
 import sys
 import time
-from datetime import datetime, timedelta
-
-import psutil
+from datetime import datetime
 
 from utility.config import *
-from utility.detect_api import run_command
-from utility.logging_config import setup_logger, log_error, log_info, os_platform
+from utility.lazy_import import lazy_import
+from utility.logging_config import log_error, log_info, log_progress, os_platform
+
+# Loaded on first use, so each command only imports what it needs: a status check never loads
+# psutil, the compression codecs or the asyncio daemon
+psutil = lazy_import("psutil")
+tarfile = lazy_import("tarfile")
+tempfile = lazy_import("tempfile")
+async_client = lazy_import("utility.async_client")
+backup_catalog = lazy_import("utility.backup_catalog")
+compression = lazy_import("utility.compression")
+daemon = lazy_import("utility.daemon")
+daemon_client = lazy_import("utility.daemon_client")
+dedup_store = lazy_import("utility.dedup_store")
+detect_api = lazy_import("utility.detect_api")
+fleet = lazy_import("utility.fleet")
+hot_backup = lazy_import("utility.hot_backup")
+load_test = lazy_import("utility.load_test")
+metrics_exporter = lazy_import("utility.metrics_exporter")
+player_tracker = lazy_import("utility.player_tracker")
+readiness = lazy_import("utility.readiness")
+response_cache = lazy_import("utility.response_cache")
+restore = lazy_import("utility.restore")
+retention = lazy_import("utility.retention")
+save_inspector = lazy_import("utility.save_inspector")
+snapshot = lazy_import("utility.snapshot")
+systemd_dbus = lazy_import("utility.systemd_dbus")
+telemetry = lazy_import("utility.telemetry")
+throttle = lazy_import("utility.throttle")
+tiering = lazy_import("utility.tiering")
 
 game_path = None
 backups_path = None
@@ -54,6 +84,22 @@ def set_backup_dir():
     return backups_path
 
 
+def set_staging_dir():
+    if os_platform != 'win32':
+        staging_path = STAGING_PATH
+    else:
+        staging_path = os.path.join(os.getenv('TEMP'), 'Palworld_staging')
+    return staging_path
+
+
+def set_repo_dir():
+    if os_platform != 'win32':
+        repo_path = DEDUP_REPO_PATH
+    else:
+        repo_path = os.path.join(set_backup_dir(), 'Palworld_repository')
+    return repo_path
+
+
 def set_gamesave_dir():
     global game_path
     if os_platform != 'win32':
@@ -106,80 +152,122 @@ def convert_size(size_bytes):
     return "%s %s" % (s, size_name[i])
 
 
-# Function to calculate average backup size, skipping the most recent backup
-def calculate_average_backup_size(backup_dir):
-    backup_files = [os.path.join(backup_dir, f) for f in os.listdir(backup_dir)
-                    if f.startswith("Palworld_") and f.endswith(".tar.gz")]
-    if not backup_files:
-        return 0
-    # Sort files by creation time oldest first
-    backup_files.sort(key=os.path.getctime)
-    # Skip the most recent backup (last in the list)
-    backup_files = backup_files[:-1]
-    # Calculate total size of backups (excluding the most recent one)
-    total_size = sum(os.path.getsize(f) for f in backup_files)
-    # Calculate average size
-    average_size = total_size / len(backup_files) if len(backup_files) > 0 else 0
-    return average_size
-
-
 # Function to check available disk space
-def check_disk_space():
-    if os_platform != 'win32':
-        statvfs = os.statvfs(GAMESAVE_PATH)
-        free_space = statvfs.f_frsize * statvfs.f_bfree
-    else:
-        usage = psutil.disk_usage(os.getenv('USERPROFILE'))
-        free_space = usage.free
-    return free_space
-
+def check_disk_space(path=None):
+    """
+    Returns:
+        int: Bytes available to this user on the filesystem holding 'path', the backups folder by default.
+    """
+    return psutil.disk_usage(path or set_backup_dir()).free
 
-# Function to calculate expected backup size
-def expected_backup_size(backup_dir):
-    backup_files = [os.path.join(backup_dir, f) for f in os.listdir(backup_dir)
-                    if f.startswith("Palworld_") and f.endswith(".tar.gz")]
-    if not backup_files:
-        return 0
 
-    # Sort files by creation time oldest first
-    backup_files.sort(key=os.path.getctime)
+def estimate_backup_size(source, backup_dir, codec=None):
+    """
+    Predicts the next archive's size from the current size of the save files and the compression
+    ratio of earlier backups, so a growing world is accounted for.
+    Returns:
+        int: Expected archive size in bytes.
+    """
+    conn = backup_catalog.open_catalog(backup_dir)
+    try:
+        # Without history assume no gain: the .sav files are already compressed
+        ratio = backup_catalog.average_ratio(conn, codec) or backup_catalog.average_ratio(conn) or 1.0
+    finally:
+        conn.close()
+    return int(compression.tree_size(source) * ratio)
 
-    # Skip the most recent backup (last in the list)
-    backup_files = backup_files[:-1]
 
-    # Calculate total size, in bytes, of backups (excluding the most recent one)
-    total_size = sum(os.path.getsize(f) for f in backup_files)
+def preflight_backup(source, backup_dir, codec=None):
+    """
+    Checks there is room for the next backup on the backups filesystem, keeping DISK_RESERVE_BYTES free.
+    Args:
+        codec (str): Codec the archive will use, None to use the ratio of every earlier backup.
+    Returns:
+        boolean: True if there is enough space.
+    """
+    # Dedup backups only store changed chunks, the reserve is all that can be checked up front
+    expected = estimate_backup_size(source, backup_dir, codec) if BACKUP_FORMAT != "dedup" else 0
+    required = int(expected * DISK_SPACE_MARGIN) + DISK_RESERVE_BYTES
+    free_space = check_disk_space(backup_dir)
+    if free_space < required:
+        log_error(f"Not enough free space for a new backup: {convert_size(free_space)} free in {backup_dir}, "
+                  f"{convert_size(required)} needed.", bytes=required)
+        return False
+    return True
 
-    # Calculate average size
-    expected_size = total_size / len(backup_files) if len(backup_files) > 0 else 0
 
-    return expected_size
+def server_metrics():
+    """
+    Returns:
+        dict: The server's 'metrics' reply, None if it could not be fetched.
+    """
+    result = detect_api.execute("metrics", request_timeout=2)
+    return result.data if result.ok else None
 
 
-def compress_backup(input_folder, output_file):
+def compress_backup(input_folder, output_file, codec="gzip", level=None, throttled=False):
+    """
+    Args:
+        throttled (bool): The server is running. Compress at idle priority on THROTTLE_WORKERS threads,
+          within the THROTTLE_* bandwidth caps, backing off when the server's FPS drops.
+    Returns:
+        CompressionStats: Sizes, throughput and checksum of the archive. False on failure.
+    """
     log_info("Starting Palworld backup.")
     try:
-        subprocess.run(["tar", "-czf", output_file, "-C", input_folder, "."],
-                       text=True, check=True, capture_output=True
-                       )
-        # Output the result (stdout and stderr)
-        log_info(f"Backup created: {output_file}")
-        return True
-    except FileNotFoundError:
-        log_error("Error: 'tar' executable not found. Please ensure it is installed.")
-        sys.exit(1)  # Exit with status code 1 indicating an error
-    except subprocess.CalledProcessError as e:
-        log_error(f"Abort: Tar process failed with error: {e}")
+        if throttled:
+            stats = throttle.compress_online(input_folder, output_file, codec, level, server_metrics,
+                                             min_free=DISK_RESERVE_BYTES)
+        else:
+            stats = compression.compress_tree(input_folder, output_file, codec, level, COMPRESSION_WORKERS,
+                                              min_free=DISK_RESERVE_BYTES)
+        log_progress("backup", "compressed", f"Backup created: {output_file} ({convert_size(stats.bytes_out)}, "
+                     f"{convert_size(stats.bytes_per_second)}/s)", codec=codec, bytes=stats.bytes_out,
+                     duration=round(stats.seconds, 3))
+        return stats
+    except compression.TornReadError:
+        # Hot backups retry on this, let the caller decide
+        raise
+    except ValueError as e:
+        log_error(f"Abort: {e}")
+        return False
+    except OSError as e:
+        log_error(f"Abort: Compression failed with error: {e}")
         return False
     except Exception as e:
         log_error(f"Unexpected error: {e}")
         return False
 
 
+def select_codec(input_folder, backups_path):
+    """
+    Returns:
+        tuple: (codec, level) from the config. For "auto", the best ratio that fits DOWNTIME_BUDGET according
+          to the codec benchmark cached in the catalog of 'backups_path'.
+    """
+    if COMPRESSION_CODEC == "auto":
+        conn = backup_catalog.open_catalog(backups_path)
+        try:
+            results = backup_catalog.benchmark_results(conn, input_folder, CODEC_BENCHMARK_HOURS * 3600,
+                                                       COMPRESSION_WORKERS)
+        finally:
+            conn.close()
+        return compression.choose_codec(input_folder, DOWNTIME_BUDGET, results=results)
+    return COMPRESSION_CODEC, COMPRESSION_LEVEL
+
+
 # Function to start the Palworld service
 def start_service(timeout=10):
-    log_info("Starting Palworld service.", end="")
+    log_progress("start", "begin", "Starting Palworld service.")
     if is_local:
+        dbus_result = systemd_dbus.control_unit("start", SERVICE_NAME, timeout)
+        if dbus_result is not None:
+            started, detail = dbus_result
+            if started:
+                log_progress("start", "done", "Palworld service started successfully.")
+            else:
+                log_progress("start", "failed", f"Palworld service failed to start: {detail}")
+            return started
         try:
             result = subprocess.run(['sudo', 'systemctl', 'start', SERVICE_NAME],
                                     text=True, check=True, capture_output=True
@@ -191,30 +279,29 @@ def start_service(timeout=10):
                 else:
                     log_error("Palworld service failed to start (status check).")
             else:
-                log_error(f"\nPalworld service failed to start.")
+                log_error(f"Palworld service failed to start.")
         except subprocess.TimeoutExpired:
             # Handle timeout
             result.kill()
             stdout, stderr = result.communicate()
-            log_error(f"\nStarting Palworld service timed out: %s", stderr)
+            log_error(f"Starting Palworld service timed out: {stderr}")
 
         except Exception as e:
             # Handle other exceptions
-            log_error(f"\nAn unexpected error occurred: %s", str(e))
+            log_error(f"An unexpected error occurred: {e}")
     else:
-        cmd_result = run_command("start", timeout=timeout)
-        if cmd_result:
+        cmd_result = detect_api.execute("start", timeout=timeout)
+        if cmd_result.ok:
             if check_if_running(timeout=timeout, expect_running=True):  # True if the server is in expected state
                 return True
             else:
                 # server did not start
-                log_error(f"\nStart command failed.")
+                log_error(f"Start command failed.")
                 return False
         else:
-            from utility.detect_api import data
-            log_error(f"\nRemote start command failed: {data}")
+            log_error(f"Remote start command failed: {cmd_result.data or cmd_result.error}")
             return False
-    log_info(f"\nPalworld service started successfully.")
+    log_progress("start", "done", "Palworld service started successfully.")
 
 
 # Function to restart the Palworld service
@@ -227,10 +314,17 @@ def restart_service(timeout):
         boolean: True, after the save finishes.
     """
     if save_world():
-        log_info("Restarting Palworld server ", end="")
         if is_local:
-            log_info("locally.")
+            log_progress("restart", "begin", "Restarting Palworld server locally.")
             if check_if_running(expect_running=True):  # True if the server running
+                dbus_result = systemd_dbus.control_unit("restart", SERVICE_NAME, timeout)
+                if dbus_result is not None:
+                    restarted, detail = dbus_result
+                    if restarted:
+                        log_progress("restart", "done", "Palworld restart is complete.")
+                    else:
+                        log_error(f"Error restarting Palworld service: {detail}")
+                    return restarted
                 result = subprocess.Popen(['sudo', 'systemctl', 'restart', SERVICE_NAME],
                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
                 try:
@@ -240,31 +334,31 @@ def restart_service(timeout):
                         service_status = subprocess.run(['systemctl', 'is-active', SERVICE_NAME],
                                                         capture_output=True, text=True)
                         if service_status.stdout.strip() == 'active':
-                            log_info("Palworld restart is complete.")
-                        else:
-                            log_error("Failed to verify Palworld server is running.")
+                            log_progress("restart", "done", "Palworld restart is complete.")
+                            return True
+                        log_error("Failed to verify Palworld server is running.")
                     else:
                         log_error(f"Error restarting Palworld service: {stderr.decode()}")
                 except subprocess.TimeoutExpired:
                     result.kill()
                     stdout, stderr = result.communicate()
                     log_error(f"Palworld service restart timed out: {stderr.decode()}")
+                return False
             else:
                 log_info("Server is not running.")
         else:
-            log_info("remotely.")
-            cmd_result = run_command("restart", timeout=timeout)
-            if cmd_result:
+            log_progress("restart", "begin", "Restarting Palworld server remotely.")
+            cmd_result = detect_api.execute("restart", timeout=timeout)
+            if cmd_result.ok:
                 if check_if_running(timeout=timeout, expect_running=False):  # True if the server is in expected state
-                    log_info("Palworld restart is complete.")
+                    log_progress("restart", "done", "Palworld restart is complete.")
                     return True
                 else:
                     # server did not start
                     log_error(f"Restart command failed.")
                     return False
             else:
-                from utility.detect_api import data
-                log_error(f"Remote restart command failed with errors:\n{data}")
+                log_error(f"Remote restart command failed with errors:\n{cmd_result.data or cmd_result.error}")
                 return False
 
 
@@ -277,7 +371,7 @@ def save_world():
     """
     if check_if_running(expect_running=True, timeout=30):  # False if server is NOT running
         log_info("Saving Palworld world.")
-        if not run_command("save") == 200:
+        if not detect_api.run_command("save") == 200:
             sys.exit("Error sending save command.")
         else:
             log_info("Game was saved.")
@@ -287,34 +381,42 @@ def save_world():
         return True
 
 
+def count_players():
+    """
+    Returns:
+        int: Number of players currently logged in, None if the server could not be asked.
+    """
+    global num_players
+    response = detect_api.execute("players")
+    if not response.ok:
+        log_error(f"Failed to retrieve player data: {response.error or response.status}")
+        return None
+    players = response.data.get('players', [])
+    player_tracker.default_tracker().update(players)
+    num_players = len(players)
+    return num_players
+
+
 # Function to handle the shutdown logic
-def online_players(max_duration_seconds):
+def online_players(max_duration_seconds, interval=60):
     """
-    Every second, returns the number of players currently logged in, for (n) seconds.
-    Exits immediately if no players are online.
+    Polls the number of players logged in every 'interval' seconds, until nobody is online
+    or for at most (n) seconds.
     Args:
         max_duration_seconds (int): The maximum time to poll for the status.
+        interval (int): Seconds between polls.
     Returns:
-        int: Number of players.
+        int: Number of players online at the last poll, None if the server could not be asked.
     """
-    start_time = time.time()
-    end_time = start_time + max_duration_seconds
-    global num_players
-
-    while time.time() < end_time:
-        response = run_command("players")
-        if response:
-            from utility.detect_api import data
-            if response == 200 and data:
-                num_players = len(data.get('players', []))
-            else:
-                log_error("Failed to retrieve player data.")
-        else:
-            log_error("rcon error")
-            sys.exit(1)
-        time.sleep(60)  # Check every minute
-    log_info("Maximum duration reached. Giving up until next interval.")
-    return False
+    end_time = time.monotonic() + max_duration_seconds
+    while True:
+        players = count_players()
+        if not players:
+            return players
+        if time.monotonic() + interval > end_time:
+            log_info("Maximum duration reached. Giving up until next interval.")
+            return players
+        time.sleep(interval)
 
 
 # Function to shut down the server
@@ -326,23 +428,31 @@ def stop_service(wait_time):
     Returns:
         boolean: True if the server is stopped.
     """
-    log_info("Shutting down Palworld server.", end="")
+    log_progress("stop", "begin", "Shutting down Palworld server.")
     if check_if_running(expect_running=True, timeout=2):
         if is_local:
+            dbus_result = systemd_dbus.control_unit("stop", SERVICE_NAME, wait_time)
+            if dbus_result is not None:
+                stopped, detail = dbus_result
+                if stopped:
+                    log_progress("stop", "done", "Palworld stopped successfully.")
+                else:
+                    log_error(f"Error shutting down Palworld service: {detail}")
+                return stopped
             response = subprocess.run(['sudo', 'systemctl', 'stop', SERVICE_NAME],
                                       capture_output=True, text=True)
             try:
                 if response.returncode == 0:
                     # Check service status
                     if check_if_running(timeout=10, expect_running=False):  # True if the server is not running.
-                        log_info("Palworld stopped successfully.")
+                        log_progress("stop", "done", "Palworld stopped successfully.")
                         return True
                     else:
                         # server did not start
                         log_error(f"Palworld failed to stop in time.")
                         return False
                 else:
-                    log_error(f"Error shutting down Palworld service: {response.stderr.decode()}")
+                    log_error(f"Error shutting down Palworld service: {response.stderr}")
                     return False
             except subprocess.TimeoutExpired:
                 response.kill()
@@ -351,10 +461,10 @@ def stop_service(wait_time):
         else:
             # Separate the palworld shutdown command wait_time from the script's timeout.
             palworld_wait_time = 1
-            response = run_command("shutdown", palworld_wait_time, "shutdown")
+            response = detect_api.run_command("shutdown", palworld_wait_time, "shutdown")
             if response == 200:
                 if check_if_running(timeout=wait_time, expect_running=False):  # True if the server is in expected state
-                    log_info(f"\nServer shutdown successful.")
+                    log_progress("stop", "done", "Server shutdown successful.")
                     return True
                 else:
                     sys.exit(f'Unexpected response sending shutdown command.')
@@ -364,13 +474,26 @@ def stop_service(wait_time):
 
 
 def kill_service():
+    """
+    Forcefully stops the Palworld service.
+    Returns:
+        boolean: True if the server was killed.
+    """
     if is_local:
-        # TODO: verify successful output from command
-        subprocess.Popen(['sudo', 'systemctl', 'kill', 'palworld.service'])
+        dbus_result = systemd_dbus.control_unit("kill", SERVICE_NAME)
+        if dbus_result is None:
+            result = subprocess.run(['sudo', 'systemctl', 'kill', '--signal=SIGKILL', SERVICE_NAME],
+                                    capture_output=True, text=True)
+            dbus_result = (result.returncode == 0, result.stderr.strip())
+        killed, detail = dbus_result
+        if not killed:
+            log_error(f"Failed to kill Palworld service: {detail}")
+        return killed
     else:
-        # TODO: add remote kill capability
-        1 == 1
-    return True
+        result = detect_api.execute("force-stop")
+        if not result.ok:
+            log_error(f"Remote force-stop command failed: {result.data or result.error}")
+        return result.ok
 
 
 # Function to wait for service to stop
@@ -384,30 +507,32 @@ def check_if_running(expect_running, timeout=10):
     Returns:
         bool: Will become True if the server is in the expected state within the timeout, False otherwise.
     """
-    # TODO: This command should eventually produce no visible output
-    #   true/false/fail for current status
-    end_time = time.time() + timeout
-    while time.time() < end_time:
-        # TODO: If this remote command returns an error, handle gracefully
-        #   this code expects any error are squashed
-        status = run_command("status")
-        # successful 'status' should be "200"
-        if (status == 200 and expect_running) or (status != 200 and not expect_running):
-            return True
-        else:
-            time.sleep(1)
-            continue
-        #log_info(".", end="")
-        # loop should continue for next interval
-    return False
+    result = readiness.wait_for_state(expect_running, timeout)
+    if result.reached and result.attempts > 1:
+        log_info(f"Server {'started' if expect_running else 'stopped'} after {result.elapsed:.2f} seconds.")
+    return result.reached
 
 
-def backup_process():
+def backup_process(hot=False, source=None):
+    """
+    Creates a backup and applies the retention policy.
+    Args:
+        hot (bool): True if the server is still running. The save files are read once they stop
+          changing, and a backup that sees a file change is retried instead of kept.
+        source (str): Staging copy to back up instead of the save directory. The server has
+          already been restarted, so it is not started again on failure.
+    """
     global game_path
     global backups_path
 
-    # Check folder presence and free space
-    game_path = set_gamesave_dir()
+    # The server only needs starting on failure if it was stopped for this backup
+    server_stopped = not hot and source is None
+    # Otherwise it is running, keep out of its way
+    throttled = THROTTLE_ONLINE_BACKUPS and not server_stopped
+    start_time = time.monotonic()
+
+    # Check folder presence
+    game_path = source or set_gamesave_dir()
     if not check_folders(game_path, "r"):
         sys.exit(1)
 
@@ -415,98 +540,634 @@ def backup_process():
     if not check_folders(backups_path, "w"):
         sys.exit(1)
 
-    # Calculate expected backup size
-    average_backup_size = calculate_average_backup_size(set_backup_dir())
-    required_space = 2 * average_backup_size
-
-    if not check_disk_space() >= required_space:
-        log_error("Not enough free space for a new backup.")
-        return
+    # Check free space against the predicted archive size
+    codec, level = select_codec(game_path, backups_path) if BACKUP_FORMAT != "dedup" else (None, None)
+    if not preflight_backup(game_path, backups_path, codec):
+        return False
 
     # Perform backup
-    backup_file = os.path.join(backups_path, f"Palworld_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.tar.gz")
-    tar_results = compress_backup(game_path, backup_file)
-    if not tar_results:
-        # Error compressing file
-        start_service(10)
-        exit(1)
-    # Initialize variables
-    paths_to_delete = []  # Initialize paths_to_delete list
-    current_date = datetime.now()
-    backups_by_day = {}
-
-    # Organize backups by date using filename date
-    for file in os.listdir(backups_path):
-        if file.startswith("Palworld_") and file.endswith(".tar.gz"):
-            file_path = os.path.join(backups_path, file)
-            match = re.search(r"Palworld_(\d{4}-\d{2}-\d{2})_\d{2}-\d{2}-\d{2}.tar.gz", file)
-            if match:
-                date_str = match.group(1)
-                if date_str not in backups_by_day:
-                    backups_by_day[date_str] = []
-                backups_by_day[date_str].append(
-                    (datetime.strptime(match.group(0), "Palworld_%Y-%m-%d_%H-%M-%S.tar.gz"), file_path))
-
-    # Sort backups by creation time within each day
-    for date_str in backups_by_day:
-        backups_by_day[date_str].sort()
-
-    # Keep the most recent two backups from today
-    today_str = current_date.strftime('%Y-%m-%d')
-    if today_str in backups_by_day:
-        delete_today = backups_by_day[today_str][:-2]  # Delete the rest for today
-        paths_to_delete.extend([file_path for _, file_path in delete_today])
-
-    # Keep the most recent backup for each day within the configured DAYS_TO_KEEP
-    for i in range(1, int(DAYS_TO_KEEP) + 1):
-        day_str = (current_date - timedelta(days=i)).strftime('%Y-%m-%d')
-        if day_str in backups_by_day:
-            delete_day = backups_by_day[day_str][:-1]  # Delete the rest for this day
-            paths_to_delete.extend([file_path for _, file_path in delete_day])
-
-    # Delete the collected old backups
-    for file_path in paths_to_delete:
-        os.remove(file_path)
-        log_info(f"Deleted old backup: {file_path}")
-    log_info("Backup process complete, ", end="")
+    backup_time = datetime.now().replace(microsecond=0)
+    backup_name = f"Palworld_{backup_time.strftime('%Y-%m-%d_%H-%M-%S')}"
+    if BACKUP_FORMAT == "dedup":
+        repo_path = set_repo_dir()
+        try:
+            def store():
+                if throttled:
+                    # Chunks are stored one at a time, priority is the only throttle applied
+                    return throttle.run_at_idle_priority(
+                        lambda: dedup_store.store_backup(game_path, repo_path, backup_name))
+                return dedup_store.store_backup(game_path, repo_path, backup_name)
+
+            if hot:
+                stored = hot_backup.run_consistent(
+                    game_path, store, HOT_BACKUP_RETRIES, HOT_BACKUP_SETTLE_SECONDS, HOT_BACKUP_TIMEOUT,
+                    discard=lambda _: dedup_store.delete_snapshot(repo_path, backup_name))
+                if not stored:
+                    exit(1)
+            else:
+                store()
+        except (OSError, compression.TornReadError) as e:
+            log_error(f"Abort: Dedup backup failed with error: {e}")
+            if server_stopped:
+                start_service(10)
+            exit(1)
+        backups = [(datetime.strptime(name, "Palworld_%Y-%m-%d_%H-%M-%S"), name)
+                   for name in dedup_store.list_snapshots(repo_path)
+                   if re.fullmatch(r"Palworld_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}", name)]
+        for name in retention.select_old_backups(backups):
+            dedup_store.delete_snapshot(repo_path, name)
+            log_info(f"Deleted old snapshot: {name}")
+        freed = dedup_store.garbage_collect(repo_path)
+        log_info(f"Released {convert_size(freed)} of unreferenced chunks.")
+    else:
+        backup_file = os.path.join(backups_path, f"{backup_name}{compression.CODEC_EXTENSIONS[codec]}")
+        if hot:
+            tar_results = hot_backup.run_consistent(
+                game_path, lambda: compress_backup(game_path, backup_file, codec, level, throttled),
+                HOT_BACKUP_RETRIES, HOT_BACKUP_SETTLE_SECONDS, HOT_BACKUP_TIMEOUT,
+                discard=lambda _: compression.remove_archive(backup_file))
+        else:
+            tar_results = compress_backup(game_path, backup_file, codec, level, throttled)
+        if not tar_results:
+            # Error compressing file
+            if server_stopped:
+                start_service(10)
+            exit(1)
+        if throttled:
+            problems = throttle.run_at_idle_priority(lambda: compression.verify_backup(backup_file))
+        else:
+            problems = compression.verify_backup(backup_file)
+        if problems:
+            log_error(f"Abort: Backup {backup_file} failed verification: {'; '.join(problems)}")
+            os.remove(backup_file)
+            os.remove(compression.manifest_path(backup_file))
+            if server_stopped:
+                start_service(10)
+            exit(1)
+
+        conn = backup_catalog.open_catalog(backups_path)
+        try:
+            backup_catalog.record_backup(conn, backup_file, backup_time, tar_results.bytes_out,
+                                         tar_results.bytes_in, tar_results.sha256, codec)
+            # Delete the collected old backups
+            for file_path in retention.select_old_backups(backup_catalog.list_backups(conn)):
+                backup_catalog.remove_backup(conn, file_path)
+                log_info(f"Deleted old backup: {file_path}")
+        finally:
+            conn.close()
+        telemetry.set_gauge("backup_size_bytes", tar_results.bytes_out)
+    telemetry.set_gauge("backup_duration_seconds", round(time.monotonic() - start_time, 3))
+    telemetry.set_gauge("backup_timestamp_seconds", int(backup_time.timestamp()))
+    log_progress("backup", "done", "Backup process complete.", file=backup_name,
+                 duration=round(time.monotonic() - start_time, 3))
+    return True
+
+
+def inspect_world(source=None):
+    """
+    Logs world statistics from Level.sav: players, pals, guilds, bases and the size of each
+    section, to track the bloat that slows the server down.
+    Args:
+        source (str): Save directory, Level.sav file or backup archive. The live saves if None.
+    Returns:
+        list: One summary per world, see save_inspector.summarize().
+    """
+    source = source or set_gamesave_dir()
+    temp_files = []
+    try:
+        if os.path.isdir(source):
+            level_saves = [(path, path) for path in save_inspector.find_level_saves(source)]
+        elif source.endswith(".sav"):
+            level_saves = [(source, source)]
+        else:
+            # A backup: stream each world's Level.sav out through the archive's block index
+            manifest = compression.load_manifest(source)
+            if not manifest:
+                log_error(f"{source} has no manifest to find Level.sav with.")
+                return []
+            level_saves = []
+            for name in manifest["files"]:
+                if os.path.basename(name) == "Level.sav":
+                    with tempfile.NamedTemporaryFile(suffix=".sav", delete=False) as tmp:
+                        temp_files.append(tmp.name)
+                        for data in compression.iter_member(source, name, manifest):
+                            tmp.write(data)
+                    level_saves.append((f"{source}:{name}", tmp.name))
+        summaries = []
+        for display_name, path in level_saves:
+            summary = save_inspector.inspect_save(path)
+            summaries.append(summary)
+            log_info(f"{display_name}: {convert_size(summary['gvas_bytes'])} uncompressed, "
+                     f"{len(summary['players'])} players, {summary['pals']} pals, {summary['guilds']} guilds, "
+                     f"{summary['bases']} bases.",
+                     bytes=summary['gvas_bytes'])
+            for player in summary["players"]:
+                log_info(f"  Player {player['name']} (level {player['level']}, {player['uid']}): "
+                         f"{summary['pals_per_owner'][player['uid']]} pals")
+            for section in sorted(summary["sections"], key=lambda s: s["bytes"], reverse=True):
+                log_info(f"  {section['name']}: {convert_size(section['bytes'])}"
+                         + (f", {section['elements']} entries" if section['elements'] is not None else ""))
+        if summaries and source == set_gamesave_dir():
+            telemetry.set_gauge("world_gvas_bytes", sum(s["gvas_bytes"] for s in summaries))
+            telemetry.set_gauge("world_characters", sum(s["characters"] for s in summaries))
+            telemetry.set_gauge("world_pals", sum(s["pals"] for s in summaries))
+            telemetry.set_gauge("world_guilds", sum(s["guilds"] for s in summaries))
+            telemetry.set_gauge("world_bases", sum(s["bases"] for s in summaries))
+        return summaries
+    finally:
+        for path in temp_files:
+            os.remove(path)
+
+
+def resolve_backup(backup):
+    """
+    Finds the backup to restore: "latest", an archive path or file name, or a dedup snapshot name.
+    Returns:
+        tuple: (archive path or snapshot name, dedup repository path or None)
+    """
+    if BACKUP_FORMAT == "dedup":
+        snapshots = dedup_store.list_snapshots(set_repo_dir())
+        if backup == "latest" and snapshots:
+            return snapshots[-1], set_repo_dir()
+        if backup in snapshots:
+            return backup, set_repo_dir()
+    if backup == "latest":
+        conn = backup_catalog.open_catalog(set_backup_dir())
+        try:
+            backups = backup_catalog.list_backups(conn)
+        finally:
+            conn.close()
+        return (backups[-1][1] if backups else None), None
+    for path in [backup, os.path.join(set_backup_dir(), backup)]:
+        if os.path.isfile(path):
+            return path, None
+    return None, None
+
+
+def restore_backup(backup, player_id=None):
+    """
+    Restores the whole world, or one player's save, from a backup.
+      The backup is unpacked while the server is still running. The server is then stopped only for
+      the rename that swaps the files in, and started again.
+    Args:
+        backup (str): "latest", an archive or a dedup snapshot name.
+        player_id (str): Restore only Players/<player_id>.sav
+    Returns:
+        boolean: True if the files were restored.
+    """
+    source, repo_path = resolve_backup(backup)
+    if not source:
+        log_error(f"No backup found for '{backup}'.")
+        return False
+    save_dir = set_gamesave_dir()
+    try:
+        if player_id:
+            name, content = restore.read_player_file(source, player_id, repo_path)
+            log_info(f"Read {name} ({convert_size(len(content))}) from {source}.")
+        else:
+            staged = restore.stage_full_restore(source, save_dir, repo_path)
+            log_info(f"Unpacked {source} to {staged}.")
+    except (OSError, ValueError, KeyError, tarfile.TarError, restore.RestoreError) as e:
+        log_error(f"Abort: Failed to read {source}: {e}")
+        return False
+
+    was_running = check_if_running(expect_running=True, timeout=2)
+    if was_running and not stop_service(15):
+        # Swapping files under a running server would lose the restore, or corrupt it, at its next save
+        log_progress("restore", "failed", "Abort: the server did not stop, the current saves were left in place.")
+        if not player_id:
+            shutil.rmtree(staged, ignore_errors=True)
+        return False
+    try:
+        if player_id:
+            restore.replace_file(save_dir, name, content)
+        else:
+            restore.swap_in(staged, save_dir)
+        log_progress("restore", "done", f"Restored {player_id or 'world'} from {source}.", file=source)
+        return True
+    except OSError as e:
+        log_progress("restore", "failed", f"Restore failed, the current saves were left in place: {e}")
+        if not player_id:
+            shutil.rmtree(staged, ignore_errors=True)
+        return False
+    finally:
+        if was_running:
+            start_service()
+
+
+def cold_backup():
+    """
+    Stops the server only long enough to copy the save files, then backs up the copy.
+      If the server does not stop, a hot backup is taken instead.
+    Returns:
+        boolean: True if the backup was made and the server is running again.
+    """
+    log_info("Checking server status.")
+    staging_path = set_staging_dir()
+    # Don't stop the server for a backup that cannot be written
+    check_folders(set_backup_dir(), "w")
+    codec = COMPRESSION_CODEC if COMPRESSION_CODEC != "auto" else None
+    if not preflight_backup(set_gamesave_dir(), set_backup_dir(), codec):
+        return False
+    downtime_start = time.monotonic()
+    if not stop_service(15):
+        # Never snapshot files the server may still be writing: copy them the way a hot backup does
+        log_error("The server did not stop, taking a hot backup instead.")
+        if not check_if_running(expect_running=True, timeout=2) and not start_service():
+            return False
+        return bool(save_world() and backup_process(hot=True))
+    try:
+        method = snapshot.snapshot_tree(set_gamesave_dir(), staging_path, SNAPSHOT_METHOD)
+        log_info(f"Save files copied to {staging_path} ({method}).")
+    except OSError as e:
+        log_error(f"Abort: Failed to copy save files to {staging_path}: {e}")
+        start_service()
+        return False
+    # The copy is safe either way: back it up even if the server does not come back, but report the failure
+    started = start_service()
+    downtime = time.monotonic() - downtime_start
+    telemetry.set_gauge("backup_downtime_seconds", round(downtime, 3))
+    log_info(f"Server downtime: {downtime:.1f} seconds.", duration=round(downtime, 3))
+    # Compress, verify and apply retention while the server is back up
+    try:
+        backed_up = backup_process(source=staging_path)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+    if not started:
+        log_error("The backup was taken, but the server did not start again.")
+    return bool(backed_up and started)
+
+
+def scheduled_restart():
+    """
+    Restarts the server once nobody is online, or after DAEMON_RESTART_WAIT seconds regardless.
+    """
+    if online_players(DAEMON_RESTART_WAIT):
+        detect_api.run_command("announce", "Scheduled restart in 1 minute")
+        time.sleep(60)
+    return restart_service(20)
+
+
+def run_tiering():
+    # In its own process: idle priority cannot be undone, and must not stick to the daemon's threads
+    return subprocess.run([sys.executable, os.path.abspath(__file__), "tier"]).returncode == 0
+
+
+def daemon_jobs():
+    return {
+        "players": lambda: count_players() is not None,
+        "save": save_world,
+        "backup": cold_backup,
+        "hot-backup": lambda: save_world() and backup_process(hot=True),
+        "restart": scheduled_restart,
+        # 'restart' from the CLI: no waiting for players, same as without a daemon
+        "restart-now": lambda: restart_service(20),
+        "tier": run_tiering
+    }
+
+
+def forward_command(command, *args):
+    """
+    Sends a command through the daemon when one is running, so the CLI reuses its warm connections.
+    Returns:
+        dict: 'ok', 'status', 'data' and 'error', the same reply whether or not a daemon answered.
+    """
+    try:
+        reply = daemon_client.call({"command": command, "args": list(args)}, timeout=30)
+    except daemon_client.DaemonError as e:
+        # The daemon may still be sending it, sending it again could run it twice
+        reply = {"ok": False, "status": None, "data": None, "error": str(e)}
+    if reply is None:
+        result = detect_api.execute(command, *args, cache=True)
+        reply = {"ok": result.ok, "status": result.status, "data": result.data, "error": result.error}
+    # 'status' is expected to fail while the server is down, stay quiet
+    if not reply["ok"] and command != "status":
+        log_error(reply["error"], command=command, status=reply.get("status"))
+    return reply
+
+
+def forward_job(job):
+    """
+    Runs a job in the daemon when one is running, so it cannot overlap its scheduled jobs.
+    Returns:
+        boolean: True if the job succeeded, None if no daemon is running.
+    """
+    try:
+        reply = daemon_client.call({"job": job})
+    except daemon_client.DaemonError as e:
+        reply = {"ok": False, "error": str(e)}
+    if reply is None:
+        return None
+    if not reply["ok"]:
+        log_error(f"{job} failed in the daemon: {reply['error']}")
+        sys.exit(1)
+    return True
+
+
+def command_backup(args):
+    if forward_job("backup") is None and not cold_backup():
+        sys.exit(1)
+
+
+def command_hot_backup(args):
+    # Back up without stopping the server
+    if forward_job("hot-backup") is None and not (save_world() and backup_process(hot=True)):
+        sys.exit(1)
+
+
+def command_status(args):
+    # The exit code is the answer, for monitoring. Over REST it never loads requests or asks the daemon:
+    # a port check, then one request on a plain http.client connection.
+    if REST_PORT:
+        running = readiness.is_running(SERVER_IP, REST_PORT, readiness.rest_probe)
+    else:
+        running = forward_command("status")["ok"]
+    if not running:
+        sys.exit(1)
+
+
+def command_query(args):
+    reply = forward_command(args.command)
+    if not reply["ok"]:
+        sys.exit(1)
+    # For scripts: the reply alone on stdout, logs go elsewhere
+    print(json.dumps(reply.get("data"), indent=2))
+
+
+def command_save(args):
+    # As a daemon job, so it waits for a running backup or restart instead of overlapping it
+    if forward_job("save") is None and not save_world():
+        sys.exit(1)
+
+
+def command_send(args):
+    # announce, kick, ban, unban
+    reply = forward_command(args.command, *[a for a in [getattr(args, "target", None), args.message] if a])
+    if not reply["ok"]:
+        sys.exit(1)
+    log_info(f"{args.command}: done.")
+
+
+def command_overview(args):
+    # info, players, metrics and settings in one round-trip
+    for command, result in async_client.run_commands(["info", "players", "metrics", "settings"]):
+        if result.ok:
+            log_info(f"{command}: {result.data}")
+        else:
+            log_error(f"{command}: {result.error}")
+
+
+def command_exporter(args):
+    # Serve /metrics until interrupted
+    metrics_exporter.serve()
+
+
+def command_exporter_textfile(args):
+    # Write one node_exporter textfile, e.g. from cron
+    metrics_exporter.write_textfile(args.path, metrics_exporter.collect())
+
+
+def command_start(args):
+    if start_service():
+        log_info("Server started successfully.")
+
+
+def command_restart(args):
+    if forward_job("restart-now") or restart_service(20):
+        log_info("Server started successfully.")
+
+
+def command_stop(args):
+    stop_service(10)
+
+
+def command_force_stop(args):
+    log_info("Killing palworld server forcefully.")
+    kill_service()
+
+
+def command_benchmark_codecs(args):
+    results = compression.benchmark_codecs(set_gamesave_dir(), workers=COMPRESSION_WORKERS)
+    for result in results:
+        log_info(f"{result.codec}:{result.level} ratio {result.ratio:.3f}, "
+                 f"{convert_size(result.bytes_per_second)}/s")
+    compression.choose_codec(set_gamesave_dir(), DOWNTIME_BUDGET, results=results)
+    # Fresh results, "auto" uses them until they are CODEC_BENCHMARK_HOURS old
+    if os.path.isdir(set_backup_dir()):
+        catalog = backup_catalog.open_catalog(set_backup_dir())
+        backup_catalog.record_benchmark(catalog, results)
+        catalog.close()
+
+
+def command_rebuild_catalog(args):
+    catalog = backup_catalog.open_catalog(set_backup_dir())
+    backup_catalog.rebuild_catalog(catalog, set_backup_dir())
+    catalog.close()
+
+
+def command_export(args):
+    snapshots = dedup_store.list_snapshots(set_repo_dir())
+    snapshot_name = args.snapshot or (snapshots[-1] if snapshots else None)
+    if snapshot_name not in snapshots:
+        log_error("No matching snapshot found in the dedup repository.")
+        sys.exit(1)
+    output = args.output or os.path.join(set_backup_dir(), f"{snapshot_name}.tar.gz")
+    if not dedup_store.export_tar(set_repo_dir(), snapshot_name, output):
+        sys.exit(1)
+
+
+def command_fleet(args):
+    if args.action not in fleet.fleet_actions:
+        log_error(f"Usage: fleet <{'|'.join(fleet.fleet_actions)}> [message]")
+        sys.exit(1)
+    fleet_results = fleet.run_fleet(args.action, *([args.message] if args.message else []))
+    fleet.log_report(fleet_results)
+    if not all(r.ok for r in fleet_results):
+        sys.exit(1)
+
+
+def command_daemon(args):
+    # Run scheduled jobs and serve the other commands over DAEMON_SOCKET until stopped
+    daemon.run_daemon(daemon_jobs())
+
+
+def command_daemon_status(args):
+    try:
+        reply = daemon_client.call({"jobs": True}, timeout=10)
+    except daemon_client.DaemonError as e:
+        log_error(str(e))
+        sys.exit(1)
+    if reply is None:
+        log_error("No daemon is running.")
+        sys.exit(1)
+    for name, job in reply["data"].items():
+        log_info(f"{name}: {job}")
+
+
+def command_daemon_stop(args):
+    try:
+        if daemon_client.call({"shutdown": True}, timeout=10) is None:
+            log_error("No daemon is running.")
+    except daemon_client.DaemonError as e:
+        log_error(str(e))
+        sys.exit(1)
+
+
+def command_restore(args):
+    if not restore_backup(args.backup, args.player_id):
+        sys.exit(1)
+
+
+def command_tier(args):
+    # Recompress aging archives with TIER_CODEC at idle priority
+    if BACKUP_FORMAT == "dedup":
+        log_info("Tiering only applies to archive backups.")
+    else:
+        throttle.lower_priority()
+        tiering.tier_backups(set_backup_dir())
+
+
+def command_inspect(args):
+    try:
+        if not inspect_world(args.source):
+            log_error("No Level.sav found.")
+            sys.exit(1)
+    except (OSError, KeyError, ValueError, save_inspector.SaveFormatError) as e:
+        log_error(f"Failed to read the save: {e}")
+        sys.exit(1)
+
+
+def command_verify(args):
+    # Check the newest n archives (all by default) against their manifests
+    catalog = backup_catalog.open_catalog(set_backup_dir())
+    try:
+        to_verify = [(path, (backup_catalog.get_backup(catalog, path) or {}).get("sha256"))
+                     for _, path in backup_catalog.list_backups(catalog)]
+    finally:
+        catalog.close()
+    if args.count:
+        to_verify = to_verify[-args.count:]
+    verify_start = time.monotonic()
+    verify_results = compression.verify_backups(to_verify, COMPRESSION_WORKERS)
+    for path, problems in verify_results:
+        if problems:
+            log_error(f"{path}: {'; '.join(problems)}", file=path)
+        else:
+            log_info(f"{path}: OK", file=path)
+    failed = sum(1 for _, problems in verify_results if problems)
+    log_info(f"Verified {len(verify_results)} archives in {time.monotonic() - verify_start:.1f} seconds, "
+             f"{failed} damaged.")
+    if failed:
+        sys.exit(1)
+
+
+def command_player_stats(args):
+    # Peak concurrency per hour and the quietest hours of the day
+    tracker = player_tracker.default_tracker()
+    for hour, peak in tracker.peak_per_hour(start=time.time() - args.hours * 3600):
+        log_info(f"{datetime.fromtimestamp(hour).strftime('%Y-%m-%d %H:00')}: {peak} players")
+    quiet = tracker.quiet_hours()
+    if quiet:
+        log_info("Quietest hours: " + ", ".join(f"{hour:02d}:00 ({peak:.1f})" for hour, peak in quiet[:3]))
+
+
+def command_load_test(args):
+    try:
+        mix = load_test.parse_mix(args.mix)
+    except ValueError as e:
+        log_error(f"Invalid request mix: {e}")
+        sys.exit(1)
+    try:
+        load_test.run_load_test(mix, args.duration, args.rate or None, args.concurrency)
+    except ValueError as e:
+        log_error(str(e))
+        sys.exit(1)
+
+
+def build_parser():
+    """
+    Returns:
+        ArgumentParser: One subcommand per task, each calling its command_* function. Subcommands that
+          control the service locally set needs_local, the others never look at the host.
+    """
+    parser = argparse.ArgumentParser(prog="palworld_util.py", description="Manage a Palworld dedicated server.")
+    parser.add_argument("--no-cache", action="store_true", help="Always ask the server, bypassing the reply cache")
+    subparsers = parser.add_subparsers(dest="subcommand", metavar="<command>", required=True)
+
+    def add(name, handler, help_text, needs_local=False):
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        subparser.set_defaults(handler=handler, needs_local=needs_local, command=name)
+        return subparser
+
+    add("backup", command_backup, "Stop the server, snapshot the saves, start it and back up the snapshot",
+        needs_local=True)
+    add("hot-backup", command_hot_backup, "Back up without stopping the server", needs_local=True)
+    add("status", command_status, "Exit with 0 if the server is responding, 1 otherwise")
+    for name in ["info", "players", "settings", "metrics"]:
+        add(name, command_query, f"Show server {name}")
+    add("overview", command_overview, "Show info, players, metrics and settings at once")
+    add("announce", command_send, "Make an announcement").add_argument("message")
+    add("save", command_save, "Save the world")
+    for name, default_message in [("kick", "Go away."), ("ban", "You are banned.")]:
+        subparser = add(name, command_send, f"{name.capitalize()} a player")
+        subparser.add_argument("target", metavar="steam_id", help="e.g. steam_00000000000000000")
+        subparser.add_argument("message", nargs="?", help=f"Shown to the player, '{default_message}' by default")
+    add("unban", command_send, "Unban a player").add_argument("target", metavar="steam_id")
+    add("start", command_start, "Start the server", needs_local=True)
+    add("restart", command_restart, "Save and restart the server", needs_local=True)
+    add("stop", command_stop, "Stop the server", needs_local=True)
+    add("force-stop", command_force_stop, "Kill the server", needs_local=True)
+    add("exporter", command_exporter, "Serve Prometheus metrics until interrupted")
+    add("exporter-textfile", command_exporter_textfile, "Write one node_exporter textfile").add_argument("path")
+    add("benchmark-codecs", command_benchmark_codecs, "Benchmark the compression codecs on the saves")
+    add("rebuild-catalog", command_rebuild_catalog, "Rebuild the backup catalog from the backups folder")
+    subparser = add("export", command_export, "Export a dedup snapshot as a tar.gz archive")
+    subparser.add_argument("snapshot", nargs="?", help="Snapshot name, the newest by default")
+    subparser.add_argument("output", nargs="?", help="Archive to write, in the backups folder by default")
+    subparser = add("fleet", command_fleet, "Run an action on every server in FLEET_INVENTORY")
+    subparser.add_argument("action", help="status, save, backup, restart or announce")
+    subparser.add_argument("message", nargs="?")
+    add("daemon", command_daemon, "Run scheduled jobs and serve commands until stopped", needs_local=True)
+    add("daemon-status", command_daemon_status, "Show the daemon's jobs")
+    add("daemon-stop", command_daemon_stop, "Stop the daemon")
+    subparser = add("restore", command_restore, "Restore the world or one player from a backup", needs_local=True)
+    subparser.add_argument("backup", help="'latest', an archive, or a dedup snapshot name")
+    subparser.add_argument("player_id", nargs="?", help="Only restore Players/<player_id>.sav")
+    add("tier", command_tier, "Recompress aging archives with TIER_CODEC at idle priority")
+    add("inspect", command_inspect, "Show world statistics from Level.sav").add_argument(
+        "source", nargs="?", help="Save directory, Level.sav or backup archive, the live saves by default")
+    add("verify", command_verify, "Check archives against their manifests").add_argument(
+        "count", nargs="?", type=int, help="Only the newest n archives")
+    add("player-stats", command_player_stats, "Show peak players per hour and the quietest hours").add_argument(
+        "hours", nargs="?", type=int, default=24)
+    subparser = add("load-test", command_load_test, "Load test the REST API with read-only commands")
+    subparser.add_argument("duration", nargs="?", type=float, default=60, help="Seconds, 60 by default")
+    subparser.add_argument("rate", nargs="?", type=float, default=0, help="Requests per second, 0 for closed loop")
+    subparser.add_argument("mix", nargs="?", default=LOAD_TEST_MIX, help="e.g. info=5,players=3,metrics=2")
+    subparser.add_argument("--concurrency", type=int, default=LOAD_TEST_CONCURRENCY)
+    return parser
+
+
+def legacy_arguments(argv):
+    """
+    Translates the old flag style, e.g. '--backup' or '--kick <id>', to subcommands, so existing cron
+    jobs and unit files keep working. '--no-cache' may appear anywhere.
+    """
+    argv = list(argv)
+    options = [a for a in argv if a == "--no-cache"]
+    argv = [a for a in argv if a != "--no-cache"]
+    if argv and argv[0].startswith("--") and argv[0] not in ["--help"]:
+        argv[0] = argv[0][2:].replace("_", "-")
+    return options + argv
 
 
 # Main script logic
 if __name__ == "__main__":
-    logger = setup_logger()
-    game_local()
-    if len(sys.argv) > 1 and sys.argv[1] == "--backup":
-        log_info("Checking server status.")
-        stop_service(15)
-        backup_process()
-        start_service()
-    if len(sys.argv) > 1 and sys.argv[1] == "--status":
-        run_command("status")
-    if len(sys.argv) > 1 and sys.argv[1] == "--info":
-        run_command("info")
-    if len(sys.argv) > 1 and sys.argv[1] == "--players":
-        run_command("players")
-    if len(sys.argv) > 1 and sys.argv[1] == "--settings":
-        run_command("settings")
-    if len(sys.argv) > 1 and sys.argv[1] == "--metrics":
-        run_command("metrics")
-    if len(sys.argv) > 1 and sys.argv[1] == "--announce":
-        run_command("announce", "testing")
-    if len(sys.argv) > 1 and sys.argv[1] == "--kick":
-        run_command("kick", "steam_00000000000000000")
-    if len(sys.argv) > 1 and sys.argv[1] == "--ban":
-        run_command("ban", "steam_00000000000000000")
-    if len(sys.argv) > 1 and sys.argv[1] == "--save":
-        log_info("Saving palworld game.")
-        run_command("save")
-    if len(sys.argv) > 1 and sys.argv[1] == "--start":
-        if start_service():
-            log_info("Server started successfully.")
-    if len(sys.argv) > 1 and sys.argv[1] == "--restart":
-        if restart_service(20):
-            log_info("Server started successfully.")
-    if len(sys.argv) > 1 and sys.argv[1] == "--stop":
-        stop_service(10)
-    if len(sys.argv) > 1 and sys.argv[1] == "--force_stop":
-        log_info("Killing palworld server forcefully.")
-        kill_service()
+    # Logging sets itself up on the first message, a quiet command never starts it
+    args = build_parser().parse_args(legacy_arguments(sys.argv[1:]))
+    atexit.register(telemetry.flush)
+    if args.no_cache:
+        response_cache.disable()
+    if args.needs_local:
+        game_local()
+    args.handler(args)
@@ -0,0 +1,214 @@
+import csv
+import io
+import re
+import select
+import socket
+import struct
+import threading
+
+# Source RCON packet types
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# Largest packet a server is allowed to send
+MAX_PACKET_SIZE = 4096 + 10
+
+# execute_many(): wait for replies as long as the client's own timeout
+_CLIENT_TIMEOUT = object()
+
+
+class RconError(Exception):
+    pass
+
+
+class RconAuthError(RconError):
+    pass
+
+
+class _NothingSent(ConnectionError):
+    """Writing the first packet failed, no command reached the server."""
+
+
+class RconClient:
+    """
+    Source RCON client that keeps one authenticated connection open.
+      Commands sent together are pipelined: every request is written before the replies are read.
+      Replies split over several packets are joined.
+      A connection the server dropped while idle is re-opened before anything is sent. Commands are
+      never sent twice: once they are written, a failure is reported instead of retried.
+      Safe to share between threads.
+    """
+
+    def __init__(self, host, port, password, timeout=10):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.sock = None
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def connect(self):
+        self.close()
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        request_id = self._send(SERVERDATA_AUTH, self.password)
+        while True:
+            response_id, response_type, _ = self._recv()
+            # Some servers send an empty RESPONSE_VALUE before the auth response
+            if response_type == SERVERDATA_AUTH_RESPONSE:
+                break
+        if response_id == -1 or response_id != request_id:
+            self.close()
+            raise RconAuthError("RCON authentication failed, check ADMIN_PASS.")
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def _send(self, packet_type, body):
+        request_id = self.next_id
+        self.next_id = self.next_id % 0x7FFFFFFF + 1
+        payload = struct.pack("<ii", request_id, packet_type) + body.encode("utf-8") + b"\x00\x00"
+        self.sock.sendall(struct.pack("<i", len(payload)) + payload)
+        return request_id
+
+    def _recv_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            part = self.sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError("RCON connection closed by the server.")
+            data += part
+        return bytes(data)
+
+    def _recv(self):
+        (size,) = struct.unpack("<i", self._recv_exact(4))
+        if size < 10 or size > MAX_PACKET_SIZE:
+            raise RconError(f"Invalid RCON packet size: {size}")
+        packet = self._recv_exact(size)
+        response_id, response_type = struct.unpack("<ii", packet[:8])
+        return response_id, response_type, packet[8:-2]
+
+    def _is_stale(self):
+        # An idle connection closed by the server reads as EOF. Leftover replies are fine, they are dropped.
+        if not select.select([self.sock], [], [], 0)[0]:
+            return False
+        try:
+            return not self.sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _send_commands(self, commands):
+        # An empty RESPONSE_VALUE after each command is echoed back once the command's reply, which
+        # may span several packets, is complete.
+        request_ids, sentinel_ids = [], {}
+        for command in commands:
+            try:
+                request_ids.append(self._send(SERVERDATA_EXECCOMMAND, command))
+            except OSError as e:
+                if not request_ids:
+                    raise _NothingSent(str(e)) from e
+                raise
+            sentinel_ids[self._send(SERVERDATA_RESPONSE_VALUE, "")] = request_ids[-1]
+        return request_ids, sentinel_ids
+
+    def _read_replies(self, request_ids, sentinel_ids):
+        # Packets with any other id are left over from an earlier call and dropped
+        replies = {request_id: [] for request_id in request_ids}
+        done = set()
+        while len(done) < len(request_ids):
+            response_id, response_type, body = self._recv()
+            if response_id in sentinel_ids:
+                done.add(sentinel_ids[response_id])
+            elif response_type == SERVERDATA_RESPONSE_VALUE and response_id in replies:
+                replies[response_id].append(body)
+        # Joined before decoding, a character may be split between packets. Palworld pads some
+        # replies with invalid UTF-8, keep what can be decoded.
+        return [b"".join(replies[request_id]).decode("utf-8", errors="replace") for request_id in request_ids]
+
+    def execute_many(self, commands, timeout=_CLIENT_TIMEOUT):
+        """
+        Sends several commands on the same connection without waiting for each reply.
+        Args:
+            commands (list): RCON command lines.
+            timeout (float): Seconds to wait for the replies, None to wait as long as the server takes,
+              e.g. for Save on a large world. The client's timeout if not given.
+        Returns:
+            list: Reply text per command, in the order given.
+        Raises:
+            RconError: The connection failed, the replies did not arrive in time, or the server sent something
+              that could not be parsed. The connection is closed, the next call opens a new one. The
+              commands may have run.
+        """
+        with self.lock:
+            try:
+                reused = self.sock is not None
+                if reused and self._is_stale():
+                    self.close()
+                    reused = False
+                if not reused:
+                    self.connect()
+                try:
+                    ids = self._send_commands(commands)
+                except _NothingSent:
+                    if not reused:
+                        raise
+                    # A kept-alive connection that died unnoticed, nothing was sent: safe to send on a new one
+                    self.connect()
+                    ids = self._send_commands(commands)
+                self.sock.settimeout(self.timeout if timeout is _CLIENT_TIMEOUT else timeout)
+                try:
+                    return self._read_replies(*ids)
+                finally:
+                    if self.sock:
+                        self.sock.settimeout(self.timeout)
+            except RconError:
+                # Out of step with the server: never read the rest of this stream as a reply
+                self.close()
+                raise
+            except OSError as e:
+                self.close()
+                raise RconError(f"RCON connection to {self.host}:{self.port} failed: {e}") from e
+            except BaseException:
+                self.close()
+                raise
+
+    def execute(self, command, timeout=_CLIENT_TIMEOUT):
+        return self.execute_many([command], timeout)[0]
+
+
+def parse_show_players(text):
+    """
+    Parses the CSV reply of ShowPlayers.
+    Returns:
+        list: One dict per player with 'name', 'playerId' and 'userId', matching the REST 'players' reply.
+    """
+    players = []
+    reader = csv.DictReader(io.StringIO(text.strip()))
+    for row in reader:
+        if not row.get("name") and not row.get("playeruid"):
+            continue
+        players.append({
+            "name": row.get("name", ""),
+            "playerId": row.get("playeruid", ""),
+            "userId": row.get("steamid", "")
+        })
+    return players
+
+
+def parse_info(text):
+    """
+    Parses the reply of Info, e.g. "Welcome to Pal Server[v0.1.5.0] My Server"
+    Returns:
+        dict: 'version' and 'servername', matching the REST 'info' reply.
+    """
+    match = re.search(r"\[(?P<version>[^\]]*)\]\s*(?P<servername>.*)", text.strip())
+    if not match:
+        return {"version": "", "servername": text.strip()}
+    return {"version": match.group("version"), "servername": match.group("servername").strip()}
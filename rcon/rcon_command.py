@@ -1,15 +1,79 @@
-import subprocess
-
+from rcon.rcon_client import RconClient, RconError, parse_info, parse_show_players
 from utility import config
 
+_client = None
+
+
+def rcon_client():
+    """
+    Returns:
+        RconClient: Shared connection to the server in config.py, opened on first use.
+    """
+    global _client
+    if _client is None:
+        _client = RconClient(config.SERVER_IP, config.RCON_PORT, config.ADMIN_PASS)
+    return _client
+
+
+def rcon_request(command, *args):
+    """
+    Translates a REST command name and its arguments to the RCON command line.
+    Raises:
+        RconError: The command has no RCON equivalent.
+    """
+    if command in ["info", "status"]:
+        return "Info"
+    elif command == "players":
+        return "ShowPlayers"
+    elif command == "save":
+        return "Save"
+    elif command == "announce":
+        return f"Broadcast {args[0]}"
+    elif command == "kick":
+        return f"KickPlayer {args[0]}"
+    elif command == "ban":
+        return f"BanPlayer {args[0]}"
+    elif command == "unban":
+        return f"UnBanPlayer {args[0]}"
+    elif command == "shutdown":
+        wait_time, message = (args[0], args[1]) if isinstance(args[0], int) else (args[1], args[0])
+        return f"Shutdown {wait_time} {message}"
+    elif command == "force-stop":
+        return "DoExit"
+    raise RconError(f"The '{command}' command is not available over RCON.")
+
+
+def reply_timeout(commands):
+    # Like the REST API, Save only replies once the world is written, however long that takes
+    return None if "save" in commands else rcon_client().timeout
+
+
+def parse_reply(command, text):
+    if command in ["info", "status"]:
+        return parse_info(text)
+    elif command == "players":
+        return {"players": parse_show_players(text)}
+    return {"message": text.strip()}
+
+
+def send_rcon_command(command, *args):
+    """
+    Sends a command over the persistent RCON connection.
+    Returns:
+        dict: Parsed reply, shaped like the REST API reply for the same command.
+    Raises:
+        RconError: The command failed or the connection could not be made.
+    """
+    return parse_reply(command, rcon_client().execute(rcon_request(command, *args), reply_timeout([command])))
+
 
-def send_rcon_command(command):
-    # rcon commands have no output, so code is much simpler
-    baseurl = f"{config.SERVER_IP}:{config.RCON_PORT}"
-    formatted_cmd = f"/{command}"
-    result = subprocess.run(
-        ["rcon", "-a", baseurl, "-p", config.ADMIN_PASS, "-t", "rcon", formatted_cmd],
-        capture_output=True,
-        text=True
-    )
-    print(result.stdout.strip())
+def send_rcon_commands(commands):
+    """
+    Pipelines several commands over the persistent RCON connection.
+    Args:
+        commands (list): (command, args...) tuples.
+    Returns:
+        list: Parsed reply per command.
+    """
+    replies = rcon_client().execute_many([rcon_request(*c) for c in commands], reply_timeout([c[0] for c in commands]))
+    return [parse_reply(c[0], reply) for c, reply in zip(commands, replies)]
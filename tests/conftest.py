@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Run from any directory: the utility modules are imported as 'utility.*' from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from benchmarks.mock_server import MockPalworld
+from utility import async_client
+from utility.async_client import AsyncPalworldClient
+from utility.detect_api import CommandResult, PalworldClient
+
+
+def test_fetch_many_keeps_every_result_in_order():
+    async def fetch(address):
+        async with AsyncPalworldClient(PalworldClient(*address, pool_size=4)) as client:
+            return await client.fetch_many(["info", ("announce", "one"), "players", ("announce", "two")])
+
+    with MockPalworld().serve("127.0.0.1", 0) as mock:
+        results = asyncio.run(fetch(mock.rest_address))
+    assert mock.requests["announce"] == 2
+    assert [command for command, _ in results] == ["info", "announce", "players", "announce"]
+    assert all(result.ok for _, result in results), [result.error for _, result in results]
+
+
+def test_close_waits_for_requests_that_timed_out(monkeypatch):
+    events = []
+
+    def slow_execute(command, *args, client=None, request_timeout=None):
+        time.sleep(0.3)
+        events.append("reply")
+        return CommandResult(command, data={})
+
+    class Client:
+        def close(self):
+            events.append("close")
+
+    async def fetch():
+        async with AsyncPalworldClient(Client(), max_concurrency=1) as client:
+            return await client.fetch("info", timeout=0.1)
+
+    monkeypatch.setattr(async_client, "execute", slow_execute)
+    result = asyncio.run(fetch())
+    assert result.error == "Timed out after 0.1 seconds."
+    # The abandoned request still had the connection, it is closed only after the request returns
+    assert events == ["reply", "close"]
@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+from utility import backup_catalog, compression
+
+
+def _touch(path, size=10):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_new_catalog_lists_the_archives_on_disk(tmp_path):
+    old = _touch(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz", 10)
+    new = _touch(tmp_path / "Palworld_2026-01-02_00-00-00.tar.zst", 30)
+    _touch(tmp_path / "notes.txt")
+    conn = backup_catalog.open_catalog(str(tmp_path))
+    assert backup_catalog.list_backups(conn) == [(datetime(2026, 1, 1), old), (datetime(2026, 1, 2), new)]
+    assert backup_catalog.get_backup(conn, new)["codec"] == "zstd"
+    assert backup_catalog.average_size(conn) == 10
+    conn.close()
+
+
+def test_rebuild_keeps_known_checksums(tmp_path):
+    path = _touch(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    conn = backup_catalog.open_catalog(str(tmp_path))
+    backup_catalog.record_backup(conn, path, datetime(2026, 1, 1), 10, source_size=40, sha256="abc")
+    _touch(tmp_path / "Palworld_2026-01-02_00-00-00.tar.gz")
+    assert backup_catalog.rebuild_catalog(conn, str(tmp_path)) == 2
+    assert backup_catalog.get_backup(conn, path)["sha256"] == "abc"
+    assert backup_catalog.average_ratio(conn) == 0.25
+    conn.close()
+
+
+def test_remove_backup_deletes_the_archive_and_manifest(tmp_path):
+    path = _touch(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    _touch(compression.manifest_path(path))
+    conn = backup_catalog.open_catalog(str(tmp_path))
+    backup_catalog.remove_backup(conn, path)
+    assert backup_catalog.list_backups(conn) == []
+    assert not os.path.exists(path)
+    assert not os.path.exists(compression.manifest_path(path))
+    conn.close()
+
+
+def test_codec_benchmark_is_cached(tmp_path, monkeypatch):
+    runs = []
+
+    def benchmark(input_folder, workers=0):
+        runs.append(input_folder)
+        return [compression.CompressionStats("gzip", 6, 1000, 400, 0.5)]
+
+    monkeypatch.setattr(backup_catalog, "benchmark_codecs", benchmark)
+    conn = backup_catalog.open_catalog(str(tmp_path))
+    first = backup_catalog.benchmark_results(conn, "saves", max_age=3600)
+    second = backup_catalog.benchmark_results(conn, "saves", max_age=3600)
+    assert len(runs) == 1
+    assert [(r.codec, r.level, r.ratio, r.bytes_per_second) for r in second] == \
+        [(r.codec, r.level, r.ratio, r.bytes_per_second) for r in first] == [("gzip", 6, 0.4, 2000)]
+    # Stale results are measured again
+    backup_catalog.benchmark_results(conn, "saves", max_age=-1)
+    assert len(runs) == 2
+    conn.close()
@@ -0,0 +1,49 @@
+import pytest
+
+import palworld_util
+
+
+def parse(*argv):
+    return palworld_util.build_parser().parse_args(palworld_util.legacy_arguments(argv))
+
+
+@pytest.mark.parametrize("argv, expected", [
+    (["--backup"], ["backup"]),
+    (["--hot_backup"], ["hot-backup"]),
+    (["--force_stop"], ["force-stop"]),
+    (["backup"], ["backup"]),
+    (["--help"], ["--help"]),
+    ([], []),
+])
+def test_legacy_flags_become_subcommands(argv, expected):
+    assert palworld_util.legacy_arguments(argv) == expected
+
+
+@pytest.mark.parametrize("argv", [
+    ["--no-cache", "--players"],
+    ["--players", "--no-cache"],
+    ["--no-cache", "players"],
+    ["players", "--no-cache"],
+])
+def test_no_cache_anywhere(argv):
+    assert palworld_util.legacy_arguments(argv) == ["--no-cache", "players"]
+    args = parse(*argv)
+    assert args.no_cache
+    assert args.command == "players"
+
+
+def test_kick_and_ban_arguments():
+    args = parse("--kick", "steam_00000000000000001", "Restarting")
+    assert (args.command, args.target, args.message) == ("kick", "steam_00000000000000001", "Restarting")
+    args = parse("--ban", "steam_00000000000000002")
+    assert (args.command, args.target, args.message) == ("ban", "steam_00000000000000002", None)
+    assert args.handler is palworld_util.command_send
+    # A trailing --no-cache is the option, not the kick message
+    args = parse("--kick", "steam_00000000000000001", "--no-cache")
+    assert (args.message, args.no_cache) == (None, True)
+
+
+def test_force_stop_needs_the_local_host():
+    args = parse("--force_stop")
+    assert args.handler is palworld_util.command_force_stop
+    assert args.needs_local
@@ -0,0 +1,50 @@
+import pytest
+
+import palworld_util
+from utility import snapshot
+
+
+def _patch(monkeypatch, tmp_path, stopped, calls):
+    monkeypatch.setattr(palworld_util, "BACKUPS_PATH", str(tmp_path / "backups"))
+    monkeypatch.setattr(palworld_util, "STAGING_PATH", str(tmp_path / "staging"))
+    monkeypatch.setattr(palworld_util, "GAMESAVE_PATH", str(tmp_path / "saves"))
+    (tmp_path / "saves").mkdir()
+    monkeypatch.setattr(palworld_util, "preflight_backup", lambda *args: True)
+    monkeypatch.setattr(palworld_util, "stop_service", lambda wait_time: calls.append("stop") or stopped)
+    monkeypatch.setattr(palworld_util, "start_service", lambda *args: calls.append("start") or True)
+    monkeypatch.setattr(palworld_util, "check_if_running", lambda **kwargs: True)
+    monkeypatch.setattr(palworld_util, "save_world", lambda: calls.append("save") or True)
+    monkeypatch.setattr(snapshot, "snapshot_tree", lambda *args: calls.append("snapshot") or "copy")
+    monkeypatch.setattr(palworld_util, "backup_process",
+                        lambda hot=False, source=None: calls.append("hot" if hot else "staged") or True)
+
+
+def test_snapshot_after_a_confirmed_stop(monkeypatch, tmp_path):
+    calls = []
+    _patch(monkeypatch, tmp_path, True, calls)
+    assert palworld_util.cold_backup()
+    assert calls == ["stop", "snapshot", "start", "staged"]
+
+
+def test_hot_backup_when_the_server_does_not_stop(monkeypatch, tmp_path):
+    calls = []
+    _patch(monkeypatch, tmp_path, False, calls)
+    assert palworld_util.cold_backup()
+    assert calls == ["stop", "save", "hot"]
+
+
+def test_backup_is_kept_but_reported_when_the_server_does_not_start(monkeypatch, tmp_path):
+    calls = []
+    _patch(monkeypatch, tmp_path, True, calls)
+    monkeypatch.setattr(palworld_util, "start_service", lambda *args: calls.append("start") and False)
+    assert not palworld_util.cold_backup()
+    assert calls == ["stop", "snapshot", "start", "staged"]
+
+
+def test_failed_hot_backup_exits_non_zero(monkeypatch):
+    monkeypatch.setattr(palworld_util, "forward_job", lambda job: None)
+    monkeypatch.setattr(palworld_util, "save_world", lambda: True)
+    monkeypatch.setattr(palworld_util, "backup_process", lambda hot=False, source=None: False)
+    with pytest.raises(SystemExit) as exit_info:
+        palworld_util.command_hot_backup(None)
+    assert exit_info.value.code == 1
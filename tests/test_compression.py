@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from utility import compression, restore
+
+
+def _write_tree(root):
+    files = {"Level.sav": os.urandom(300000) * 2, "LevelMeta.sav": b"meta", "Players/0001.sav": b"player" * 1000}
+    for name, content in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    return files
+
+
+@pytest.mark.parametrize("codec", compression.available_codecs())
+def test_round_trip(tmp_path, codec):
+    files = _write_tree(str(tmp_path / "saves"))
+    archive = str(tmp_path / f"Palworld_2026-01-01_00-00-00{compression.CODEC_EXTENSIONS[codec]}")
+    stats = compression.compress_tree(str(tmp_path / "saves"), archive, codec, workers=2)
+    assert stats.bytes_in > sum(len(content) for content in files.values())
+    assert sorted(stats.files) == sorted(f"./{name}" for name in files)
+    assert compression.verify_backup(archive) == []
+
+    restore.extract_archive(archive, str(tmp_path / "restored"))
+    for name, content in files.items():
+        assert (tmp_path / "restored" / name).read_bytes() == content
+        assert compression.read_member(archive, f"./{name}") == content
+
+
+def test_damaged_archive_is_detected(tmp_path):
+    _write_tree(str(tmp_path / "saves"))
+    archive = str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    compression.compress_tree(str(tmp_path / "saves"), archive)
+    with open(archive, "r+b") as f:
+        f.seek(os.path.getsize(archive) // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xff]))
+    assert compression.verify_backup(archive)
+    with pytest.raises(Exception):
+        restore.extract_archive(archive, str(tmp_path / "restored"))
+
+
+def test_member_that_does_not_match_the_manifest(tmp_path):
+    _write_tree(str(tmp_path / "saves"))
+    archive = str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    compression.compress_tree(str(tmp_path / "saves"), archive)
+    manifest = compression.load_manifest(archive)
+    manifest["files"]["./LevelMeta.sav"]["sha256"] = "0" * 64
+    with open(compression.manifest_path(archive), "w") as f:
+        json.dump(manifest, f)
+    assert compression.verify_backup(archive) == ["./LevelMeta.sav does not match its checksum"]
+    with pytest.raises(ValueError):
+        compression.read_member(archive, "./LevelMeta.sav")
+    with pytest.raises(restore.RestoreError):
+        restore.extract_archive(archive, str(tmp_path / "restored"))
+
+
+def test_failed_compression_leaves_nothing_behind(tmp_path):
+    archive = str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    with pytest.raises(OSError):
+        compression.compress_tree(str(tmp_path / "missing"), archive)
+    assert os.listdir(tmp_path) == []
+
+
+def test_iter_member_streams_one_block_at_a_time(tmp_path):
+    content = os.urandom(1024 * 1024) * 10
+    os.makedirs(tmp_path / "saves")
+    (tmp_path / "saves" / "Level.sav").write_bytes(content)
+    archive = str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    compression.compress_tree(str(tmp_path / "saves"), archive)
+    pieces = list(compression.iter_member(archive, "./Level.sav"))
+    assert len(pieces) == 3
+    assert max(len(piece) for piece in pieces) <= compression.BLOCK_SIZE
+    assert b"".join(pieces) == content
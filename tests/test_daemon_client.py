@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from utility import daemon_client
+from utility.daemon import Daemon
+
+
+def _serve_once(path, reply):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    def handle():
+        connection, _ = server.accept()
+        with connection:
+            connection.makefile("rb").readline()
+            if reply is not None:
+                connection.sendall(json.dumps(reply).encode() + b"\n")
+            else:
+                # Busy: hold the connection without answering
+                connection.recv(1)
+        server.close()
+
+    thread = threading.Thread(target=handle, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_no_daemon_returns_none(tmp_path):
+    assert daemon_client.call({"jobs": True}, str(tmp_path / "missing.sock")) is None
+
+
+def test_stale_socket_returns_none(tmp_path):
+    path = str(tmp_path / "stale.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.close()
+    assert daemon_client.call({"jobs": True}, path) is None
+
+
+def test_reply(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    _serve_once(path, {"ok": True, "data": 1})
+    assert daemon_client.call({"command": "info"}, path, timeout=5) == {"ok": True, "data": 1}
+
+
+def test_slow_daemon_raises_instead_of_returning_none(tmp_path):
+    path = str(tmp_path / "daemon.sock")
+    _serve_once(path, None)
+    with pytest.raises(daemon_client.DaemonError):
+        daemon_client.call({"command": "save"}, path, timeout=0.2)
+
+
+def test_socket_in_a_shared_directory_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    path = str(shared / "daemon.sock")
+    thread = _serve_once(path, {"ok": True})
+    with pytest.raises(daemon_client.DaemonError):
+        daemon_client.call({"job": "backup"}, path, timeout=1)
+    # Nothing was sent: the fake daemon is still waiting for a connection
+    assert thread.is_alive()
+
+
+def test_socket_of_another_user_is_refused(tmp_path):
+    if os.getuid() != 0:
+        pytest.skip("needs root to hand the socket to another user")
+    path = str(tmp_path / "daemon.sock")
+    _serve_once(path, {"ok": True})
+    os.chown(path, 65534, 65534)
+    with pytest.raises(daemon_client.DaemonError):
+        daemon_client.call({"job": "backup"}, path, timeout=1)
+
+
+def test_daemon_binds_an_owner_only_socket(tmp_path):
+    path = str(tmp_path / "run" / "daemon.sock")
+    daemon = Daemon({}, {}, path)
+
+    async def serve():
+        task = asyncio.create_task(daemon.serve())
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        mode = os.stat(path).st_mode & 0o777
+        daemon.stopping.set()
+        await task
+        return mode
+
+    assert asyncio.run(serve()) & 0o077 == 0
+    assert os.stat(tmp_path / "run").st_mode & 0o777 == 0o700
@@ -0,0 +1,112 @@
+import hashlib
+import io
+import os
+import random
+import tarfile
+
+from benchmarks import synthetic_saves
+from utility import dedup_store, restore, save_inspector
+
+
+def _chunk_digests(data):
+    digests, start = [], 0
+    while start < len(data):
+        end = dedup_store._cut_point(data, start, len(data))
+        digests.append(hashlib.sha256(data[start:end]).hexdigest())
+        start = end
+    return digests
+
+
+def test_chunk_sizes_are_bounded():
+    data = random.Random(1).randbytes(24 * 1024 * 1024)
+    start = 0
+    while start < len(data):
+        end = dedup_store._cut_point(data, start, len(data))
+        assert end - start <= dedup_store.CHUNK_MAX_SIZE
+        assert end - start >= dedup_store.CHUNK_MIN_SIZE or end == len(data)
+        start = end
+
+
+def test_boundaries_survive_an_insertion():
+    data = random.Random(2).randbytes(24 * 1024 * 1024)
+    before = _chunk_digests(data)
+    after = _chunk_digests(data[:1000] + b"inserted" + data[1000:])
+    # Only the chunk holding the insertion changes
+    assert len(set(before) - set(after)) == 1
+
+
+def test_data_full_of_anchors_is_cut_at_the_maximum():
+    data = dedup_store._ANCHOR * (dedup_store.CHUNK_MAX_SIZE * 2)
+    assert dedup_store._cut_point(data, 0, len(data)) in [dedup_store.CHUNK_MAX_SIZE,
+                                                          dedup_store.CHUNK_MIN_SIZE + len(dedup_store._ANCHOR)]
+
+
+def test_store_restore_round_trip(tmp_path):
+    source = tmp_path / "save"
+    (source / "Players").mkdir(parents=True)
+    level = random.Random(3).randbytes(6 * 1024 * 1024)
+    (source / "Level.sav").write_bytes(level)
+    (source / "Players" / "0001.sav").write_bytes(b"player")
+    repo = str(tmp_path / "repo")
+
+    dedup_store.store_backup(str(source), repo, "first")
+    (source / "Level.sav").write_bytes(level[:100] + b"changed" + level[100:])
+    dedup_store.store_backup(str(source), repo, "second")
+    second = dedup_store.load_manifest(repo, "second")
+    assert second["stored"] < len(level) // 2
+
+    dedup_store.restore_snapshot(repo, "first", str(tmp_path / "restored"))
+    assert (tmp_path / "restored" / "Level.sav").read_bytes() == level
+    assert (tmp_path / "restored" / "Players" / "0001.sav").read_bytes() == b"player"
+
+    dedup_store.delete_snapshot(repo, "first")
+    assert dedup_store.garbage_collect(repo) > 0
+    dedup_store.restore_snapshot(repo, "second", str(tmp_path / "restored2"))
+    assert (tmp_path / "restored2" / "Level.sav").read_bytes() == (source / "Level.sav").read_bytes()
+
+
+def _edit_level(path, offset, change):
+    # What the game does on every save: change the body, then write a newly compressed file
+    gvas = io.BytesIO()
+    save_inspector.decompress_sav(path, gvas)
+    body = gvas.getvalue()
+    with open(path, "wb") as f:
+        f.write(synthetic_saves.pack_sav(body[:offset] + change + body[offset + len(change):]))
+
+
+def test_saves_are_chunked_decompressed(tmp_path):
+    source = tmp_path / "save"
+    synthetic_saves.write_save_tree(str(source), level_mb=8, players=2, pals=50)
+    level = next(str(path) for path in source.rglob("Level.sav"))
+    repo = str(tmp_path / "repo")
+    dedup_store.store_backup(str(source), repo, "first")
+    first_level = open(level, "rb").read()
+
+    _edit_level(level, 4 * 1024 * 1024, b"changed")
+    dedup_store.store_backup(str(source), repo, "second")
+    second = dedup_store.load_manifest(repo, "second")
+    # One or two chunks of the body are new, not the whole file after the change
+    assert second["stored"] < os.path.getsize(level) // 3
+
+    # Restores rebuild the compressed file byte for byte
+    dedup_store.restore_snapshot(repo, "first", str(tmp_path / "restored"))
+    assert (tmp_path / "restored" / os.path.relpath(level, source)).read_bytes() == first_level
+    name, content = restore.read_player_file("second", "00000001000000000000000000000000", repo)
+    assert content == (source / name).read_bytes()
+    assert dedup_store.export_tar(repo, "second", str(tmp_path / "second.tar.gz"))
+    with tarfile.open(tmp_path / "second.tar.gz") as tar:
+        assert tar.extractfile(f"./{os.path.relpath(level, source)}").read() == open(level, "rb").read()
+
+
+def test_save_from_another_zlib_level_is_rebuilt_valid(tmp_path):
+    gvas = synthetic_saves.level_gvas(512 * 1024, 1, 5, 1, 1)
+    source = tmp_path / "save"
+    source.mkdir()
+    sav = synthetic_saves.pack_sav(gvas, level=9)
+    (source / "Level.sav").write_bytes(sav[:4] + b"\0\0\0\0" + sav[8:])
+    repo = str(tmp_path / "repo")
+    dedup_store.store_backup(str(source), repo, "first")
+    dedup_store.restore_snapshot(repo, "first", str(tmp_path / "restored"))
+    rebuilt = io.BytesIO()
+    save_inspector.decompress_sav(str(tmp_path / "restored" / "Level.sav"), rebuilt)
+    assert rebuilt.getvalue() == gvas
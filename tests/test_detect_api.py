@@ -0,0 +1,55 @@
+import json
+import os
+import re
+
+import pytest
+
+from utility import detect_api
+
+# Arguments each command is sent with
+SAMPLE_ARGS = {
+    "announce": ("Server restart in 5 minutes",),
+    "kick": ("steam_00000000000000001",),
+    "ban": ("steam_00000000000000001", "Cheating"),
+    "unban": ("steam_00000000000000001",),
+    "shutdown": (30, "Shutting down"),
+}
+
+
+def _sent_by_palworld_util():
+    # Every detect_api.execute("...")/run_command("...") in the CLI
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "palworld_util.py")) as f:
+        return set(re.findall(r'detect_api\.(?:execute|run_command)\("([a-z-]+)"', f.read()))
+
+
+@pytest.mark.parametrize("command", sorted(set(detect_api.valid_commands) | _sent_by_palworld_util()))
+def test_every_command_builds(command):
+    method, payload = detect_api.build_request(command, *SAMPLE_ARGS.get(command, ()))
+    assert method == ("GET" if command in detect_api.get_commands else "POST")
+    if payload is not None:
+        json.loads(payload)
+
+
+def test_palworld_util_commands_are_valid():
+    assert _sent_by_palworld_util() <= set(detect_api.valid_commands)
+
+
+@pytest.mark.parametrize("command", ["start", "restart", "stop"])
+def test_wrapper_commands_send_the_timeout(command, monkeypatch):
+    monkeypatch.setattr(detect_api, "WRAPPER", True)
+    assert detect_api.build_request(command, timeout=20) == ("POST", json.dumps({"timeout": 20}))
+    monkeypatch.setattr(detect_api, "WRAPPER", False)
+    assert detect_api.build_request(command, timeout=20) == ("POST", None)
+
+
+def test_kick_and_ban_default_messages():
+    assert json.loads(detect_api.build_request("kick", "steam_1")[1]) == {"userid": "steam_1", "message": "Go away."}
+    assert json.loads(detect_api.build_request("ban", "steam_1", "Bye")[1]) == {"userid": "steam_1", "message": "Bye"}
+
+
+@pytest.mark.parametrize("command, args", [("info", ("extra",)), ("announce", ()), ("kick", ()),
+                                           ("kick", ("a", "b", "c")), ("shutdown", ("a", "b")), ("unknown", ())])
+def test_bad_arguments_are_rejected(command, args):
+    with pytest.raises(ValueError):
+        detect_api.build_request(command, *args)
+    assert detect_api.execute(command, *args).error
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from benchmarks.mock_server import MockPalworld
+from benchmarks.synthetic_saves import write_save_tree
+from utility import compression, fleet, throttle
+
+
+def test_backup_is_throttled(tmp_path, monkeypatch):
+    save_dir = str(tmp_path / "0")
+    write_save_tree(save_dir, 1, 2)
+    lowered = []
+    monkeypatch.setattr(fleet, "THROTTLE_ONLINE_BACKUPS", True)
+    monkeypatch.setattr(fleet, "HOT_BACKUP_SETTLE_SECONDS", 0)
+    monkeypatch.setattr(throttle, "lower_priority", lambda: lowered.append(True))
+    with MockPalworld(save_delay=0).serve("127.0.0.1", 0) as mock:
+        server = fleet.FleetServer({"name": "test", "server_ip": mock.rest_address[0],
+                                    "rest_port": mock.rest_address[1], "gamesave_path": save_dir,
+                                    "backups_path": str(tmp_path / "backups")})
+        result = fleet.run_action(server, "backup")
+        server.client.close()
+    assert result.ok, result.detail
+    # Compression and verification both ran at idle priority, and the throttle polled the server
+    assert len(lowered) == 2
+    assert mock.requests.get("metrics")
+    archives = [name for name in os.listdir(tmp_path / "backups") if name.endswith(".tar.gz")]
+    assert compression.verify_backup(str(tmp_path / "backups" / archives[0])) == []
+
+
+def test_restart_saves_first(monkeypatch):
+    with MockPalworld(save_delay=0).serve("127.0.0.1", 0) as mock:
+        order = []
+        handle = mock.handle
+
+        def supervised(method, command, payload):
+            order.append(command)
+            if command == "shutdown":
+                # Go down at once, and let an outside supervisor bring the server back
+                payload = dict(payload, waittime=0)
+                mock._later(0.5, True)
+            return handle(method, command, payload)
+
+        monkeypatch.setattr(mock, "handle", supervised)
+        monkeypatch.setattr(fleet.FleetServer, "is_local", property(lambda self: False))
+        server = fleet.FleetServer({"name": "test", "server_ip": "127.0.0.1", "rest_port": mock.rest_address[1],
+                                    "wrapper": False, "supervised": True})
+        result = fleet.run_action(server, "restart", timeout=10)
+        server.client.close()
+    assert result.ok, result.detail
+    assert order.index("save") < order.index("shutdown")
+
+
+def test_remote_restart_uses_the_wrapper(monkeypatch):
+    with MockPalworld(save_delay=0, start_delay=0.5).serve("127.0.0.1", 0) as mock:
+        monkeypatch.setattr(fleet.FleetServer, "is_local", property(lambda self: False))
+        server = fleet.FleetServer({"name": "test", "server_ip": "127.0.0.1", "rest_port": mock.rest_address[1],
+                                    "wrapper": True})
+        result = fleet.run_action(server, "restart", timeout=10)
+        server.client.close()
+    assert result.ok, result.detail
+    assert mock.requests["restart"] == 1
+    assert "shutdown" not in mock.requests
+
+
+def test_unsupervised_remote_restart_is_refused(monkeypatch):
+    with MockPalworld(save_delay=0).serve("127.0.0.1", 0) as mock:
+        monkeypatch.setattr(fleet.FleetServer, "is_local", property(lambda self: False))
+        server = fleet.FleetServer({"name": "test", "server_ip": "127.0.0.1", "rest_port": mock.rest_address[1],
+                                    "wrapper": False})
+        result = fleet.run_action(server, "restart", timeout=10)
+        server.client.close()
+    assert not result.ok and "supervised" in result.detail
+    assert "shutdown" not in mock.requests and "restart" not in mock.requests
+
+
+def test_local_restart_uses_the_systemd_backend(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fleet.systemd_dbus, "control_unit",
+                        lambda action, unit, timeout: calls.append((action, unit)) or (True, f"{unit} is active"))
+    monkeypatch.setattr(fleet.subprocess, "run", lambda *args, **kwargs: pytest.fail("systemctl was used"))
+    with MockPalworld(save_delay=0).serve("127.0.0.1", 0) as mock:
+        server = fleet.FleetServer({"name": "test", "server_ip": "127.0.0.1", "rest_port": mock.rest_address[1],
+                                    "service_name": "palworld.service"})
+        result = fleet.run_action(server, "restart", timeout=10)
+        server.client.close()
+    assert result.ok, result.detail
+    assert calls == [("restart", "palworld.service")]
+
+
+def test_restart_is_not_attempted_when_the_save_fails(monkeypatch):
+    with MockPalworld(save_delay=0, failure_rate=1.0).serve("127.0.0.1", 0) as mock:
+        server = fleet.FleetServer({"name": "test", "server_ip": "localhost", "rest_port": mock.rest_address[1]})
+        result = fleet.run_action(server, "restart", timeout=1)
+        server.client.close()
+    assert not result.ok and result.detail.startswith("save failed")
+    assert "shutdown" not in mock.requests
@@ -0,0 +1,58 @@
+import os
+
+from utility import compression, hot_backup
+
+
+def _save_tree(tmp_path):
+    save_dir = tmp_path / "0"
+    (save_dir / "Players").mkdir(parents=True)
+    (save_dir / "Level.sav").write_bytes(b"level 1")
+    (save_dir / "Players" / "0001.sav").write_bytes(b"player 1")
+    return save_dir
+
+
+def test_a_save_between_files_discards_the_archive(tmp_path):
+    save_dir = _save_tree(tmp_path)
+    archive = str(tmp_path / "backup.tar.gz")
+    attempts, discarded = [], []
+
+    def action():
+        stats = compression.compress_tree(str(save_dir), archive, "gzip")
+        if not attempts:
+            # The server saves after the archive has read both files: no file was torn, the tree was
+            (save_dir / "Players" / "0001.sav").write_bytes(b"player 2")
+        attempts.append(stats)
+        return stats
+
+    def discard(stats):
+        discarded.append(stats)
+        compression.remove_archive(archive)
+
+    stats = hot_backup.run_consistent(str(save_dir), action, retries=2, settle_seconds=0, timeout=5, discard=discard)
+    assert len(attempts) == 2
+    assert discarded == attempts[:1]
+    assert stats is attempts[1]
+    assert compression.verify_backup(archive) == []
+
+
+def test_gives_up_after_the_retries(tmp_path):
+    save_dir = _save_tree(tmp_path)
+    calls = []
+
+    def action():
+        calls.append(1)
+        (save_dir / "Level.sav").write_bytes(b"level %d" % len(calls))
+        return True
+
+    assert hot_backup.run_consistent(str(save_dir), action, retries=1, settle_seconds=0, timeout=5) is None
+    assert len(calls) == 2
+
+
+def test_failed_attempts_are_returned_unchecked(tmp_path):
+    save_dir = _save_tree(tmp_path)
+
+    def action():
+        os.remove(save_dir / "Level.sav")
+        return False
+
+    assert hot_backup.run_consistent(str(save_dir), action, retries=2, settle_seconds=0, timeout=5) is False
@@ -0,0 +1,14 @@
+import palworld_util
+from benchmarks.synthetic_saves import write_save_tree
+from utility import compression
+
+
+def test_inspect_world_reads_a_backup(tmp_path):
+    write_save_tree(str(tmp_path / "saves"), level_mb=1, players=2, pals=20, guilds=1, bases=1)
+    archive = str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz")
+    compression.compress_tree(str(tmp_path / "saves"), archive)
+    from_dir = palworld_util.inspect_world(str(tmp_path / "saves"))
+    from_archive = palworld_util.inspect_world(archive)
+    assert len(from_archive) == 1
+    assert from_archive[0]["gvas_bytes"] == from_dir[0]["gvas_bytes"]
+    assert from_archive[0]["pals"] == from_dir[0]["pals"] == 20
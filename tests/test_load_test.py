@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.mock_server import MockPalworld
+from utility import load_test, telemetry
+
+
+def test_load_test_stays_out_of_the_latency_telemetry(monkeypatch):
+    observed = []
+    monkeypatch.setattr(telemetry, "observe", lambda *args: observed.append(args))
+    with MockPalworld().serve("127.0.0.1", 0) as mock:
+        report = load_test.run_load_test({"info": 1, "players": 1}, duration=0.3, concurrency=2, interval=1,
+                                         host=mock.rest_address[0], port=mock.rest_address[1], seed=0)
+    assert report["requests"] > 0 and report["errors"] == 0
+    assert observed == []
+
+
+def test_load_test_refuses_to_run_over_rcon():
+    with pytest.raises(ValueError):
+        load_test.run_load_test({"info": 1}, duration=0.1, port=None)
+
+
+def test_parse_mix():
+    assert load_test.parse_mix("info=5,players") == {"info": 5.0, "players": 1.0}
+    with pytest.raises(ValueError):
+        load_test.parse_mix("save")
@@ -0,0 +1,56 @@
+from utility.player_tracker import HOURLY_FIELDS, HOURLY_FILE, SAMPLE_FIELDS, SAMPLES_FILE, PlayerTracker, _read_array
+
+HOUR = 3600
+DAY = 86400
+START = 1_700_000_000 // HOUR * HOUR
+
+
+def players(*names):
+    return [{"name": name, "userId": f"steam_{name}"} for name in names]
+
+
+def records(tracker, name, fields):
+    values = _read_array(tracker._file(name), fields)
+    return [tuple(values[i:i + fields]) for i in range(0, len(values), fields)]
+
+
+def test_downsamples_across_raw_days(tmp_path):
+    tracker = PlayerTracker(path=str(tmp_path), raw_days=1)
+    now = START + 2 * DAY + 2 * HOUR + 1
+    cutoff = START + DAY + 2 * HOUR
+    polls = [(START, 2), (START + 600, 5), (START + 1200, 3), (START + HOUR, 1), (cutoff - 60, 4), (cutoff, 6)]
+    for poll_time, count in polls:
+        tracker.update(players(*map(str, range(count))), now=poll_time)
+    assert records(tracker, HOURLY_FILE, HOURLY_FIELDS) == []
+
+    tracker.update(players("0"), now=now)
+    # Samples before the hour raw_days ago become one (hour, peak, samples, sum) record per hour
+    assert records(tracker, HOURLY_FILE, HOURLY_FIELDS) == [
+        (START, 5, 3, 10), (START + HOUR, 1, 1, 1), (cutoff - HOUR, 4, 1, 4)]
+    assert records(tracker, SAMPLES_FILE, SAMPLE_FIELDS) == [(cutoff, 6), (now, 1)]
+    assert tracker.peak_per_hour(end=now) == [
+        (START, 5), (START + HOUR, 1), (cutoff - HOUR, 4), (cutoff, 6), (now // HOUR * HOUR, 1)]
+
+
+def test_peak_per_hour_range(tmp_path):
+    tracker = PlayerTracker(path=str(tmp_path), raw_days=1)
+    for poll_time, count in [(START + 60, 1), (START + 120, 3), (START + HOUR + 60, 2), (START + 2 * HOUR, 0)]:
+        tracker.update(players(*map(str, range(count))), now=poll_time)
+    assert tracker.peak_per_hour(end=START + 3 * HOUR) == [(START, 3), (START + HOUR, 2), (START + 2 * HOUR, 0)]
+    assert tracker.peak_per_hour(start=START + HOUR, end=START + HOUR + 60) == [(START + HOUR, 2)]
+
+
+def test_join_and_leave_events(tmp_path):
+    tracker = PlayerTracker(path=str(tmp_path))
+    assert [(e["event"], e["name"]) for e in tracker.update(players("alice", "bob"), now=START)] == \
+        [("join", "alice"), ("join", "bob")]
+    assert tracker.update(players("alice", "bob"), now=START + 60) == []
+    events = tracker.update(players("bob", "carol"), now=START + 120)
+    assert [(e["event"], e["userId"]) for e in events] == [("join", "steam_carol"), ("leave", "steam_alice")]
+    assert all(e["time"] == START + 120 for e in events)
+
+    # A fresh tracker picks up who was online from disk rather than reporting everyone as joining
+    tracker = PlayerTracker(path=str(tmp_path))
+    tracker.update([], now=START + 180)
+    sessions = [(s["name"], s["start"], s["end"]) for s in tracker.sessions()]
+    assert sessions == [("alice", START, START + 120), ("bob", START, START + 180), ("carol", START + 120, START + 180)]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+import palworld_util
+from utility import backup_catalog
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    saves = tmp_path / "saves"
+    saves.mkdir()
+    (saves / "Level.sav").write_bytes(b"\0" * 1000)
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    monkeypatch.setattr(palworld_util, "BACKUP_FORMAT", "tar")
+    monkeypatch.setattr(palworld_util, "DISK_SPACE_MARGIN", 1.5)
+    monkeypatch.setattr(palworld_util, "DISK_RESERVE_BYTES", 10000)
+    return str(saves), str(backups)
+
+
+def _record(backups, name, size, source_size, codec):
+    conn = backup_catalog.open_catalog(backups)
+    backup_catalog.record_backup(conn, f"{backups}/{name}", datetime(2026, 1, 1), size, source_size, codec=codec)
+    conn.close()
+
+
+def test_estimate_without_history_assumes_no_gain(dirs):
+    assert palworld_util.estimate_backup_size(*dirs) == 1000
+    assert palworld_util.estimate_backup_size(*dirs, codec="zstd") == 1000
+
+
+def test_estimate_uses_the_codec_ratio_then_any_ratio(dirs):
+    saves, backups = dirs
+    _record(backups, "Palworld_2026-01-01_00-00-00.tar.gz", 500, 1000, "gzip")
+    assert palworld_util.estimate_backup_size(saves, backups, "gzip") == 500
+    # No zstd history yet, fall back to the ratio of every backup
+    assert palworld_util.estimate_backup_size(saves, backups, "zstd") == 500
+    _record(backups, "Palworld_2026-01-02_00-00-00.tar.zst", 250, 1000, "zstd")
+    assert palworld_util.estimate_backup_size(saves, backups, "zstd") == 250
+
+
+@pytest.mark.parametrize("free_space, expected", [(11500, True), (11499, False), (9999, False)])
+def test_preflight_keeps_the_reserve_free(dirs, monkeypatch, free_space, expected):
+    # 1000 bytes expected, times the 1.5 margin, plus the 10000 byte reserve
+    monkeypatch.setattr(palworld_util, "check_disk_space", lambda path: free_space)
+    assert palworld_util.preflight_backup(*dirs) is expected
+
+
+def test_preflight_dedup_only_checks_the_reserve(dirs, monkeypatch):
+    monkeypatch.setattr(palworld_util, "BACKUP_FORMAT", "dedup")
+    monkeypatch.setattr(palworld_util, "check_disk_space", lambda path: 10000)
+    assert palworld_util.preflight_backup(*dirs)
+    monkeypatch.setattr(palworld_util, "check_disk_space", lambda path: 9999)
+    assert not palworld_util.preflight_backup(*dirs)
@@ -0,0 +1,154 @@
+import contextlib
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from benchmarks.mock_server import MockPalworld
+from rcon import rcon_command
+from rcon.rcon_client import RconAuthError, RconClient, RconError, parse_info, parse_show_players
+
+PASSWORD = "secret"
+
+
+@pytest.fixture
+def mock():
+    with MockPalworld(players=200, save_delay=0, password=PASSWORD).serve("127.0.0.1", 0, 0) as server:
+        yield server
+
+
+def test_multi_packet_reply_is_joined(mock):
+    client = RconClient(*mock.rcon_address, PASSWORD)
+    try:
+        text = client.execute("ShowPlayers")
+        # 200 players do not fit in one 4096 byte packet
+        assert len(text.encode()) > 4096
+        players = parse_show_players(text)
+        assert [p["name"] for p in players] == [f"player{i}" for i in range(200)]
+        # Nothing left over leaks into the next reply
+        assert parse_info(client.execute("Info"))["servername"] == "Benchmark Server"
+    finally:
+        client.close()
+
+
+def test_pipelined_replies_keep_their_order(mock):
+    client = RconClient(*mock.rcon_address, PASSWORD)
+    try:
+        info, players, save = client.execute_many(["Info", "ShowPlayers", "Save"])
+    finally:
+        client.close()
+    assert info.startswith("Welcome to Pal Server")
+    assert len(parse_show_players(players)) == 200
+    assert save == "Save done."
+
+
+def test_wrong_password(mock):
+    client = RconClient(*mock.rcon_address, "wrong")
+    with pytest.raises(RconAuthError):
+        client.execute("Info")
+    assert client.sock is None
+
+
+def test_reconnects_after_the_connection_drops(mock):
+    client = RconClient(*mock.rcon_address, PASSWORD)
+    try:
+        client.execute("Info")
+        client.sock.shutdown(socket.SHUT_RDWR)
+        assert client.execute("Info").startswith("Welcome")
+    finally:
+        client.close()
+
+
+def _garbage_server():
+    # Accepts the auth, then answers every command with an impossible packet size
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def handle():
+        connection, _ = server.accept()
+        with connection:
+            size, request_id = struct.unpack("<ii", connection.recv(12)[:8])
+            connection.recv(4096)
+            payload = struct.pack("<ii", request_id, 2) + b"\x00\x00"
+            connection.sendall(struct.pack("<i", len(payload)) + payload)
+            connection.recv(4096)
+            connection.sendall(struct.pack("<i", 1 << 20))
+            connection.recv(4096)
+        server.close()
+
+    threading.Thread(target=handle, daemon=True).start()
+    return server.getsockname()
+
+
+def test_bad_packet_closes_the_connection():
+    client = RconClient(*_garbage_server(), PASSWORD, timeout=5)
+    with pytest.raises(RconError, match="Invalid RCON packet size"):
+        client.execute("Info")
+    assert client.sock is None
+
+
+def _slow_server(delay):
+    # Authenticates, then answers every command 'delay' seconds after it arrives. Returns the address and
+    # the list of commands received.
+    server = socket.create_server(("127.0.0.1", 0))
+    received = []
+
+    def read_packet(connection):
+        header = connection.recv(4, socket.MSG_WAITALL)
+        if len(header) < 4:
+            return None
+        packet = connection.recv(struct.unpack("<i", header)[0], socket.MSG_WAITALL)
+        request_id, packet_type = struct.unpack("<ii", packet[:8])
+        return request_id, packet_type, packet[8:-2].decode()
+
+    def send_packet(connection, request_id, packet_type, body):
+        payload = struct.pack("<ii", request_id, packet_type) + body.encode() + b"\x00\x00"
+        connection.sendall(struct.pack("<i", len(payload)) + payload)
+
+    def handle():
+        connection, _ = server.accept()
+        with connection, contextlib.suppress(OSError):
+            # The client may give up and close before the reply is sent
+            request_id, _, _ = read_packet(connection)
+            send_packet(connection, request_id, 2, "")
+            while True:
+                packet = read_packet(connection)
+                if packet is None:
+                    break
+                request_id, packet_type, body = packet
+                if packet_type == 2:
+                    received.append(body)
+                    time.sleep(delay)
+                    send_packet(connection, request_id, 0, f"{body} done.")
+                else:
+                    send_packet(connection, request_id, 0, "")
+        server.close()
+
+    threading.Thread(target=handle, daemon=True).start()
+    return server.getsockname(), received
+
+
+def test_reply_timeout_does_not_resend():
+    address, received = _slow_server(1)
+    client = RconClient(*address, PASSWORD, timeout=0.2)
+    with pytest.raises(RconError):
+        client.execute("Broadcast hello")
+    assert client.sock is None
+    time.sleep(0.2)
+    assert received == ["Broadcast hello"]
+
+
+def test_no_reply_timeout_waits_for_a_slow_save():
+    address, received = _slow_server(0.5)
+    client = RconClient(*address, PASSWORD, timeout=0.2)
+    try:
+        assert client.execute("Save", timeout=None) == "Save done."
+    finally:
+        client.close()
+    assert received == ["Save"]
+
+
+def test_save_has_no_reply_timeout():
+    assert rcon_command.reply_timeout(["info", "save"]) is None
+    assert rcon_command.reply_timeout(["info"]) == rcon_command.rcon_client().timeout
@@ -0,0 +1,75 @@
+import contextlib
+import socket
+import threading
+
+import pytest
+
+from utility import readiness
+
+
+@pytest.fixture
+def listening_port():
+    # An open port with nothing behind it that answers the API, like a server that is still starting
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def accept():
+        with contextlib.suppress(OSError):
+            while True:
+                server.accept()[0].close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield server.getsockname()[1]
+    server.close()
+
+
+@pytest.fixture
+def closed_port():
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    server.close()
+    return port
+
+
+def test_returns_at_the_first_probe_in_the_expected_state(listening_port):
+    result = readiness.wait_for_state(True, 5, "127.0.0.1", listening_port, confirm=lambda: True)
+    assert result.reached and result.attempts == 1
+
+
+def test_open_port_with_the_api_down_is_not_running(listening_port):
+    confirmed = []
+    result = readiness.wait_for_state(True, 0.3, "127.0.0.1", listening_port,
+                                      confirm=lambda: confirmed.append(True) and False)
+    assert not result.reached
+    # Every probe got past the TCP check and asked the API
+    assert len(confirmed) == result.attempts > 1
+
+
+def test_closed_port_never_asks_the_api(closed_port):
+    result = readiness.wait_for_state(False, 1, "127.0.0.1", closed_port, confirm=lambda: pytest.fail("API probed"))
+    assert result.reached
+
+
+def test_backoff_stays_within_bounds(listening_port, monkeypatch):
+    # A clock that only moves when the probe loop sleeps
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(readiness.time, "sleep", sleep)
+    monkeypatch.setattr(readiness.time, "monotonic", lambda: now[0])
+    result = readiness.wait_for_state(True, 20, "127.0.0.1", listening_port, confirm=lambda: False)
+    assert not result.reached and result.elapsed == pytest.approx(20)
+    delay = readiness.INITIAL_DELAY
+    # The last sleep is cut short by the timeout
+    for slept in sleeps[:-1]:
+        assert delay / 2 <= slept <= delay
+        delay = min(readiness.MAX_DELAY, delay * 2)
+    assert delay == readiness.MAX_DELAY
+
+
+def test_gives_up_after_the_timeout(listening_port):
+    result = readiness.wait_for_state(True, 0.5, "127.0.0.1", listening_port, confirm=lambda: False)
+    assert not result.reached
+    assert 0.5 <= result.elapsed < 1.5
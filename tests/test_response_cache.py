@@ -0,0 +1,69 @@
+import os
+import stat
+
+import pytest
+
+from utility import response_cache, runtime_dir
+from utility.detect_api import CommandResult
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "CACHE_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(response_cache, "_directory", None)
+    monkeypatch.setattr(response_cache, "enabled", True)
+    return tmp_path / "cache"
+
+
+def _fetcher(calls):
+    def fetch():
+        calls.append(1)
+        return CommandResult("players", status=200, data={"players": [len(calls)]})
+    return fetch
+
+
+def test_cache_directory_is_private(cache):
+    calls = []
+    response_cache.cached_get("http://server/", "players", _fetcher(calls))
+    result = response_cache.cached_get("http://server/", "players", _fetcher(calls))
+    assert result.cached and result.data == {"players": [1]}
+    assert stat.S_IMODE(os.stat(cache).st_mode) == 0o700
+
+
+def test_readable_directory_is_made_private(cache):
+    cache.mkdir(mode=0o755)
+    os.chmod(cache, 0o755)
+    assert response_cache.cache_dir() == str(cache)
+    assert stat.S_IMODE(os.stat(cache).st_mode) == 0o700
+
+
+@pytest.mark.parametrize("mode", [0o777, 0o770])
+def test_directory_writable_by_others_is_refused(cache, mode):
+    cache.mkdir()
+    os.chmod(cache, mode)
+    calls = []
+    for _ in range(2):
+        assert not response_cache.cached_get("http://server/", "players", _fetcher(calls)).cached
+    assert len(calls) == 2
+    assert os.listdir(cache) == []
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="needs root to hand the directory over")
+def test_directory_of_another_user_is_refused(cache):
+    cache.mkdir(mode=0o700)
+    os.chown(cache, 65534, 65534)
+    assert response_cache.cache_dir() is None
+
+
+def test_symlink_is_refused(cache, tmp_path):
+    (tmp_path / "elsewhere").mkdir(mode=0o700)
+    os.symlink(tmp_path / "elsewhere", cache)
+    assert response_cache.cache_dir() is None
+
+
+def test_default_path_follows_xdg_runtime_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert runtime_dir.default_path() == str(tmp_path / "palworld_util")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert runtime_dir.default_path() == str(tmp_path / ".cache" / "palworld_util")
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import palworld_util
+from utility import restore
+
+
+def test_safe_path_accepts_a_relative_target(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert restore._safe_path("saves", "./Players/0001.sav") == str(tmp_path / "saves" / "Players" / "0001.sav")
+
+
+@pytest.mark.parametrize("name", ["../outside.sav", "/etc/passwd", "Players/../../outside.sav"])
+def test_safe_path_refuses_to_leave_the_target(tmp_path, name):
+    with pytest.raises(restore.RestoreError):
+        restore._safe_path(str(tmp_path / "saves"), name)
+
+
+def test_replace_file_keeps_the_previous_version(tmp_path):
+    (tmp_path / "Players").mkdir()
+    (tmp_path / "Players" / "0001.sav").write_bytes(b"old")
+    restore.replace_file(str(tmp_path), "./Players/0001.sav", b"new")
+    assert (tmp_path / "Players" / "0001.sav").read_bytes() == b"new"
+    assert (tmp_path / "Players" / "0001.sav.pre-restore").read_bytes() == b"old"
+
+
+def test_restore_aborts_when_the_server_does_not_stop(tmp_path, monkeypatch):
+    save_dir = tmp_path / "0"
+    (save_dir / "Players").mkdir(parents=True)
+    (save_dir / "Players" / "0001.sav").write_bytes(b"live")
+    started = []
+    monkeypatch.setattr(palworld_util, "resolve_backup", lambda backup: ("backup.tar.gz", None))
+    monkeypatch.setattr(palworld_util, "set_gamesave_dir", lambda: str(save_dir))
+    monkeypatch.setattr(restore, "read_player_file", lambda *args: ("./Players/0001.sav", b"restored"))
+    monkeypatch.setattr(palworld_util, "check_if_running", lambda **kwargs: True)
+    monkeypatch.setattr(palworld_util, "stop_service", lambda wait_time: False)
+    monkeypatch.setattr(palworld_util, "start_service", lambda: started.append(True))
+
+    assert palworld_util.restore_backup("latest", "0001") is False
+    assert (save_dir / "Players" / "0001.sav").read_bytes() == b"live"
+    assert not os.path.exists(save_dir / "Players" / "0001.sav.pre-restore")
+    assert not started
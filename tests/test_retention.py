@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from utility import retention
+
+
+def test_select_old_backups():
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    yesterday = now - timedelta(days=1)
+    backups = [(now - timedelta(hours=3), "today-1"), (now - timedelta(hours=2), "today-2"),
+               (now - timedelta(hours=1), "today-3"), (yesterday, "yesterday-1"),
+               (yesterday + timedelta(hours=1), "yesterday-2"), (now - timedelta(days=10), "old")]
+    assert sorted(retention.select_old_backups(backups, days_to_keep=3)) == ["today-1", "yesterday-1"]
+
+
+def test_keeps_everything_outside_the_window():
+    # Days past days_to_keep are left alone, the policy only thins out recent days
+    backups = [(datetime.now() - timedelta(days=10, hours=hour), f"old-{hour}") for hour in range(3)]
+    assert retention.select_old_backups(backups, days_to_keep=3) == []
+
+
+def test_list_archives(tmp_path):
+    for name in ["Palworld_2026-01-01_00-00-00.tar.gz", "Palworld_2026-01-01.tar.gz", "other.tar.gz"]:
+        (tmp_path / name).write_bytes(b"")
+    assert retention.list_archives(str(tmp_path)) == [(datetime(2026, 1, 1),
+                                                       str(tmp_path / "Palworld_2026-01-01_00-00-00.tar.gz"))]
@@ -0,0 +1,148 @@
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+jeepney = pytest.importorskip("jeepney")
+from jeepney import DBusAddress, HeaderFields, MessageType, new_error, new_method_return, new_signal
+from jeepney.bus_messages import message_bus
+from jeepney.io.blocking import open_dbus_connection
+
+from utility import systemd_dbus
+
+UNIT_PATH = "/org/freedesktop/systemd1/unit/"
+
+
+def unit_path(unit):
+    # systemd escapes unit names the same way, object paths cannot contain '.'
+    return UNIT_PATH + unit.replace(".", "_2e").replace("-", "_2d")
+
+
+class FakeSystemd:
+    """
+    A minimal org.freedesktop.systemd1 on a private bus: units change state as soon as a job is queued.
+      Units named in 'failing' finish every job with result "failed" and stay where they are, jobs for units in
+      'hanging' never finish.
+    """
+
+    def __init__(self, bus_address, failing=(), hanging=()):
+        self.conn = open_dbus_connection(bus=bus_address)
+        self.conn.send_and_get_reply(message_bus.RequestName(systemd_dbus.SYSTEMD_BUS_NAME))
+        self.failing = failing
+        self.hanging = hanging
+        self.states = {}
+        self.calls = []
+        self.jobs = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.conn.close()
+
+    def _serve(self):
+        while self.running:
+            try:
+                msg = self.conn.receive(timeout=0.1)
+            except TimeoutError:
+                continue
+            if msg.header.message_type == MessageType.method_call:
+                self._handle(msg)
+
+    def _emit(self, path, interface, member, signature, body):
+        self.conn.send(new_signal(DBusAddress(path, interface=interface), member, signature, body))
+
+    def _set_state(self, unit, state):
+        self.states[unit] = state
+        self._emit(unit_path(unit), "org.freedesktop.DBus.Properties", "PropertiesChanged", "sa{sv}as",
+                   (systemd_dbus.UNIT_INTERFACE, {"ActiveState": ("s", state)}, []))
+
+    def _handle(self, msg):
+        member = msg.header.fields[HeaderFields.member]
+        self.calls.append(member)
+        if member == "Subscribe":
+            self.conn.send(new_method_return(msg))
+        elif member == "LoadUnit":
+            self.conn.send(new_method_return(msg, "o", (unit_path(msg.body[0]),)))
+        elif member == "Get":
+            states = {unit_path(unit): state for unit, state in self.states.items()}
+            state = states.get(msg.header.fields[HeaderFields.path], "inactive")
+            self.conn.send(new_method_return(msg, "v", (("s", state),)))
+        elif member in ["StartUnit", "StopUnit", "RestartUnit"]:
+            unit = msg.body[0]
+            self.jobs += 1
+            job_path = f"/org/freedesktop/systemd1/job/{self.jobs}"
+            self.conn.send(new_method_return(msg, "o", (job_path,)))
+            if unit in self.hanging:
+                return
+            if unit in self.failing:
+                result = "failed"
+            else:
+                result = "done"
+                self._set_state(unit, "inactive" if member == "StopUnit" else "active")
+            self._emit(systemd_dbus.SYSTEMD_PATH, systemd_dbus.MANAGER_INTERFACE, "JobRemoved", "uoss",
+                       (self.jobs, job_path, unit, result))
+        elif member == "KillUnit":
+            self.conn.send(new_method_return(msg))
+            self._set_state(msg.body[0], "failed")
+        else:
+            self.conn.send(new_error(msg, "org.freedesktop.DBus.Error.UnknownMethod"))
+
+
+@pytest.fixture
+def bus_address():
+    if not shutil.which("dbus-daemon"):
+        pytest.skip("dbus-daemon is not installed")
+    daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        yield daemon.stdout.readline().strip()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+
+@pytest.fixture
+def systemd(bus_address, monkeypatch):
+    monkeypatch.setattr(systemd_dbus, "SYSTEMD_BACKEND", "auto")
+    fake = FakeSystemd(bus_address, failing=["broken.service"], hanging=["stuck.service"])
+    yield fake
+    fake.close()
+
+
+def test_start_stop_restart(systemd, bus_address):
+    assert systemd_dbus.control_unit("start", "palworld.service", 5, bus_address) == \
+        (True, "palworld.service is active")
+    assert systemd.states["palworld.service"] == "active"
+    assert systemd_dbus.control_unit("stop", "palworld.service", 5, bus_address) == \
+        (True, "palworld.service is inactive")
+    assert systemd_dbus.control_unit("restart", "palworld.service", 5, bus_address) == \
+        (True, "palworld.service is active")
+    assert systemd.calls.count("Subscribe") == 3
+    jobs = ["StartUnit", "StopUnit", "RestartUnit"]
+    assert [call for call in systemd.calls if call in jobs] == jobs
+
+
+def test_kill(systemd, bus_address):
+    assert systemd_dbus.control_unit("kill", "palworld.service", 5, bus_address) == \
+        (True, "palworld.service is failed")
+
+
+def test_failed_job(systemd, bus_address):
+    ok, detail = systemd_dbus.control_unit("start", "broken.service", 5, bus_address)
+    assert not ok
+    assert detail == "start job for broken.service finished with result 'failed'"
+
+
+def test_job_timeout(systemd, bus_address):
+    ok, detail = systemd_dbus.control_unit("stop", "stuck.service", 0.5, bus_address)
+    assert not ok
+    assert detail == "StopUnit stuck.service did not finish within 0.5 seconds."
+
+
+def test_no_bus_falls_back_to_systemctl(tmp_path, monkeypatch):
+    monkeypatch.setattr(systemd_dbus, "SYSTEMD_BACKEND", "auto")
+    assert systemd_dbus.control_unit("start", "palworld.service", 5, f"unix:path={tmp_path}/missing") is None
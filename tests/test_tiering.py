@@ -0,0 +1,64 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from utility import backup_catalog, compression, tiering
+
+
+@pytest.fixture
+def archive(tmp_path):
+    saves = tmp_path / "saves"
+    saves.mkdir()
+    (saves / "Level.sav").write_bytes(b"level" * 20000)
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    path = str(backups / "Palworld_2026-01-01_00-00-00.tar.gz")
+    stats = compression.compress_tree(str(saves), path)
+    conn = backup_catalog.open_catalog(str(backups))
+    backup_catalog.record_backup(conn, path, datetime(2026, 1, 1), stats.bytes_out, source_size=100000,
+                                 sha256=stats.sha256)
+    yield conn, path
+    conn.close()
+
+
+def _files(path):
+    return sorted(os.listdir(os.path.dirname(path)))
+
+
+def test_tier_backup_swaps_the_catalog_entry(archive):
+    conn, path = archive
+    new_path = path.replace(".tar.gz", ".tar.xz")
+    assert tiering.tier_backup(conn, path, "xz", None, 1) is not None
+    assert backup_catalog.list_backups(conn) == [(datetime(2026, 1, 1), new_path)]
+    entry = backup_catalog.get_backup(conn, new_path)
+    assert entry["codec"] == "xz"
+    assert entry["source_size"] == 100000
+    assert not os.path.exists(path)
+    assert compression.verify_backup(new_path, entry["sha256"]) == []
+
+
+def test_verify_failure_keeps_the_original(archive, monkeypatch):
+    conn, path = archive
+    before = _files(path)
+    monkeypatch.setattr(compression, "verify_backup", lambda *args: ["checksum mismatch"])
+    assert tiering.tier_backup(conn, path, "xz", None, 1) is None
+    # The staged copy and its manifest are gone, the original and its entry are untouched
+    assert _files(path) == before
+    assert backup_catalog.list_backups(conn) == [(datetime(2026, 1, 1), path)]
+
+
+def test_source_deleted_by_retention_mid_run(archive, monkeypatch):
+    conn, path = archive
+    recompress = compression.recompress_archive
+
+    def recompress_while_retention_runs(*args, **kwargs):
+        stats = recompress(*args, **kwargs)
+        backup_catalog.remove_backup(conn, path)
+        return stats
+
+    monkeypatch.setattr(compression, "recompress_archive", recompress_while_retention_runs)
+    assert tiering.tier_backup(conn, path, "xz", None, 1) is None
+    # The new copy is not left behind as an uncatalogued archive
+    assert not [name for name in _files(path) if "Palworld" in name]
+    assert backup_catalog.list_backups(conn) == []
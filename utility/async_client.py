@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.detect_api import CommandResult, PalworldClient, execute
+
+
+class AsyncPalworldClient:
+    """
+    asyncio front end for PalworldClient.
+      Requests run on a small thread pool that shares the client's keep-alive connections,
+      so several commands are in flight at once. Each request has its own timeout; the caller gets a
+      CommandResult either way.
+    """
+
+    def __init__(self, client=None, max_concurrency=4):
+        self.client = client or PalworldClient(pool_size=max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def fetch(self, command, *args, timeout=10):
+        """
+        Sends one command. Cancellation is best-effort: cancelling the task or timing out only stops the
+          wait, the HTTP request is not aborted and holds its worker thread until it finishes or hits its
+          own timeout.
+        Args:
+            command (str): Command name, see valid_commands.
+            timeout (float): Seconds to wait for the reply.
+        Returns:
+            CommandResult: The reply, or an error result on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        # The HTTP timeout frees the worker thread shortly after asyncio gives up on it
+        future = loop.run_in_executor(
+            self.executor, lambda: execute(command, *args, client=self.client, request_timeout=timeout))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return CommandResult(command, error=f"Timed out after {timeout} seconds.", elapsed=timeout)
+
+    async def fetch_many(self, commands, timeout=10):
+        """
+        Sends several commands at once.
+        Args:
+            commands (list): Command names, or (command, args...) tuples.
+        Returns:
+            list: (command name, CommandResult) tuples, in the order given. The same command may appear more
+              than once, e.g. with different arguments.
+        """
+        requests = [(c,) if isinstance(c, str) else tuple(c) for c in commands]
+        results = await asyncio.gather(*(self.fetch(*r, timeout=timeout) for r in requests))
+        return [(request[0], result) for request, result in zip(requests, results)]
+
+    def close(self):
+        """
+        Drops queued requests and waits for the running ones before closing the connections they use.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        # Running requests can take up to their timeout, wait for them off the event loop
+        await asyncio.to_thread(self.close)
+
+
+def run_commands(commands, timeout=10):
+    """
+    Synchronous helper: sends several read commands concurrently and waits for all of them.
+    Returns:
+        list: (command name, CommandResult) tuples, in the order given.
+    """
+    async def _run():
+        async with AsyncPalworldClient(max_concurrency=len(commands)) as client:
+            return await client.fetch_many(commands, timeout)
+    return asyncio.run(_run())
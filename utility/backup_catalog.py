@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from utility.compression import CompressionStats, available_codecs, benchmark_codecs, codec_for_path, manifest_path
+from utility.logging_config import log_info
+from utility.retention import list_archives
+
+CATALOG_FILE = "catalog.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    path TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    source_size INTEGER,
+    sha256 TEXT,
+    codec TEXT
+)
+"""
+
+# Results of the last benchmark_codecs() run on this server's saves, for COMPRESSION_CODEC "auto"
+_BENCHMARK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS codec_benchmarks (
+    codec TEXT NOT NULL,
+    level INTEGER,
+    bytes_in INTEGER NOT NULL,
+    bytes_out INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    measured REAL NOT NULL
+)
+"""
+
+
+def open_catalog(backups_path):
+    """
+    Opens the backup catalog stored in the backups folder.
+      A missing catalog is created and filled from the archives already on disk.
+    Returns:
+        sqlite3.Connection: Open catalog.
+    """
+    catalog_file = os.path.join(backups_path, CATALOG_FILE)
+    is_new = not os.path.exists(catalog_file)
+    conn = sqlite3.connect(catalog_file, timeout=30)
+    conn.execute(_SCHEMA)
+    conn.execute(_BENCHMARK_SCHEMA)
+    if is_new:
+        rebuild_catalog(conn, backups_path)
+    return conn
+
+
+def rebuild_catalog(conn, backups_path):
+    """
+    Replaces the catalog contents with the archives found on disk.
+      Sizes come from the filesystem. Checksums and source sizes of archives the catalog
+      did not know about are left empty.
+    Returns:
+        int: Number of archives in the catalog.
+    """
+    known = {row[0]: row for row in conn.execute("SELECT path, source_size, sha256 FROM backups")}
+    rows = []
+    for backup_time, path in list_archives(backups_path):
+        _, source_size, sha256 = known.get(path, (path, None, None))
+        rows.append((path, backup_time.timestamp(), os.path.getsize(path), source_size, sha256, codec_for_path(path)))
+    with conn:
+        conn.execute("DELETE FROM backups")
+        conn.executemany("INSERT INTO backups VALUES (?, ?, ?, ?, ?, ?)", rows)
+    log_info(f"Backup catalog rebuilt with {len(rows)} archives.")
+    return len(rows)
+
+
+def record_backup(conn, path, created, size, source_size=None, sha256=None, codec=None):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO backups VALUES (?, ?, ?, ?, ?, ?)",
+                     (path, created.timestamp(), size, source_size, sha256, codec or codec_for_path(path)))
+
+
+def remove_backup(conn, path):
+    """
+    Deletes an archive, its manifest and its catalog entry together. If the file cannot be removed the
+    entry is kept.
+    """
+    with conn:
+        conn.execute("DELETE FROM backups WHERE path = ?", (path,))
+        if os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(manifest_path(path)):
+            os.remove(manifest_path(path))
+
+
+def replace_backup(conn, old_path, new_path, size, sha256, codec):
+    """
+    Points a catalog entry at a rewritten copy of the archive, keeping its creation time and source size.
+    Returns:
+        bool: False if the entry no longer exists, e.g. retention deleted the archive meanwhile.
+    """
+    with conn:
+        row = conn.execute("SELECT created, source_size FROM backups WHERE path = ?", (old_path,)).fetchone()
+        if not row:
+            return False
+        conn.execute("DELETE FROM backups WHERE path = ?", (old_path,))
+        conn.execute("INSERT OR REPLACE INTO backups VALUES (?, ?, ?, ?, ?, ?)",
+                     (new_path, row[0], size, row[1], sha256, codec))
+    return True
+
+
+def list_backups(conn):
+    """
+    Returns:
+        list: (datetime, path) tuples, oldest first, in the form select_old_backups() expects.
+    """
+    return [(datetime.fromtimestamp(created), path)
+            for created, path in conn.execute("SELECT created, path FROM backups ORDER BY created")]
+
+
+def get_backup(conn, path):
+    """
+    Returns:
+        dict: Catalog entry for 'path', None if unknown.
+    """
+    cursor = conn.execute("SELECT path, created, size, source_size, sha256, codec FROM backups WHERE path = ?",
+                          (path,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return dict(zip([c[0] for c in cursor.description], row))
+
+
+def average_size(conn):
+    """
+    Average archive size, skipping the most recent backup.
+    Returns:
+        float: Size in bytes, 0 if there are not enough backups.
+    """
+    row = conn.execute("SELECT AVG(size) FROM backups WHERE created < (SELECT MAX(created) FROM backups)").fetchone()
+    return row[0] or 0
+
+
+def average_ratio(conn, codec=None):
+    """
+    Args:
+        codec (str): Only average backups made with this codec, None for all.
+    Returns:
+        float: Average compressed/uncompressed size over the backups that recorded both, None if there are none.
+    """
+    query = "SELECT SUM(size), SUM(source_size) FROM backups WHERE source_size > 0"
+    if codec:
+        row = conn.execute(f"{query} AND codec = ?", (codec,)).fetchone()
+    else:
+        row = conn.execute(query).fetchone()
+    if not row[1]:
+        return None
+    return row[0] / row[1]
+
+
+def record_benchmark(conn, results):
+    """
+    Replaces the stored codec benchmark with 'results', a list of CompressionStats from benchmark_codecs().
+    """
+    now = time.time()
+    with conn:
+        conn.execute("DELETE FROM codec_benchmarks")
+        conn.executemany("INSERT INTO codec_benchmarks VALUES (?, ?, ?, ?, ?, ?)",
+                         [(r.codec, r.level, r.bytes_in, r.bytes_out, r.seconds, now) for r in results])
+
+
+def benchmark_results(conn, input_folder, max_age, workers=0):
+    """
+    Returns the stored codec benchmark, benchmarking 'input_folder' again when it is older than 'max_age'
+    seconds or measured codecs that are no longer available.
+    Returns:
+        list: CompressionStats, one per candidate, as benchmark_codecs() returns them.
+    """
+    rows = conn.execute("SELECT codec, level, bytes_in, bytes_out, seconds, measured FROM codec_benchmarks").fetchall()
+    if rows and min(row[5] for row in rows) >= time.time() - max_age and \
+            all(row[0] in available_codecs() for row in rows):
+        return [CompressionStats(*row[:5]) for row in rows]
+    results = benchmark_codecs(input_folder, workers=workers)
+    record_benchmark(conn, results)
+    return results
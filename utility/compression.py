@@ -0,0 +1,591 @@
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import shutil
+import tarfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utility.logging_config import log_info
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Uncompressed size of each independently compressed block
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Per-file checksums written next to each archive: <archive><MANIFEST_SUFFIX>
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Archive extension per codec
+CODEC_EXTENSIONS = {
+    "gzip": ".tar.gz",
+    "zstd": ".tar.zst",
+    "lz4": ".tar.lz4",
+    "xz": ".tar.xz"
+}
+
+DEFAULT_LEVELS = {
+    "gzip": 6,
+    "zstd": 3,
+    "lz4": 0,
+    "xz": 6
+}
+
+# Codec/level pairs tried when choosing a codec automatically, roughly fastest first
+BENCHMARK_CANDIDATES = [
+    ("lz4", 0),
+    ("zstd", 1),
+    ("gzip", 1),
+    ("zstd", 3),
+    ("gzip", 6),
+    ("zstd", 10),
+    ("gzip", 9),
+    ("zstd", 19)
+]
+
+
+def available_codecs():
+    codecs = ["gzip", "xz"]
+    if zstandard:
+        codecs.append("zstd")
+    if lz4:
+        codecs.append("lz4")
+    return codecs
+
+
+def _compress_block(codec, level, block):
+    # Every block is a complete gzip member / zstd frame / lz4 frame / xz stream, so the
+    # concatenated output is readable by the standard tools for each format.
+    if codec == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
+    elif codec == "xz":
+        return lzma.compress(block, preset=level)
+    elif codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(block)
+    elif codec == "lz4":
+        return lz4.frame.compress(block, compression_level=level)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _decompress_block(codec, block):
+    if codec == "gzip":
+        return zlib.decompress(block, 31)
+    elif codec == "xz":
+        return lzma.decompress(block)
+    elif codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(block)
+    elif codec == "lz4":
+        return lz4.frame.decompress(block)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class TornReadError(Exception):
+    """A file changed while it was being archived."""
+
+
+class DiskSpaceError(OSError):
+    """The destination filesystem is about to fill up."""
+
+
+class CompressionStats:
+    def __init__(self, codec, level, bytes_in, bytes_out, seconds, sha256=None, files=None, blocks=None):
+        self.codec = codec
+        self.level = level
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.seconds = seconds
+        self.sha256 = sha256
+        # Archive member name -> {"size", "sha256", "offset"}
+        self.files = files or {}
+        # Compressed size of each block, in order
+        self.blocks = blocks or []
+
+    @property
+    def ratio(self):
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes_in / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (f"CompressionStats({self.codec}:{self.level}, in={self.bytes_in}, out={self.bytes_out}, "
+                f"ratio={self.ratio:.3f}, {self.bytes_per_second / 1048576:.1f} MB/s)")
+
+
+class BlockCompressWriter(io.RawIOBase):
+    """
+    Write-only file object that compresses fixed-size blocks on a thread pool.
+      zlib, lzma, zstd and lz4 release the GIL while compressing, so blocks compress on all cores.
+      Compressed blocks are written to the output in their original order.
+    """
+
+    def __init__(self, fileobj, codec="gzip", level=None, workers=0, block_size=BLOCK_SIZE, min_free=0,
+                 throttle=None):
+        super().__init__()
+        if codec not in available_codecs():
+            raise ValueError(f"Codec '{codec}' is not available. Available codecs: {available_codecs()}")
+        self.fileobj = fileobj
+        self.codec = codec
+        self.level = DEFAULT_LEVELS[codec] if level is None else level
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Checksum of the compressed output, computed as it is written
+        self.sha256 = hashlib.sha256()
+        # Compressed size of each block written, the archive's seek index
+        self.block_sizes = []
+        # Stop before the output filesystem has less than this many bytes left
+        self.min_free = min_free
+        self.watch_path = os.path.dirname(os.path.abspath(fileobj.name)) if min_free else None
+        # Bandwidth limit, see throttle.Throttle
+        self.throttle = throttle
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_in += len(data)
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(_compress_block, self.codec, self.level, block))
+        # Bound memory use: never hold more than two blocks per worker in flight
+        while len(self.pending) > self.workers * 2:
+            self._write_next()
+
+    def _write_next(self):
+        compressed = self.pending.popleft().result()
+        if self.min_free:
+            free_space = shutil.disk_usage(self.watch_path).free
+            if free_space - len(compressed) < self.min_free:
+                raise DiskSpaceError(f"Only {free_space} bytes left in {self.watch_path}, "
+                                     f"stopping to keep {self.min_free} bytes free.")
+        if self.throttle:
+            self.throttle.write(len(compressed))
+        self.fileobj.write(compressed)
+        self.sha256.update(compressed)
+        self.bytes_out += len(compressed)
+        self.block_sizes.append(len(compressed))
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self._write_next()
+        finally:
+            self.executor.shutdown(wait=True)
+            super().close()
+
+
+class HashingReader(io.RawIOBase):
+    """Read-only file object that checksums everything read through it, optionally at a limited rate."""
+
+    def __init__(self, fileobj, throttle=None):
+        super().__init__()
+        self.fileobj = fileobj
+        self.throttle = throttle
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        if self.throttle:
+            self.throttle.read(len(data))
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _add_file(tar, path, arcname, files, throttle=None):
+    before = os.stat(path)
+    info = tar.gettarinfo(path, arcname)
+    try:
+        if info.isreg():
+            # Checksum the file in the same read that archives it
+            with open(path, "rb") as f:
+                reader = HashingReader(f, throttle)
+                tar.addfile(info, reader)
+            # The data ends on the next 512-byte boundary, counting back from there finds where it starts
+            padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            files[arcname] = {"size": reader.size, "sha256": reader.sha256.hexdigest(),
+                              "offset": tar.offset - padded}
+        else:
+            tar.addfile(info)
+    except OSError as e:
+        if os.path.exists(path) and _file_state(os.stat(path)) == _file_state(before):
+            raise
+        raise TornReadError(f"{path} changed while it was being read.") from e
+    if not os.path.exists(path) or _file_state(os.stat(path)) != _file_state(before):
+        raise TornReadError(f"{path} changed while it was being read.")
+
+
+def _file_state(st):
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def compress_tree(input_folder, output_file, codec="gzip", level=None, workers=0, min_free=0, throttle=None):
+    """
+    Archives a folder into a compressed tar file, equivalent to 'tar -czf <output> -C <input> .'
+      Every file is checked for changes after it is read. A partial archive is removed on failure.
+      Per-file checksums and the archive checksum are computed in the same pass and written to
+      the archive's manifest, along with a block index for iter_member().
+    Args:
+        input_folder (str): Folder to archive.
+        output_file (str): Archive to create.
+        codec (str): One of available_codecs().
+        level (int): Compression level, None for the codec default.
+        workers (int): Compression threads, 0 for one per core.
+        min_free (int): Bytes to keep free on the output filesystem, 0 to not check.
+        throttle (Throttle): Read and write bandwidth limits, None for full speed.
+    Returns:
+        CompressionStats: Sizes and throughput of the run.
+    Raises:
+        TornReadError: A file was modified while it was archived.
+        DiskSpaceError: The output filesystem was about to fill up.
+    """
+    start_time = time.monotonic()
+    files = {}
+    try:
+        with open(output_file, "wb") as raw:
+            writer = BlockCompressWriter(raw, codec, level, workers, min_free=min_free, throttle=throttle)
+            try:
+                with tarfile.open(fileobj=writer, mode="w|") as tar:
+                    tar.add(input_folder, arcname=".", recursive=False)
+                    for root, dir_names, file_names in os.walk(input_folder):
+                        dir_names.sort()
+                        for name in dir_names:
+                            path = os.path.join(root, name)
+                            tar.add(path, arcname=f"./{os.path.relpath(path, input_folder)}", recursive=False)
+                        for name in sorted(file_names):
+                            path = os.path.join(root, name)
+                            _add_file(tar, path, f"./{os.path.relpath(path, input_folder)}", files, throttle)
+            finally:
+                writer.close()
+        stats = CompressionStats(writer.codec, writer.level, writer.bytes_in, writer.bytes_out,
+                                 time.monotonic() - start_time, writer.sha256.hexdigest(), files,
+                                 writer.block_sizes)
+        write_manifest(output_file, stats)
+    except BaseException:
+        remove_archive(output_file)
+        raise
+    log_info(f"Compressed {stats.bytes_in} bytes to {stats.bytes_out} bytes with {stats.codec}:{stats.level} "
+             f"at {stats.bytes_per_second / 1048576:.1f} MB/s.")
+    return stats
+
+
+def recompress_archive(input_file, output_file, codec, level=None, workers=0, min_free=0):
+    """
+    Rewrites an archive with another codec without unpacking it.
+      The tar stream is copied byte for byte, so the member offsets in the manifest stay valid;
+      only the block index and checksum are replaced. A partial output is removed on failure.
+    Returns:
+        CompressionStats: Sizes and throughput of the run. bytes_in is the tar stream size.
+    """
+    start_time = time.monotonic()
+    manifest = load_manifest(input_file)
+    try:
+        with open_decompressed(input_file) as stream, open(output_file, "wb") as raw:
+            writer = BlockCompressWriter(raw, codec, level, workers, min_free=min_free)
+            try:
+                while True:
+                    data = stream.read(BLOCK_SIZE)
+                    if not data:
+                        break
+                    writer.write(data)
+            finally:
+                writer.close()
+        stats = CompressionStats(writer.codec, writer.level, writer.bytes_in, writer.bytes_out,
+                                 time.monotonic() - start_time, writer.sha256.hexdigest(),
+                                 manifest["files"] if manifest else None, writer.block_sizes)
+        # Archives from before manifests existed have no file list to carry over
+        if manifest:
+            write_manifest(output_file, stats)
+    except BaseException:
+        for path in [output_file, manifest_path(output_file)]:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return stats
+
+
+def codec_for_path(path):
+    for codec, extension in CODEC_EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    raise ValueError(f"Unknown archive type: {path}")
+
+
+def open_decompressed(path):
+    """
+    Opens an archive created by compress_tree() for sequential reading of the tar stream.
+    """
+    codec = codec_for_path(path)
+    if codec not in available_codecs():
+        raise ValueError(f"Codec '{codec}' is not available to read {path}")
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    elif codec == "xz":
+        return lzma.open(path, "rb")
+    elif codec == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                          closefd=True)
+    return lz4.frame.open(path, "rb")
+
+
+def manifest_path(archive_path):
+    return f"{archive_path}{MANIFEST_SUFFIX}"
+
+
+def remove_archive(archive_path):
+    # The archive and its manifest, whichever exist
+    for path in [archive_path, manifest_path(archive_path)]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_manifest(archive_path, stats):
+    manifest = {"archive": os.path.basename(archive_path), "codec": stats.codec, "size": stats.bytes_out,
+                "sha256": stats.sha256, "block_size": BLOCK_SIZE, "blocks": stats.blocks, "files": stats.files}
+    tmp_path = f"{manifest_path(archive_path)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path(archive_path))
+
+
+def load_manifest(archive_path):
+    """
+    Returns:
+        dict: The archive's manifest, None if it has none (archives made before manifests existed).
+    """
+    try:
+        with open(manifest_path(archive_path), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def iter_member(archive_path, name, manifest=None):
+    """
+    Reads one file out of an archive using its block index, one block at a time.
+      Only the compressed blocks holding the file are read, and at most one of them is held in memory.
+    Args:
+        archive_path (str): Archive created by compress_tree().
+        name (str): Member name as listed in the manifest, e.g. ./Players/<id>.sav
+        manifest (dict): The archive's manifest, loaded if not given.
+    Yields:
+        bytes: Consecutive pieces of the file. The checksum is checked after the last one.
+    Raises:
+        KeyError: The archive has no block index, or no such member.
+        ValueError: The data does not match its checksum.
+    """
+    manifest = manifest or load_manifest(archive_path) or {}
+    entry = manifest["files"][name]
+    if "offset" not in entry:
+        raise KeyError(f"{archive_path} has no block index")
+    block_size, block_sizes = manifest["block_size"], manifest["blocks"]
+    first = entry["offset"] // block_size
+    last = max(first, (entry["offset"] + entry["size"] - 1) // block_size)
+    start = entry["offset"] - first * block_size
+    remaining = entry["size"]
+    sha256 = hashlib.sha256()
+    with open(archive_path, "rb") as f:
+        f.seek(sum(block_sizes[:first]))
+        for size in block_sizes[first:last + 1]:
+            data = _decompress_block(manifest["codec"], f.read(size))[start:start + remaining]
+            start = 0
+            remaining -= len(data)
+            sha256.update(data)
+            yield data
+    if remaining or sha256.hexdigest() != entry["sha256"]:
+        raise ValueError(f"{name} in {archive_path} does not match its checksum")
+
+
+def read_member(archive_path, name, manifest=None):
+    """
+    Reads one file out of an archive, see iter_member().
+    Returns:
+        bytes: The file's contents, checked against its manifest checksum.
+    """
+    return b"".join(iter_member(archive_path, name, manifest))
+
+
+def _decompress_stream(codec, fileobj):
+    if codec not in available_codecs():
+        raise ValueError(f"Codec '{codec}' is not available")
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    elif codec == "xz":
+        return lzma.LZMAFile(fileobj, "rb")
+    elif codec == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=False)
+    return lz4.frame.LZ4FrameFile(fileobj, "rb")
+
+
+def verify_backup(path, expected_sha256=None):
+    """
+    Checks an archive against its manifest in one sequential read: the checksum of the compressed
+    file, the tar structure, and the size and checksum of every member.
+      Archives without a manifest are only checked for readability, and against 'expected_sha256'.
+    Args:
+        path (str): Archive to check.
+        expected_sha256 (str): Archive checksum from the catalog, used if there is no manifest.
+    Returns:
+        list: Problems found, empty if the archive is intact.
+    """
+    problems = []
+    try:
+        manifest = load_manifest(path) or {}
+        expected_sha256 = manifest.get("sha256") or expected_sha256
+        expected_files = manifest.get("files")
+        seen = set()
+        with open(path, "rb") as raw:
+            hashing = HashingReader(raw)
+            with _decompress_stream(codec_for_path(path), hashing) as stream:
+                with tarfile.open(fileobj=stream, mode="r|") as tar:
+                    for member in tar:
+                        if not member.isreg():
+                            continue
+                        extracted = HashingReader(tar.extractfile(member))
+                        while extracted.read(1024 * 1024):
+                            pass
+                        seen.add(member.name)
+                        if expected_files is None:
+                            continue
+                        expected = expected_files.get(member.name)
+                        if expected is None:
+                            problems.append(f"{member.name} is not in the manifest")
+                        elif expected["sha256"] != extracted.sha256.hexdigest() or \
+                                expected["size"] != extracted.size:
+                            problems.append(f"{member.name} does not match its checksum")
+                # Read to the end so every compressed byte is checksummed
+                while stream.read(1024 * 1024):
+                    pass
+            while hashing.read(1024 * 1024):
+                pass
+        if expected_files is not None:
+            problems += [f"{name} is missing" for name in sorted(set(expected_files) - seen)]
+        if expected_sha256 and hashing.sha256.hexdigest() != expected_sha256:
+            problems.append("archive checksum does not match")
+    except Exception as e:
+        problems.append(f"unreadable: {e}")
+    return problems
+
+
+def _verify_one(item):
+    path, expected_sha256 = item
+    return path, verify_backup(path, expected_sha256)
+
+
+def verify_backups(backups, workers=0):
+    """
+    Verifies several archives in parallel, one process per core.
+    Args:
+        backups (list): (path, expected sha256 or None) tuples.
+        workers (int): Processes to use, 0 for one per core.
+    Returns:
+        list: (path, problems) tuples, in the order given.
+    """
+    if not backups:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(backups))
+    if workers == 1:
+        return [_verify_one(item) for item in backups]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_verify_one, backups))
+
+
+def tree_size(input_folder):
+    total = 0
+    for root, _, file_names in os.walk(input_folder):
+        for file_name in file_names:
+            total += os.path.getsize(os.path.join(root, file_name))
+    return total
+
+
+def _sample_tree(input_folder, sample_bytes):
+    # Sample the start of the tar stream, which is what the codec will actually see
+    sample = io.BytesIO()
+    with tarfile.open(fileobj=sample, mode="w|") as tar:
+        for root, dir_names, file_names in os.walk(input_folder):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                tar.add(os.path.join(root, file_name), recursive=False)
+                if sample.tell() >= sample_bytes:
+                    return sample.getvalue()[:sample_bytes]
+    return sample.getvalue()
+
+
+def benchmark_codecs(input_folder, sample_bytes=64 * 1024 * 1024, workers=0):
+    """
+    Compresses a sample of the save directory with every available codec/level pair.
+    Returns:
+        list: CompressionStats, one per candidate.
+    """
+    sample = _sample_tree(input_folder, sample_bytes)
+    results = []
+    for codec, level in BENCHMARK_CANDIDATES:
+        if codec not in available_codecs():
+            continue
+        start_time = time.monotonic()
+        writer = BlockCompressWriter(io.BytesIO(), codec, level, workers)
+        writer.write(sample)
+        writer.close()
+        results.append(CompressionStats(codec, level, len(sample), writer.bytes_out,
+                                        time.monotonic() - start_time))
+    return results
+
+
+def choose_codec(input_folder, budget_seconds, workers=0, results=None):
+    """
+    Picks the codec with the best ratio that can compress the whole save directory within the budget.
+      Falls back to the fastest codec if none fit.
+    Args:
+        results (list): Output of benchmark_codecs(), benchmarked now if not given.
+    Returns:
+        tuple: (codec, level)
+    """
+    total = tree_size(input_folder)
+    if results is None:
+        results = benchmark_codecs(input_folder, workers=workers)
+    within_budget = [r for r in results if r.bytes_per_second and total / r.bytes_per_second <= budget_seconds]
+    if within_budget:
+        best = min(within_budget, key=lambda r: r.ratio)
+    else:
+        best = max(results, key=lambda r: r.bytes_per_second)
+    log_info(f"Selected {best.codec}:{best.level} for {total} bytes within a {budget_seconds}s budget.")
+    return best.codec, best.level
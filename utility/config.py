@@ -23,3 +23,136 @@ BACKUPS_PATH = "/home/steam/Palworld_backups"
 
 # Keep this many days of backups
 DAYS_TO_KEEP = 3
+
+# Backup format: "tar" writes a full Palworld_<timestamp>.tar.gz every run,
+# "dedup" stores content-defined chunks once and records each backup as a manifest.
+BACKUP_FORMAT = "tar"
+
+# Dedup repository location (used when BACKUP_FORMAT is "dedup")
+DEDUP_REPO_PATH = "/home/steam/Palworld_backups/repository"
+
+# Compression codec for tar backups: "gzip", "zstd", "lz4", or "auto" to benchmark
+# the save directory and pick the best ratio that fits DOWNTIME_BUDGET
+COMPRESSION_CODEC = "gzip"
+COMPRESSION_LEVEL = None  # None uses the codec default
+COMPRESSION_WORKERS = 0  # 0 uses every core
+
+# Seconds one backup may spend compressing when COMPRESSION_CODEC is "auto". Backups compress
+# a snapshot after the server is started again, and hot and fleet backups never stop it, so
+# this bounds how long compression runs alongside the server rather than the downtime.
+DOWNTIME_BUDGET = 60
+# Hours between codec benchmarks for "auto". Results are kept in the backup catalog and the
+# choice is recomputed from them for the current save size on every backup.
+CODEC_BENCHMARK_HOURS = 24 * 7
+
+# Hot backups (--hot-backup) keep the server running. Save files must be unchanged
+# for HOT_BACKUP_SETTLE_SECONDS before they are read, and a backup that sees a file
+# change is retried up to HOT_BACKUP_RETRIES times.
+HOT_BACKUP_SETTLE_SECONDS = 5
+HOT_BACKUP_TIMEOUT = 120
+HOT_BACKUP_RETRIES = 3
+
+# Cold backups (--backup) copy the save directory here while the server is stopped,
+# restart the server, then compress the copy. Keep it on the same filesystem as
+# GAMESAVE_PATH so reflinks/hardlinks work.
+STAGING_PATH = "/home/steam/Palworld_staging"
+
+# How the staging copy is made: "auto" (reflink, fall back to copy), "reflink", "hardlink" or "copy"
+SNAPSHOT_METHOD = "auto"
+
+# Fleet mode (--fleet): inventory of servers and how many are handled at once.
+# Remote servers are restarted through the wrapper's 'restart' ("wrapper", WRAPPER by default). Without a
+# wrapper, set "supervised": true if something on that host starts the server again after a shutdown,
+# otherwise 'restart' refuses rather than leave it down.
+FLEET_INVENTORY = "utility/fleet.json"
+FLEET_CONCURRENCY = 4
+
+# Local service control: "auto" uses systemd's D-Bus API when the jeepney package is
+# installed and falls back to 'sudo systemctl', "systemctl" always uses systemctl
+SYSTEMD_BACKEND = "auto"
+SYSTEMD_BUS_ADDRESS = None  # None for the system bus
+
+# The utility's own timings (backup duration/size, downtime, command latency), shared by every run
+TELEMETRY_PATH = "/home/steam/Palworld_backups/palworld_util_stats.json"
+
+# Metrics exporter (--exporter): serves /metrics on this address, polling the server every
+# EXPORTER_INTERVAL seconds. Set EXPORTER_TEXTFILE to also write a node_exporter textfile.
+EXPORTER_ADDRESS = "127.0.0.1"
+EXPORTER_PORT = 9877
+EXPORTER_INTERVAL = 15
+EXPORTER_TEXTFILE = None  # e.g. "/var/lib/node_exporter/textfile_collector/palworld.prom"
+
+# Replies to read-only commands are cached on disk and shared by every invocation.
+# CACHE_TTLS gives each command's lifetime in seconds, 0 disables caching for it.
+# Once expired, an entry is still served for CACHE_STALE_SECONDS while it is refreshed
+# in the background. Pass --no-cache to always ask the server.
+# Replies include player IPs and Steam IDs: the cache lives in a directory only the current user
+# can open, $XDG_RUNTIME_DIR/palworld_util or ~/.cache/palworld_util when CACHE_PATH is None,
+# and is not used if that directory belongs to someone else.
+CACHE_PATH = None
+CACHE_TTLS = {
+    "settings": 3600,
+    "info": 60,
+    "players": 5,
+    "metrics": 5,
+    "status": 0  # readiness checks must always see the live server
+}
+CACHE_STALE_SECONDS = 30
+
+# Daemon mode (--daemon): seconds between runs of each job, 0 to only run it on request.
+# While the daemon runs, the CLI forwards commands to it over DAEMON_SOCKET, by default daemon.sock in
+# the same private directory as the response cache. The CLI only talks to a socket of the current user,
+# in a directory nobody else can write to.
+DAEMON_SOCKET = None
+DAEMON_SCHEDULE = {
+    "players": 60,
+    "save": 900,
+    "backup": 0,
+    "hot-backup": 21600,
+    "restart": 0,
+    "tier": 3600
+}
+DAEMON_RESTART_WAIT = 1800  # a scheduled restart waits this long for the server to empty
+
+# Player history: join/leave events and concurrency samples from every 'players' poll.
+# Samples older than PLAYER_RAW_DAYS are reduced to one record per hour.
+PLAYER_HISTORY_PATH = "/home/steam/Palworld_backups/players"
+PLAYER_RAW_DAYS = 7
+
+# Log output: "auto" (systemd journal if python-systemd is installed, otherwise text on stderr),
+# "journal", "text" or "json" (one JSON object per line)
+LOG_FORMAT = "auto"
+
+# Tiering (--tier): archives older than TIER_AFTER_HOURS are recompressed at idle priority with
+# a slower, higher-ratio codec. Recent backups keep COMPRESSION_CODEC for fast restores.
+# xz levels above 6 use much more memory per worker for no gain on 4 MB blocks.
+TIER_AFTER_HOURS = 48
+TIER_CODEC = "xz"
+TIER_LEVEL = 6
+
+# Free space checks on the backups filesystem. A backup needs room for its predicted size
+# (save files x historical compression ratio x DISK_SPACE_MARGIN) plus DISK_RESERVE_BYTES,
+# and stops, removing the partial archive, if writing it would eat into the reserve.
+DISK_SPACE_MARGIN = 1.2
+DISK_RESERVE_BYTES = 512 * 1024 * 1024
+
+# Load test (--load-test): read-only commands sent, with relative weights, on this many
+# threads, reporting latency percentiles and errors every LOAD_TEST_INTERVAL seconds
+LOAD_TEST_MIX = "info=1,players=1,metrics=1"
+LOAD_TEST_CONCURRENCY = 4
+LOAD_TEST_INTERVAL = 5
+
+# Backups taken while the server runs (--hot-backup, fleet backups, and compressing the staging
+# copy after --backup) run at idle CPU and I/O priority on THROTTLE_WORKERS threads, reading and
+# writing at most this many bytes per second (None for no cap). Every THROTTLE_CHECK_INTERVAL seconds
+# the server's metrics are checked: if FPS drops by more than THROTTLE_FPS_DROP, or frame time
+# grows THROTTLE_FRAME_TIME_SPIKE times, compared to before the backup, the caps are halved
+# (to at least THROTTLE_MIN_SCALE of their value) and recover once the server is healthy again.
+THROTTLE_ONLINE_BACKUPS = True
+THROTTLE_READ_BYTES_PER_SECOND = 64 * 1024 * 1024
+THROTTLE_WRITE_BYTES_PER_SECOND = 32 * 1024 * 1024
+THROTTLE_WORKERS = 2
+THROTTLE_CHECK_INTERVAL = 5
+THROTTLE_FPS_DROP = 0.15
+THROTTLE_FRAME_TIME_SPIKE = 1.5
+THROTTLE_MIN_SCALE = 0.05
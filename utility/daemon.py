@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utility import runtime_dir, telemetry
+from utility.config import *
+from utility.daemon_client import DaemonError, call, default_socket
+from utility.detect_api import execute, valid_commands
+from utility.logging_config import log_info, log_error
+
+# Jobs that touch the save files or the service never run at the same time
+EXCLUSIVE_JOBS = ["save", "backup", "hot-backup", "restart", "restart-now"]
+
+
+class JobState:
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.running = False
+        self.last_start = None
+        self.last_duration = None
+        self.last_ok = None
+        self.last_error = None
+        self.next_run = None
+
+    def to_dict(self):
+        return {"interval": self.interval, "running": self.running, "last_start": self.last_start,
+                "last_duration": self.last_duration, "last_ok": self.last_ok, "last_error": self.last_error,
+                "next_run": self.next_run}
+
+
+class Daemon:
+    """
+    Runs scheduled jobs on one event loop and answers CLI requests over a Unix socket.
+      The process keeps the REST client's connections, the RCON connection and the response
+      cache warm between jobs, so neither a job nor a CLI request pays the startup cost again.
+    Args:
+        jobs (dict): Job name -> blocking callable returning a truthy value on success.
+        schedule (dict): Job name -> interval in seconds, 0 or missing to only run on request.
+        socket_path (str): Path of the control socket, default_socket() if None.
+    """
+
+    def __init__(self, jobs, schedule=DAEMON_SCHEDULE, socket_path=None):
+        self.jobs = jobs
+        self.socket_path = socket_path or default_socket()
+        self.state = {name: JobState(name, schedule.get(name, 0)) for name in jobs}
+        # Blocking work runs here; one worker per job plus room for RPC commands
+        self.executor = ThreadPoolExecutor(max_workers=len(jobs) + 4)
+        self.exclusive = None
+        self.stopping = None
+        self.started = time.time()
+
+    async def run_job(self, name):
+        """
+        Runs a job unless it is already running.
+        Returns:
+            dict: {"ok": bool, "error": str or None}
+        """
+        job = self.state[name]
+        if job.running:
+            return {"ok": False, "error": f"{name} is already running."}
+        job.running = True
+        job.last_start = time.time()
+        start_time = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            if name in EXCLUSIVE_JOBS:
+                async with self.exclusive:
+                    ok = await loop.run_in_executor(self.executor, self.jobs[name])
+            else:
+                ok = await loop.run_in_executor(self.executor, self.jobs[name])
+            job.last_ok, job.last_error = bool(ok), None
+        except (Exception, SystemExit) as e:
+            # The job functions come from the one-shot CLI and may sys.exit() on failure
+            job.last_ok, job.last_error = False, str(e) or type(e).__name__
+            log_error(f"Job {name} failed: {job.last_error}")
+        finally:
+            job.running = False
+            job.last_duration = round(time.monotonic() - start_time, 3)
+            # Nothing else flushes the telemetry of a process that runs for weeks
+            await loop.run_in_executor(self.executor, telemetry.flush)
+        return {"ok": job.last_ok, "error": job.last_error}
+
+    async def _schedule(self, job):
+        while True:
+            job.next_run = time.time() + job.interval
+            await asyncio.sleep(job.interval)
+            await self.run_job(job.name)
+
+    async def _command(self, command, args):
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, lambda: execute(command, *args, cache=True))
+        return {"ok": result.ok, "status": result.status, "data": result.data, "error": result.error,
+                "cached": result.cached}
+
+    async def handle_request(self, request):
+        """
+        Requests are JSON objects:
+          {"command": "info"}                       API command, see valid_commands
+          {"command": "kick", "args": ["steam_.."]}
+          {"job": "backup"}                         run a job now and wait for it
+          {"jobs": true}                            scheduler state
+          {"shutdown": true}                        stop the daemon
+        """
+        if "command" in request:
+            if request["command"] not in valid_commands:
+                return {"ok": False, "error": f"Unknown command: {request['command']}"}
+            return await self._command(request["command"], request.get("args", []))
+        if "job" in request:
+            if request["job"] not in self.jobs:
+                return {"ok": False, "error": f"Unknown job: {request['job']}"}
+            return await self.run_job(request["job"])
+        if "jobs" in request:
+            return {"ok": True, "uptime": round(time.time() - self.started),
+                    "data": {name: job.to_dict() for name, job in self.state.items()}}
+        if "shutdown" in request:
+            self.stopping.set()
+            return {"ok": True}
+        return {"ok": False, "error": "Malformed request."}
+
+    async def _serve_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                reply = await self.handle_request(json.loads(line))
+            except ValueError:
+                reply = {"ok": False, "error": "Malformed request."}
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.exclusive = asyncio.Lock()
+        self.stopping = asyncio.Event()
+        # Only this user may create, replace or connect to the socket
+        if not runtime_dir.private_dir(os.path.dirname(os.path.abspath(self.socket_path)), "the daemon socket"):
+            raise RuntimeError(f"Cannot create {self.socket_path} in a private directory")
+        if os.path.exists(self.socket_path):
+            try:
+                running = call({"jobs": True}, self.socket_path, timeout=2) is not None
+            except DaemonError:
+                # Accepted the connection, so it is alive, just slow
+                running = True
+            if running:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            # Left behind by a daemon that did not exit cleanly
+            os.remove(self.socket_path)
+        # Bind with owner-only permissions, there is no window in which others can connect
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path)
+        finally:
+            os.umask(umask)
+        tasks = [asyncio.create_task(self._schedule(job)) for job in self.state.values() if job.interval > 0]
+        log_info(f"Daemon listening on {self.socket_path}, scheduled: "
+                 f"{', '.join(f'{job.name} every {job.interval}s' for job in self.state.values() if job.interval > 0)}")
+        try:
+            await self.stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            server.close()
+            await server.wait_closed()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+            # Let running jobs finish, a backup must not be cut off halfway
+            self.executor.shutdown(wait=True)
+            log_info("Daemon stopped.")
+
+
+def run_daemon(jobs, schedule=DAEMON_SCHEDULE, socket_path=None):
+    try:
+        asyncio.run(Daemon(jobs, schedule, socket_path).serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,53 @@
+import json
+import os
+import socket
+
+from utility import runtime_dir
+from utility.config import *
+
+
+class DaemonError(Exception):
+    """The daemon accepted a request but its reply never arrived, or the socket is not trusted."""
+
+
+def default_socket():
+    return DAEMON_SOCKET or os.path.join(runtime_dir.default_path(), "daemon.sock")
+
+
+def call(request, socket_path=None, timeout=None):
+    """
+    Sends one request to a running daemon.
+    Args:
+        request (dict): See Daemon.handle_request().
+        socket_path (str): Control socket, default_socket() if None.
+        timeout (float): Seconds to wait for the reply, None to wait as long as the job runs.
+    Returns:
+        dict: The daemon's reply, None if no daemon is listening.
+    Raises:
+        DaemonError: The daemon was reached, but did not reply within 'timeout' or dropped the connection.
+          Sending the request again elsewhere could run it twice. Also raised, before anything is sent, if
+          the socket or its directory belongs to another user.
+    """
+    socket_path = socket_path or default_socket()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    if not runtime_dir.is_own_socket(socket_path):
+        # Anyone who can place this socket could fake replies, e.g. report backups that never ran
+        raise DaemonError(f"{socket_path} is not a socket of this user in a private directory, not using it.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return None
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except socket.timeout:
+            raise DaemonError(f"The daemon did not reply within {timeout} seconds.")
+        except OSError as e:
+            raise DaemonError(f"Lost the connection to the daemon: {e}")
+    if not line:
+        raise DaemonError("The daemon closed the connection without replying.")
+    return json.loads(line)
@@ -0,0 +1,455 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import zlib
+from datetime import datetime
+
+from utility import save_inspector
+from utility.compression import TornReadError
+from utility.logging_config import log_info, log_error
+
+# Chunk sizes for content-defined chunking, in bytes
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVG_SIZE = 1024 * 1024
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
+
+# zlib level used for stored chunks. Saves are chunked decompressed, level 1 already shrinks them well.
+CHUNK_COMPRESS_LEVEL = 1
+
+# Version 2: .sav files may be stored as their decompressed GVAS body, see _store_file()
+MANIFEST_VERSION = 2
+
+# Length of the PlZ container header: uncompressed length, compressed length, magic, save type
+_SAV_HEADER_SIZE = 12
+# Bytes of the body recompressed to find the zlib level a save was written with
+_LEVEL_SAMPLE_SIZE = 256 * 1024
+
+# Content-defined chunking without a per-byte Python loop: find() scans for a two byte anchor in C,
+# and each anchor (one in 64 KiB of random data) becomes a boundary when the hash of the window
+# ending there matches a mask. Boundaries depend only on nearby content, so they survive insertions.
+_ANCHOR = b"\x9d\x4b"
+_ANCHOR_BITS = 16
+_WINDOW = 48
+# Anchors hashed per chunk before giving up and cutting at CHUNK_MAX_SIZE, about 16 times the
+# number random data has, so data full of anchors cannot fall back to a slow Python loop
+_MAX_ANCHORS = 1024
+
+# FastCDC style masks: harder to match before the average size, easier after it
+_AVG_BITS = CHUNK_AVG_SIZE.bit_length() - 1
+_MASK_SMALL = (1 << (_AVG_BITS + 2 - _ANCHOR_BITS)) - 1
+_MASK_LARGE = (1 << (_AVG_BITS - 2 - _ANCHOR_BITS)) - 1
+
+
+def _cut_point(buf, start, end):
+    """
+    Finds the end of the chunk starting at 'start'.
+    Args:
+        buf: bytes or mmap to scan.
+        start (int): Offset of the first byte of the chunk.
+        end (int): Offset one past the last byte available.
+    Returns:
+        int: Offset one past the last byte of the chunk.
+    """
+    remaining = end - start
+    if remaining <= CHUNK_MIN_SIZE:
+        return end
+    normal = start + min(CHUNK_AVG_SIZE, remaining)
+    limit = start + min(CHUNK_MAX_SIZE, remaining)
+    # Bytes below the minimum chunk size can never be a boundary, skip them
+    i = start + CHUNK_MIN_SIZE
+    for _ in range(_MAX_ANCHORS):
+        i = buf.find(_ANCHOR, i, limit)
+        if i < 0:
+            return limit
+        i += len(_ANCHOR)
+        fingerprint = int.from_bytes(hashlib.blake2b(buf[i - _WINDOW:i], digest_size=8).digest(), "little")
+        if not fingerprint & (_MASK_SMALL if i < normal else _MASK_LARGE):
+            return i
+    return limit
+
+
+def iter_chunks(path):
+    """
+    Splits a file into content-defined chunks.
+    Args:
+        path (str): File to split.
+    Yields:
+        bytes: Chunk contents, in file order.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield from _iter_buffer(buf, size)
+
+
+def _iter_buffer(buf, size):
+    start = 0
+    while start < size:
+        end = _cut_point(buf, start, size)
+        yield buf[start:end]
+        start = end
+
+
+def _chunk_path(repo_path, digest):
+    return os.path.join(repo_path, "chunks", digest[:2], digest)
+
+
+def _manifest_path(repo_path, name):
+    return os.path.join(repo_path, "manifests", f"{name}.json")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def init_repository(repo_path):
+    os.makedirs(os.path.join(repo_path, "chunks"), exist_ok=True)
+    os.makedirs(os.path.join(repo_path, "manifests"), exist_ok=True)
+    return repo_path
+
+
+def store_chunk(repo_path, data):
+    """
+    Stores a chunk unless an identical one already exists.
+    Returns:
+        tuple: (sha256 hex digest, number of bytes written to disk)
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(repo_path, digest)
+    if os.path.exists(path):
+        return digest, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(data, CHUNK_COMPRESS_LEVEL)
+    _write_atomic(path, compressed)
+    return digest, len(compressed)
+
+
+def read_chunk(repo_path, digest):
+    with open(_chunk_path(repo_path, digest), "rb") as f:
+        data = zlib.decompress(f.read())
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ValueError(f"Chunk {digest} is corrupt.")
+    return data
+
+
+def _sav_header(path):
+    # Only plain PlZ containers are unpacked, anything else is chunked as it is on disk
+    with open(path, "rb") as f:
+        header = f.read(_SAV_HEADER_SIZE)
+    if len(header) == _SAV_HEADER_SIZE and header[8:11] == save_inspector.SAV_MAGIC and \
+            header[11] in (save_inspector.SAVE_TYPE_ZLIB, save_inspector.SAVE_TYPE_ZLIB_TWICE):
+        return header
+    return None
+
+
+def _sav_level(path, header, gvas):
+    """
+    Finds the zlib level a save was written with by recompressing the start of its body, so a restored
+    save is normally identical to the original.
+    Returns:
+        int: zlib level, the zlib default if none reproduces the file.
+    """
+    with open(path, "rb") as f:
+        f.seek(_SAV_HEADER_SIZE)
+        compressed = f.read(4 * _LEVEL_SAMPLE_SIZE)
+    try:
+        if header[11] == save_inspector.SAVE_TYPE_ZLIB_TWICE:
+            compressed = zlib.decompressobj().decompress(compressed)
+    except zlib.error:
+        return zlib.Z_DEFAULT_COMPRESSION
+    sample = gvas[:_LEVEL_SAMPLE_SIZE]
+    for level in range(1, 10):
+        prefix = zlib.compressobj(level).compress(sample)
+        if prefix and compressed.startswith(prefix):
+            return level
+    return zlib.Z_DEFAULT_COMPRESSION
+
+
+def _write_sav(out, header, level, pieces):
+    """
+    Rebuilds a .sav file from its GVAS body, compressing it once or twice like the original.
+    Args:
+        out: Seekable binary file to write to.
+        header (bytes): The original PlZ header. Its compressed length is replaced with the new one.
+        pieces: GVAS body, in order.
+    """
+    stages = [zlib.compressobj(level) for _ in range(2 if header[11] == save_inspector.SAVE_TYPE_ZLIB_TWICE else 1)]
+    start = out.tell()
+    out.write(header)
+    # The header's compressed length is that of the first (inner) zlib stream
+    inner_size = 0
+    for piece in pieces:
+        data = stages[0].compress(piece)
+        inner_size += len(data)
+        if len(stages) == 2:
+            data = stages[1].compress(data)
+        out.write(data)
+    data = stages[0].flush()
+    inner_size += len(data)
+    if len(stages) == 2:
+        data = stages[1].compress(data) + stages[1].flush()
+    out.write(data)
+    end = out.tell()
+    out.seek(start + 4)
+    out.write(struct.pack("<I", inner_size))
+    out.seek(end)
+
+
+def _store_file(repo_path, path):
+    """
+    Stores a file's chunks.
+      Palworld rewrites and recompresses a save whenever anything in it changes, so after the first
+      changed byte the compressed bytes differ throughout. Saves are therefore chunked after
+      decompression, where an edit only changes the chunks around it, and recompressed on restore.
+    Returns:
+        tuple: (chunk list, bytes written to disk, dict to rebuild a .sav with or None)
+    """
+    header = _sav_header(path)
+    if header:
+        try:
+            with save_inspector.open_gvas(path) as gvas:
+                chunks, written = _store_chunks(repo_path, _iter_buffer(gvas, len(gvas)))
+                return chunks, written, {"header": header.hex(), "level": _sav_level(path, header, gvas)}
+        except save_inspector.SaveFormatError as e:
+            log_error(f"Storing {path} as it is: {e}")
+    chunks, written = _store_chunks(repo_path, iter_chunks(path))
+    return chunks, written, None
+
+
+def _store_chunks(repo_path, pieces):
+    chunks = []
+    written = 0
+    for data in pieces:
+        digest, stored = store_chunk(repo_path, data)
+        written += stored
+        chunks.append([digest, len(data)])
+    return chunks, written
+
+
+def _write_file(repo_path, entry, out):
+    pieces = (read_chunk(repo_path, digest) for digest, _ in entry["chunks"])
+    if entry.get("sav"):
+        _write_sav(out, bytes.fromhex(entry["sav"]["header"]), entry["sav"]["level"], pieces)
+    else:
+        for data in pieces:
+            out.write(data)
+
+
+def read_file(repo_path, entry):
+    """
+    Args:
+        entry (dict): A file entry of a snapshot manifest.
+    Returns:
+        bytes: The file's contents.
+    """
+    out = io.BytesIO()
+    _write_file(repo_path, entry, out)
+    return out.getvalue()
+
+
+def list_snapshots(repo_path):
+    """
+    Returns:
+        list: Snapshot names, oldest first.
+    """
+    manifests_dir = os.path.join(repo_path, "manifests")
+    if not os.path.isdir(manifests_dir):
+        return []
+    return sorted(f[:-len(".json")] for f in os.listdir(manifests_dir) if f.endswith(".json"))
+
+
+def load_manifest(repo_path, name):
+    with open(_manifest_path(repo_path, name), "r") as f:
+        return json.load(f)
+
+
+def store_backup(input_folder, repo_path, name):
+    """
+    Records the contents of a folder as a new snapshot in the repository.
+      Files whose size and mtime match the previous snapshot are not read again.
+    Args:
+        input_folder (str): Folder to back up.
+        repo_path (str): Dedup repository location.
+        name (str): Snapshot name, e.g. Palworld_2024-01-01_00-00-00
+    Returns:
+        str: Path of the written manifest.
+    Raises:
+        TornReadError: A file was modified while it was read. No manifest is written.
+    """
+    init_repository(repo_path)
+    previous = {}
+    snapshots = list_snapshots(repo_path)
+    if snapshots:
+        previous = {entry["path"]: entry for entry in load_manifest(repo_path, snapshots[-1])["files"]}
+
+    files = []
+    dirs = []
+    total_size = 0
+    written = 0
+    for root, dir_names, file_names in os.walk(input_folder):
+        dir_names.sort()
+        for dir_name in dir_names:
+            dirs.append(os.path.relpath(os.path.join(root, dir_name), input_folder))
+        for file_name in sorted(file_names):
+            full_path = os.path.join(root, file_name)
+            rel_path = os.path.relpath(full_path, input_folder)
+            st = os.stat(full_path)
+            total_size += st.st_size
+            old = previous.get(rel_path)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                chunks, sav = old["chunks"], old.get("sav")
+            else:
+                chunks, stored, sav = _store_file(repo_path, full_path)
+                written += stored
+                after = os.stat(full_path)
+                if (after.st_ino, after.st_size, after.st_mtime_ns) != (st.st_ino, st.st_size, st.st_mtime_ns):
+                    raise TornReadError(f"{full_path} changed while it was being read.")
+            entry = {
+                "path": rel_path,
+                "mode": st.st_mode & 0o7777,
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "chunks": chunks
+            }
+            if sav:
+                entry["sav"] = sav
+            files.append(entry)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "name": name,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": input_folder,
+        "size": total_size,
+        "stored": written,
+        "dirs": dirs,
+        "files": files
+    }
+    path = _manifest_path(repo_path, name)
+    _write_atomic(path, json.dumps(manifest).encode())
+    log_info(f"Snapshot {name}: {len(files)} files, {total_size} bytes, {written} new bytes stored.")
+    return path
+
+
+def restore_snapshot(repo_path, name, target_dir, paths=None):
+    """
+    Writes a snapshot's files into target_dir.
+    Args:
+        paths (list): Relative paths of the files to restore, None for the whole snapshot.
+    """
+    manifest = load_manifest(repo_path, name)
+    os.makedirs(target_dir, exist_ok=True)
+    if paths is None:
+        for rel_dir in manifest["dirs"]:
+            os.makedirs(os.path.join(target_dir, rel_dir), exist_ok=True)
+    for entry in manifest["files"]:
+        if paths is not None and entry["path"] not in paths:
+            continue
+        dest = os.path.join(target_dir, entry["path"])
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as f:
+            _write_file(repo_path, entry, f)
+        os.chmod(dest, entry["mode"])
+        os.utime(dest, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+    log_info(f"Snapshot {name} restored to {target_dir}")
+
+
+class _ChunkReader:
+    """File-like reader that streams a file's chunks out of the repository."""
+
+    def __init__(self, repo_path, chunks):
+        self.repo_path = repo_path
+        self.chunks = iter(chunks)
+        self.buffer = b""
+        self.offset = 0
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self.offset >= len(self.buffer):
+                digest = next(self.chunks, None)
+                if digest is None:
+                    break
+                self.buffer = read_chunk(self.repo_path, digest[0])
+                self.offset = 0
+            end = len(self.buffer) if size < 0 else min(len(self.buffer), self.offset + size)
+            parts.append(self.buffer[self.offset:end])
+            if size > 0:
+                size -= end - self.offset
+            self.offset = end
+        return b"".join(parts)
+
+
+def export_tar(repo_path, name, output_file):
+    """
+    Writes a snapshot as a tar.gz archive, in the same layout as 'tar -czf <file> -C <save dir> .'
+    """
+    manifest = load_manifest(repo_path, name)
+    try:
+        with tarfile.open(output_file, "w:gz") as tar:
+            for rel_dir in manifest["dirs"]:
+                info = tarfile.TarInfo(f"./{rel_dir}")
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                tar.addfile(info)
+            for entry in manifest["files"]:
+                info = tarfile.TarInfo(f"./{entry['path']}")
+                info.mode = entry["mode"]
+                info.mtime = entry["mtime_ns"] // 1_000_000_000
+                if entry.get("sav"):
+                    # Recompressed saves may differ in size from the original, rebuild them first
+                    with tempfile.TemporaryFile() as tmp:
+                        _write_file(repo_path, entry, tmp)
+                        info.size = tmp.tell()
+                        tmp.seek(0)
+                        tar.addfile(info, tmp)
+                else:
+                    info.size = entry["size"]
+                    tar.addfile(info, _ChunkReader(repo_path, entry["chunks"]))
+    except (OSError, ValueError) as e:
+        log_error(f"Failed to export snapshot {name}: {e}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False
+    log_info(f"Snapshot {name} exported to {output_file}")
+    return True
+
+
+def delete_snapshot(repo_path, name):
+    os.remove(_manifest_path(repo_path, name))
+
+
+def garbage_collect(repo_path):
+    """
+    Removes chunks that are no longer referenced by any snapshot.
+    Returns:
+        int: Number of bytes freed.
+    """
+    referenced = set()
+    for name in list_snapshots(repo_path):
+        for entry in load_manifest(repo_path, name)["files"]:
+            referenced.update(digest for digest, _ in entry["chunks"])
+
+    freed = 0
+    chunks_dir = os.path.join(repo_path, "chunks")
+    for prefix in os.listdir(chunks_dir):
+        prefix_dir = os.path.join(chunks_dir, prefix)
+        for digest in os.listdir(prefix_dir):
+            if digest not in referenced:
+                chunk_file = os.path.join(prefix_dir, digest)
+                freed += os.path.getsize(chunk_file)
+                os.remove(chunk_file)
+        if not os.listdir(prefix_dir):
+            shutil.rmtree(prefix_dir)
+    return freed
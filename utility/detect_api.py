@@ -1,21 +1,17 @@
 import argparse
 import base64
 import json
+import time
 
 import requests
+import requests.adapters
 
+from utility import response_cache, telemetry
 from utility.config import *
 from rcon import rcon_command
+from rcon.rcon_client import RconError
 from utility.logging_config import setup_logger, log_info, log_error
 
-# Constants
-payload = {}
-headers = None
-status = None
-data = None
-text = None
-
-baseurl = f"http://{SERVER_IP}:{REST_PORT}/v1/api/"
 
 # Define valid commands and their descriptions
 valid_commands = {
@@ -25,7 +21,10 @@ valid_commands = {
     "settings": "Show server settings",
     "metrics": "Show server metrics",
     "save": "Save the server state",
-    "stop": "Stop the server",
+    "start": "Start the server (wrapper)",
+    "restart": "Restart the server (wrapper)",
+    "stop": "Stop the server (wrapper)",
+    "shutdown": "Shut the server down after a wait time, with a message",
     "force-stop": "Forcefully stop the server",
     "kick": "Kick a player",
     "ban": "Ban a player",
@@ -33,255 +32,258 @@ valid_commands = {
     "announce": "Make an announcement"
 }
 
+# Commands answered with a GET request and a JSON body
+get_commands = ["players", "info", "status", "settings", "metrics"]
 
-def send_get_request(command):
-    global status
-    global data
-    global text
-    global headers
-    response = None
-    status_convert = None
 
-    try:
-        headers = {
-            'Accept': 'application/json',
-            'Authorization': f'Basic {base64.b64encode(f"{ADMIN_USER}:{ADMIN_PASS}".encode()).decode()}'
-        }
+class CommandResult:
+    """
+    Outcome of a single command.
+      status: HTTP status code, None if no response was received.
+      data: Parsed JSON reply for GET commands, or the server's error message.
+      error: Human-readable error, None on success.
+      cached: True if the reply came from the response cache.
+    """
+
+    def __init__(self, command, status=None, data=None, error=None, elapsed=0.0):
+        self.command = command
+        self.status = status
+        self.data = data
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = False
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.error is None
+
+    def __repr__(self):
+        return f"CommandResult({self.command}, status={self.status}, error={self.error!r})"
+
+
+class PalworldClient:
+    """
+    REST API client for one Palworld server.
+      Keeps a pool of keep-alive connections, so repeated polling reuses the same TCP connection.
+      Holds no per-request state and can be shared between threads.
+    Args:
+        record_latency (bool): Add each request to the command_latency_seconds telemetry. Off for
+          synthetic traffic such as load tests, which would distort the published latency.
+    """
+
+    def __init__(self, host=SERVER_IP, port=REST_PORT, user=ADMIN_USER, password=ADMIN_PASS, pool_size=10,
+                 record_latency=True):
+        self.baseurl = f"http://{host}:{port}/v1/api/"
+        self.record_latency = record_latency
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Basic {base64.b64encode(f"{user}:{password}".encode()).decode()}'
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+
+    def get(self, command, timeout=None):
         # command "status" doesnt exist, use 'info' to get a valid response
-        status_convert = False
-        if command in ["status"]:
-            command = command[:-len('status')] + 'info'
-            status_convert = True
-        # with requests.get, requests do not time out
-        response = requests.get(f"{baseurl}{command}", headers=headers, data=payload)
-        # {info, players, metrics, settings}
-        response.raise_for_status()
-        """On a successful reply, these fields are populated
-        response.ok = True
-        response.reason = 'OK'
-        response.status_code = 200
-        response.text = <json encoded string>
-        response.content = bytes object(of json-encoded string)"""
-        if response.content:
-            try:
-                data = json.loads(response.content)
-                # Check if the parsed data is non-empty
-                if data:
-                    return response.status_code
-                else:
-                    print("Received empty JSON object.")
-            except json.JSONDecodeError as e:
-                print("Failed to decode JSON:", e)
+        endpoint = "info" if command == "status" else command
+        return self._request("GET", command, endpoint, None, {'Accept': 'application/json'}, timeout)
+
+    def post(self, command, payload=None, timeout=None):
+        # Don't set a timeout by default, the save command will hang until the server finishes.
+        return self._request("POST", command, command, payload, {'Content-Type': 'application/json'}, timeout)
+
+    def _request(self, method, command, endpoint, payload, headers, timeout):
+        start_time = time.monotonic()
+        result = CommandResult(command)
+        try:
+            response = self.session.request(method, f"{self.baseurl}{endpoint}", headers=headers,
+                                            data=payload, timeout=timeout)
+        except requests.exceptions.ConnectionError as conn_err:
+            result.error = f"{conn_err}"
+        except requests.exceptions.Timeout as timeout_err:
+            result.error = f"Timeout error occurred: {timeout_err}"
+        except requests.exceptions.RequestException as req_err:
+            result.error = f"Request error occurred: {req_err}"
         else:
-            print("No content received.")
-
-    except requests.exceptions.HTTPError as http_err:
-        if http_err.response.status_code == 400:
-            if not status_convert:
-                print("400 Bad Request")
-        elif http_err.response.status_code == 401:
-            print("401 Access denied.")
-        elif http_err.response.status_code == 404:
-            print("404 Unavailable.")
-        elif http_err.response.status_code == 500:
-            data = json.loads(response.text).get('message')
-            if command in "info":
-                return
+            result.status = response.status_code
+            if response.ok:
+                if method == "GET":
+                    self._parse_json(response, result)
             else:
-                print(f"500 Server error {data}.")
+                self._parse_error(response, result)
+        result.elapsed = time.monotonic() - start_time
+        if self.record_latency:
+            telemetry.observe("command_latency_seconds", command, result.elapsed)
+        return result
+
+    @staticmethod
+    def _parse_json(response, result):
+        if not response.content:
+            result.error = "No content received."
+            return
+        try:
+            result.data = json.loads(response.content)
+        except json.JSONDecodeError as e:
+            result.error = f"Failed to decode JSON: {e}"
+            return
+        # Check if the parsed data is non-empty
+        if not result.data:
+            result.error = "Received empty JSON object."
+
+    @staticmethod
+    def _parse_error(response, result):
+        if response.status_code == 400:
+            result.data = f"HTTP Error 400: {response.text}"
+            result.error = "400 Bad Request"
+        elif response.status_code == 401:
+            result.data = f"HTTP Error 401: {response.text}"
+            result.error = "401 Access denied."
+        elif response.status_code == 404:
+            result.error = "404 Unavailable."
+        elif response.status_code == 500:
+            try:
+                result.data = json.loads(response.text).get('message')
+            except (json.JSONDecodeError, AttributeError):
+                result.data = response.text
+            result.error = f"500 Server error {result.data}."
         else:
-            print(f"HTTP error: {http_err}")
-        return False
-
-    except requests.exceptions.ConnectionError as conn_err:
-        if not status_convert:
-            if "refused" in str(conn_err):
-                print("Connection Refused")
-            print(f"{conn_err}")
-        return False
-    except requests.exceptions.Timeout as timeout_err:
-        if not status_convert:
-            print(f"Timeout error occurred: {timeout_err}")
-    except requests.exceptions.RequestException as req_err:
-        if not status_convert:
-            print(f"Request error occurred: {req_err}")
-    except json.JSONDecodeError as json_err:
-        if not status_convert:
-            print(f"Error decoding JSON response: {json_err}")
-    return None
-
-
-# Send command, reply is status successful/unsuccessful
-def send_post_request(postcmd):
-    global data
-    global headers
-    response = None
+            result.data = response.text
+            result.error = f"HTTP error: {response.status_code} {response.reason}"
 
-    try:
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Basic {base64.b64encode(f"{ADMIN_USER}:{ADMIN_PASS}".encode()).decode()}'
-        }
-        # Don't set a timeout, the save command will hang until the server finishes.
-        response = requests.post(f"{baseurl}{postcmd}", headers=headers, data=payload)
-        # {announce, kick, ban, unban, save, shutdown, stop}
-        response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx and 5xx)
-        return response.status_code
-
-    except requests.exceptions.HTTPError as http_err:
-
-        if http_err.response.status_code == 400:
-            data = f"HTTP Error 400: {response.text}"
-        elif http_err.response.status_code == 401:
-            data = f"HTTP Error 401: {response.text}"
-            print("HTTP Error 401: Unauthorized.")
-        elif http_err.response.status_code == 500:
-            data = json.loads(response.text).get('message')
-            if postcmd in "info":
-                return
-            else:
-                print(f"HTTP Error 500: {data}.")
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def default_client():
+    """
+    Returns:
+        PalworldClient: Shared client for the server in config.py, created on first use.
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = PalworldClient()
+    return _default_client
+
+
+def build_request(command, *args, timeout=10):
+    """
+    Validates a command's arguments and builds its REST request.
+    Returns:
+        tuple: (method, payload) where method is "GET" or "POST" and payload is a JSON string or None.
+    Raises:
+        ValueError: The arguments are not valid for the command.
+    """
+    if command in get_commands:
+        # No arguments are accepted.
+        if not len(args) == 0:
+            raise ValueError("This command does not recognize any arguments.")
+        return "GET", None
+    elif command in ["start", "restart", "stop"]:
+        # No arguments are accepted from palworld
+        if not len(args) == 0:
+            raise ValueError("This command does not recognize any arguments.")
+        if not WRAPPER:
+            # POST: palworld REST API: no json to send, no json response
+            return "POST", None
+        # POST: wrapper REST API: <timeout> is a valid argument for start, restart and stop
+        return "POST", json.dumps({"timeout": timeout})
+    elif command in ["force-stop", "save"]:
+        # No arguments are accepted.
+        if not len(args) == 0:
+            raise ValueError("This command does not recognize any arguments.")
+        # POST: no json to send, no json response
+        return "POST", None
+    elif command == "announce":
+        if not len(args) == 1:
+            raise ValueError(f"The 'announce' command requires exactly one <message> argument.")
+        # POST: use json to send the message, no json response
+        return "POST", json.dumps({"message": args[0]})
+    elif command == "unban":
+        if not len(args) == 1:
+            raise ValueError(f"The 'unban' command requires exactly one <steam_id> argument.")
+        return "POST", json.dumps({"userid": args[0]})
+    elif command == "shutdown":
+        if not len(args) == 2:
+            raise ValueError(f"The 'shutdown' command requires exactly two arguments (wait_time and message).")
+        # Check and rearrange args if necessary
+        if isinstance(args[0], int) and isinstance(args[1], str):
+            wait_time, msg_txt = args[0], args[1]
+        elif isinstance(args[0], str) and isinstance(args[1], int):
+            wait_time, msg_txt = args[1], args[0]
+        else:
+            raise ValueError(f"wait_time has to be an integer.")
+        return "POST", json.dumps({"waittime": wait_time, "message": msg_txt})
+    elif command in ["kick", "ban"]:
+        # steam_id required, message_text optional.
+        if len(args) == 1:
+            steam_id = args[0]
+            message_text = "Go away." if command == "kick" else "You are banned."
+        elif len(args) == 2:
+            steam_id, message_text = args
+        elif len(args) >= 3:
+            raise ValueError(f"Too many arguments for the '{command}' command.")
         else:
-            data = response.text
-            print(f"HTTP error: {http_err}")
-
-    except requests.exceptions.ConnectionError as conn_err:
-        print(f"{conn_err}")
-        exit(1)
-    except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout error occurred: {timeout_err}")
-    except requests.exceptions.RequestException as req_err:
-        print(f"Request error occurred: {req_err}")
-    except json.JSONDecodeError as json_err:
-        print(f"Error decoding JSON response: {json_err}")
+            raise ValueError(f"SteamID is required for the '{command}' command.")
+        return "POST", json.dumps({"userid": steam_id, "message": message_text})
+    raise ValueError(f"Unknown command: {command}")
 
-    return False
+
+def execute(command, *args, timeout=10, client=None, request_timeout=None, cache=False):
+    """
+    Sends a command over the REST API, or over the persistent RCON connection if REST_PORT is not set.
+    Args:
+        command (str): Command name, see valid_commands.
+        timeout (int): Passed to the wrapper's 'start' command.
+        client (PalworldClient): Client to use, the shared default client if None.
+        request_timeout (float): Seconds to wait for the HTTP reply, None to wait forever.
+        cache (bool): Serve read-only commands from the response cache, see CACHE_TTLS.
+    Returns:
+        CommandResult: Result of the command.
+    """
+    try:
+        method, request_payload = build_request(command, *args, timeout=timeout)
+    except ValueError as e:
+        return CommandResult(command, error=str(e))
+    client = client or default_client()
+    if method == "GET" and cache:
+        return response_cache.cached_get(client.baseurl, command,
+                                         lambda: execute(command, client=client, request_timeout=request_timeout))
+    if method == "POST":
+        # Anything sent with POST changes the server's state
+        response_cache.invalidate(client.baseurl)
+    if not REST_PORT:
+        start_time = time.monotonic()
+        try:
+            reply = rcon_command.send_rcon_command(command, *args)
+            # RCON has no status codes, report success the same way the REST API does
+            result = CommandResult(command, status=200, data=reply)
+        except RconError as e:
+            result = CommandResult(command, error=str(e))
+        result.elapsed = time.monotonic() - start_time
+        telemetry.observe("command_latency_seconds", command, result.elapsed)
+        return result
+    if method == "GET":
+        return client.get(command, request_timeout)
+    return client.post(command, request_payload, request_timeout)
 
 
 def run_command(command, *args, timeout=10):
-    global payload
-    global status
-    global data
-
-    # TODO: If returning a status_code of != 200, log the error and exit
-    #  Unless the command is 'info' or 'status'
-    rest_api_port = REST_PORT
-    if rest_api_port:
-        if command in ["players", "info", "status", "settings", "metrics"]:
-            # No arguments are accepted.
-            if not len(args) == 0:
-                log_error("This command does not recognize any arguments.")
-                return False
-            else:
-                status = send_get_request(command)  # should return the HTTP error code, "200" for successful
-        elif command == "start":
-            # No arguments are accepted from palworld
-            if not len(args) == 0:
-                log_error("This command does not recognize any arguments.")
-                return False
-            else:
-                if not WRAPPER:
-                    # POST: palworld REST API: no json to send, no json response
-                    payload = {}
-                else:
-                    # POST: wrapper REST API: <timeout> is a valid argument
-                    payload = json.dumps({"timeout": timeout})
-                status = send_post_request(command)
-        elif command == "force-stop":
-            # No arguments are accepted.
-            if not len(args) == 0:
-                log_error("This command does not recognize any arguments.")
-                return False
-            else:
-                # POST: no json to send, no json response
-                payload = {}
-                status = send_post_request(command)
-        elif command == "announce":
-            if not len(args) == 1:
-                log_error(f"The 'announce' command requires exactly one <message> argument.")
-                return False
-            else:
-                # POST: use json to send the message, no json response
-                payload = json.dumps({"message": args[0]})
-                status = send_post_request(command)
-        elif command == "unban":
-            if not len(args) == 1:
-                log_error(f"The 'unban' command requires exactly one <steam_id> argument.")
-                return False
-            else:
-                # POST: use json to send the message, no json response
-                payload = json.dumps({"userid": args[0]})
-                status = send_post_request(command)
-        elif command == "save":
-            if not len(args) == 0:
-                log_error("This command does not recognize any arguments.")
-                return False
-            else:
-                # POST: no json to send, no json response
-                payload = {}
-                status = send_post_request(command)
-        elif command == "shutdown":
-            if not len(args) == 2:
-                log_error(f"The 'shutdown' command requires exactly two arguments (wait_time and message).")
-                return False
-            else:
-                # Check and rearrange args if necessary
-                if isinstance(args[0], int) and isinstance(args[1], str):
-                    wait_time, msg_txt = args[0], args[1]
-                elif isinstance(args[0], str) and isinstance(args[1], int):
-                    wait_time, msg_txt = args[1], args[0]
-                else:
-                    log_error(f"wait_time has to be an integer.")
-                    return False
-                # POST: use json to send the message, no json response
-                payload = json.dumps({"waittime": wait_time, "message": msg_txt})
-                status = send_post_request(command)
-        elif command == "kick":
-            # steam_id required, message_text optional.
-            if len(args) == 1:
-                steam_id = args[0]
-                message_text = "Go away."
-            elif len(args) == 2:
-                steam_id = args[0]
-                message_text = args[1]
-            elif len(args) >= 3:
-                log_error(f"Too many arguments for the '{command}' command.")
-                return False
-            else:
-                log_error(f"SteamID is required for the '{command}' command.")
-                return False
-            # POST: use json to send the message, no json response
-            payload = json.dumps({"userid": steam_id, "message": message_text})
-            status = send_post_request(command)
-        elif command == "ban":
-            # steam_id required, message_text optional.
-            if len(args) == 1:
-                steam_id = args[0]
-                message_text = "You are banned."
-            elif len(args) == 2:
-                steam_id = args[0]
-                message_text = args[1]
-            elif len(args) >= 3:
-                log_error(f"Too many arguments for the '{command}' command.")
-                return False
-            else:
-                log_error(f"SteamID is required for the '{command}' command.")
-                return False
-            # POST: use json to send the message, no json response
-            payload = json.dumps({"userid": steam_id, "message": message_text})
-            status = send_post_request(command)
-        return status  # should return the HTTP error code, "200" for successful
-    else:
-        # TODO: Verify rcon binary exists before sending commands.
-        rcon_command.send_rcon_command(command)
-        if command == "save":
-            # RCON does not provide feedback. Give it lots of time to make sure the save is complete
-            log_info(f"Waiting 2 minutes to allow save to finish.")
-            return timeout
+    """
+    Sends a command and logs any error. Read-only commands may be answered from the response cache.
+    Returns:
+        int: HTTP status code, 200 if successful. False on failure.
+    """
+    result = execute(command, *args, timeout=timeout, cache=True)
+    if result.ok:
+        return result.status
+    # 'status' is expected to fail while the server is down, stay quiet
+    if command != "status":
+        log_error(result.error, command=command, status=result.status)
+    return False
 
 
-logger = setup_logger()
 if __name__ == "__main__":
+    logger = setup_logger()
     parser = argparse.ArgumentParser(description="Handle server commands")
     parser.add_argument('command', nargs='?', help="The command to send to the server")
     args = parser.parse_args()
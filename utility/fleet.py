@@ -0,0 +1,225 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utility import backup_catalog, compression, hot_backup, readiness, systemd_dbus, throttle
+from utility.config import *
+from utility.detect_api import PalworldClient, build_request
+from utility.logging_config import log_info, log_error
+from utility.retention import select_old_backups
+
+# Actions the fleet runner knows how to perform
+fleet_actions = ["status", "save", "backup", "restart", "announce"]
+
+
+class FleetServer:
+    """One entry of the fleet inventory. Missing fields fall back to the values in config.py."""
+
+    def __init__(self, entry):
+        self.name = entry["name"]
+        self.server_ip = entry.get("server_ip", SERVER_IP)
+        self.rest_port = entry.get("rest_port", REST_PORT)
+        self.service_name = entry.get("service_name", SERVICE_NAME)
+        self.gamesave_path = entry.get("gamesave_path")
+        self.backups_path = entry.get("backups_path")
+        # A remote server restarts through the wrapper's 'restart', or, if 'supervised', by shutting it
+        # down and letting its supervisor (e.g. a systemd unit with Restart=always) start it again
+        self.wrapper = entry.get("wrapper", WRAPPER)
+        self.supervised = entry.get("supervised", False)
+        self.client = PalworldClient(self.server_ip, self.rest_port,
+                                     entry.get("admin_user", ADMIN_USER), entry.get("admin_pass", ADMIN_PASS))
+
+    @property
+    def is_local(self):
+        return self.server_ip in ['localhost', '127.0.0.1']
+
+
+class FleetResult:
+    def __init__(self, server, action, ok, detail, elapsed):
+        self.server = server
+        self.action = action
+        self.ok = ok
+        self.detail = detail
+        self.elapsed = elapsed
+
+
+def load_inventory(path=FLEET_INVENTORY):
+    if not os.path.isabs(path):
+        # Relative paths are relative to the repository, not the current directory
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    with open(path, "r") as f:
+        return [FleetServer(entry) for entry in json.load(f)["servers"]]
+
+
+def _wait_for_status(server, expect_running, timeout):
+    return readiness.wait_for_state(expect_running, timeout, server.server_ip, server.rest_port,
+                                    lambda: server.client.get("status", timeout=readiness.PROBE_TIMEOUT).ok).reached
+
+
+def _post(server, command, *args):
+    method, payload = build_request(command, *args)
+    result = server.client.post(command, payload)
+    return result.ok, result.error or "OK"
+
+
+def _status(server):
+    result = server.client.get("status", timeout=5)
+    if result.ok:
+        return True, f"{result.data.get('servername', '')} {result.data.get('version', '')}".strip()
+    return False, result.error
+
+
+def _metrics(server):
+    result = server.client.get("metrics", timeout=2)
+    return result.data if result.ok else None
+
+
+def _backup(server):
+    # Fleet backups never stop the server: save, then take a hot backup
+    if not server.gamesave_path or not server.backups_path:
+        return False, "gamesave_path and backups_path are required for backups."
+    ok, detail = _post(server, "save")
+    if not ok:
+        return False, f"save failed: {detail}"
+    os.makedirs(server.backups_path, exist_ok=True)
+    codec, level = COMPRESSION_CODEC, COMPRESSION_LEVEL
+    if codec == "auto":
+        conn = backup_catalog.open_catalog(server.backups_path)
+        try:
+            results = backup_catalog.benchmark_results(conn, server.gamesave_path, CODEC_BENCHMARK_HOURS * 3600,
+                                                       COMPRESSION_WORKERS)
+        finally:
+            conn.close()
+        codec, level = compression.choose_codec(server.gamesave_path, DOWNTIME_BUDGET, results=results)
+    created = datetime.now().replace(microsecond=0)
+    name = f"Palworld_{created.strftime('%Y-%m-%d_%H-%M-%S')}{compression.CODEC_EXTENSIONS[codec]}"
+    backup_file = os.path.join(server.backups_path, name)
+    if THROTTLE_ONLINE_BACKUPS:
+        # The server keeps running, take the same throttled path as a hot backup
+        def archive():
+            return throttle.compress_online(server.gamesave_path, backup_file, codec, level,
+                                            lambda: _metrics(server), min_free=DISK_RESERVE_BYTES)
+
+        def verify():
+            return throttle.run_at_idle_priority(lambda: compression.verify_backup(backup_file))
+    else:
+        def archive():
+            return compression.compress_tree(server.gamesave_path, backup_file, codec, level, COMPRESSION_WORKERS,
+                                             min_free=DISK_RESERVE_BYTES)
+
+        def verify():
+            return compression.verify_backup(backup_file)
+
+    stats = hot_backup.run_consistent(server.gamesave_path, archive, HOT_BACKUP_RETRIES, HOT_BACKUP_SETTLE_SECONDS,
+                                      HOT_BACKUP_TIMEOUT, discard=lambda _: compression.remove_archive(backup_file))
+    if not stats:
+        return False, "no consistent copy of the save files could be made."
+    problems = verify()
+    if problems:
+        os.remove(backup_file)
+        os.remove(compression.manifest_path(backup_file))
+        return False, f"{name} failed verification: {'; '.join(problems)}"
+    conn = backup_catalog.open_catalog(server.backups_path)
+    try:
+        backup_catalog.record_backup(conn, backup_file, created, stats.bytes_out, stats.bytes_in,
+                                     stats.sha256, codec)
+        for file_path in select_old_backups(backup_catalog.list_backups(conn)):
+            backup_catalog.remove_backup(conn, file_path)
+    finally:
+        conn.close()
+    return True, f"{name} ({stats.bytes_out} bytes)"
+
+
+def _restart(server, timeout):
+    # Like restart_service: save first, the POST returns once the world is written
+    ok, detail = _post(server, "save")
+    if not ok:
+        return False, f"save failed: {detail}"
+    if server.is_local:
+        dbus_result = systemd_dbus.control_unit("restart", server.service_name, timeout)
+        if dbus_result is not None:
+            if not dbus_result[0]:
+                return False, dbus_result[1]
+        else:
+            try:
+                result = subprocess.run(['sudo', 'systemctl', 'restart', server.service_name],
+                                        capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                return False, f"systemctl restart did not finish within {timeout} seconds."
+            if result.returncode != 0:
+                return False, result.stderr.strip()
+    else:
+        if server.wrapper:
+            method, payload = build_request("restart", timeout=timeout)
+            result = server.client.post("restart", payload)
+            ok, detail = result.ok, result.error or "OK"
+        elif server.supervised:
+            ok, detail = _post(server, "shutdown", 10, "Server restarting in 10 seconds.")
+        else:
+            # A shutdown alone would leave the server down, nothing on this side can start it again
+            return False, "remote restart needs the wrapper's restart, or \"supervised\": true in the inventory."
+        if not ok:
+            return False, f"restart failed: {detail}"
+        if not _wait_for_status(server, False, timeout):
+            return False, "server did not stop."
+    if not _wait_for_status(server, True, timeout):
+        return False, "server did not come back up."
+    return True, "restarted"
+
+
+def run_action(server, action, *args, timeout=120):
+    """
+    Runs one action against one server. Never raises, failures are reported in the result.
+    Returns:
+        FleetResult: Outcome and timing.
+    """
+    start_time = time.monotonic()
+    try:
+        if action == "status":
+            ok, detail = _status(server)
+        elif action == "save":
+            ok, detail = _post(server, "save")
+        elif action == "announce":
+            ok, detail = _post(server, "announce", *args)
+        elif action == "backup":
+            ok, detail = _backup(server)
+        elif action == "restart":
+            ok, detail = _restart(server, timeout)
+        else:
+            ok, detail = False, f"Unknown fleet action: {action}"
+    except Exception as e:
+        ok, detail = False, f"{type(e).__name__}: {e}"
+    return FleetResult(server.name, action, ok, detail, time.monotonic() - start_time)
+
+
+def run_fleet(action, *args, servers=None, concurrency=FLEET_CONCURRENCY):
+    """
+    Runs an action against every server in the inventory, at most 'concurrency' at a time.
+    Returns:
+        list: FleetResult per server, in inventory order.
+    """
+    servers = servers if servers is not None else load_inventory()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(lambda server: run_action(server, action, *args), servers))
+    for server in servers:
+        server.client.close()
+    return results
+
+
+def log_report(results):
+    width = max([len(r.server) for r in results] + [6])
+    for r in results:
+        line = f"{r.server:<{width}}  {r.action:<8}  {'OK' if r.ok else 'FAILED':<6}  {r.elapsed:7.2f}s  {r.detail}"
+        if r.ok:
+            log_info(line, server=r.server, command=r.action, duration=round(r.elapsed, 3))
+        else:
+            log_error(line, server=r.server, command=r.action, duration=round(r.elapsed, 3))
+    failed = sum(1 for r in results if not r.ok)
+    slowest = max(results, key=lambda r: r.elapsed, default=None)
+    summary = f"{len(results) - failed}/{len(results)} servers succeeded"
+    if slowest:
+        summary += f", slowest {slowest.server} at {slowest.elapsed:.2f}s"
+    log_info(summary)
@@ -0,0 +1,85 @@
+import os
+import time
+
+from utility.compression import TornReadError
+from utility.logging_config import log_info, log_error
+
+
+def save_tree_state(path):
+    """
+    Returns:
+        dict: Relative file path -> (inode, size, mtime_ns) for every file under 'path'.
+    """
+    state = {}
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            full_path = os.path.join(root, file_name)
+            try:
+                st = os.stat(full_path)
+            except FileNotFoundError:
+                # Removed between listing and stat, it shows up as a change on the next poll
+                continue
+            state[os.path.relpath(full_path, path)] = (st.st_ino, st.st_size, st.st_mtime_ns)
+    return state
+
+
+def wait_until_quiet(path, settle_seconds, timeout, poll_interval=0.5):
+    """
+    Waits until no file under 'path' has changed for 'settle_seconds'.
+    Args:
+        path (str): Save directory to watch.
+        settle_seconds (float): How long the tree has to stay unchanged.
+        timeout (float): Maximum time to wait.
+    Returns:
+        bool: True once the tree is quiet, False on timeout.
+    """
+    end_time = time.monotonic() + timeout
+    state = save_tree_state(path)
+    quiet_since = time.monotonic()
+    while time.monotonic() < end_time:
+        if time.monotonic() - quiet_since >= settle_seconds:
+            return True
+        time.sleep(poll_interval)
+        current = save_tree_state(path)
+        if current != state:
+            state = current
+            quiet_since = time.monotonic()
+    return False
+
+
+def _changed_files(before, after):
+    return sorted(name for name in set(before) | set(after) if before.get(name) != after.get(name))
+
+
+def run_consistent(path, action, retries, settle_seconds, timeout, discard=None):
+    """
+    Runs 'action' once the save tree is quiet, retrying if it reports a torn read.
+      The whole tree is also compared before and after 'action': a save that lands between two files
+      leaves each file intact but mixes two generations, so any change discards the copy.
+    Args:
+        path (str): Save directory being backed up.
+        action (callable): Reads the tree, raises TornReadError if a file changed underneath it.
+        retries (int): Attempts after the first one.
+        discard (callable): Called with the result of an attempt whose tree changed, to remove what it wrote.
+    Returns:
+        The result of 'action', or None if no consistent copy could be made.
+    """
+    for attempt in range(retries + 1):
+        if not wait_until_quiet(path, settle_seconds, timeout):
+            log_error(f"Save files in {path} did not stop changing within {timeout} seconds.")
+            return None
+        before = save_tree_state(path)
+        try:
+            result = action()
+            # A failed attempt is the caller's to report, only a finished copy can be torn
+            changed = _changed_files(before, save_tree_state(path)) if result else []
+            if changed:
+                if discard:
+                    discard(result)
+                raise TornReadError(f"{', '.join(changed[:3])}{' and others' if len(changed) > 3 else ''} "
+                                    f"changed during the backup.")
+            return result
+        except TornReadError as e:
+            log_info(f"Attempt {attempt + 1} of {retries + 1} discarded: {e}")
+    log_error("Giving up: save files kept changing during the backup.")
+    return None
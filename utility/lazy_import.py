@@ -0,0 +1,25 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns a module that is only executed when one of its attributes is first used, so a command
+    that never touches it does not pay for importing it (or what it imports).
+    Raises:
+        ModuleNotFoundError: The module is not installed, checked without loading it.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.config import *
+from utility.detect_api import PalworldClient, get_commands, valid_commands
+from utility.logging_config import log_info, log_progress
+
+
+def parse_mix(text):
+    """
+    Parses a request mix such as "info=5,players=3,metrics=2", or "info,metrics" for equal weights.
+      Only commands sent with GET are allowed, a load test must not change the server's state.
+    Returns:
+        dict: Command -> relative weight.
+    Raises:
+        ValueError: Unknown command, a command that is not read-only, or a bad weight.
+    """
+    mix = {}
+    for item in text.split(","):
+        command, _, weight = item.strip().partition("=")
+        if command not in valid_commands:
+            raise ValueError(f"Unknown command '{command}'.")
+        if command not in get_commands:
+            raise ValueError(f"'{command}' changes the server's state and cannot be load tested.")
+        mix[command] = float(weight or 1)
+        if mix[command] <= 0:
+            raise ValueError(f"The weight of '{command}' must be positive.")
+    return mix
+
+
+def latency_summary(values):
+    """
+    Returns:
+        dict: Mean and p50/p95/p99/max of 'values' (seconds) in milliseconds, empty if there are none.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {"mean_ms": round(sum(ordered) / len(ordered) * 1000, 3), "p50_ms": round(percentile(50), 3),
+            "p95_ms": round(percentile(95), 3), "p99_ms": round(percentile(99), 3),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+class LoadRecorder:
+    """
+    Collects request outcomes, per command and per 'interval'-second window.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.windows = []
+        self._reset_window(self.start_time)
+        self.latencies = {}
+        self.errors = {}
+
+    def _reset_window(self, start):
+        self.window_start = start
+        self.window_latencies = []
+        self.window_errors = 0
+
+    def record(self, command, latency, ok):
+        with self.lock:
+            self.latencies.setdefault(command, []).append(latency)
+            self.window_latencies.append(latency)
+            if not ok:
+                self.errors[command] = self.errors.get(command, 0) + 1
+                self.window_errors += 1
+
+    def roll(self, now=None, final=False):
+        """
+        Closes the current window once 'interval' seconds have passed (or at the end of the test) and logs it.
+        """
+        now = now or time.monotonic()
+        with self.lock:
+            if not final and now - self.window_start < self.interval:
+                return
+            latencies, errors, start = self.window_latencies, self.window_errors, self.window_start
+            self._reset_window(now)
+        if not latencies:
+            return
+        window = dict(latency_summary(latencies), offset_s=round(start - self.start_time, 1),
+                      requests=len(latencies), errors=errors,
+                      requests_per_s=round(len(latencies) / max(now - start, 1e-9), 1))
+        self.windows.append(window)
+        log_progress("load-test", "window", f"{window['offset_s']:>6}s: {window['requests_per_s']} req/s, "
+                     f"p50 {window['p50_ms']} ms, p95 {window['p95_ms']} ms, p99 {window['p99_ms']} ms, "
+                     f"{errors} errors", requests=len(latencies), errors=errors, p95_ms=window["p95_ms"])
+
+    def report(self, duration):
+        """
+        Returns:
+            dict: 'duration_s', 'requests', 'errors', 'requests_per_s', 'error_rate', 'commands' with a
+              latency summary per command, and 'windows' with one summary per interval.
+        """
+        commands = {command: dict(latency_summary(values), requests=len(values),
+                                  errors=self.errors.get(command, 0))
+                    for command, values in self.latencies.items()}
+        requests = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {"duration_s": round(duration, 3), "requests": requests, "errors": errors,
+                "requests_per_s": round(requests / max(duration, 1e-9), 1),
+                "error_rate": round(errors / requests, 4) if requests else 0.0,
+                "commands": commands, "windows": self.windows}
+
+
+def run_load_test(mix=None, duration=60, rate=None, concurrency=LOAD_TEST_CONCURRENCY, interval=LOAD_TEST_INTERVAL,
+                  host=SERVER_IP, port=REST_PORT, request_timeout=10, seed=None):
+    """
+    Sends a weighted mix of read-only commands for 'duration' seconds.
+      With 'rate', requests start on a fixed schedule (open loop) on up to 'concurrency' threads. Latency
+      counts from the scheduled start, so a server that falls behind shows up as queueing delay instead
+      of a lower request rate. Without 'rate', 'concurrency' threads send back to back (closed loop).
+      Requests go straight to a REST client of their own: no response cache, and none of them end up
+      in the command latency telemetry the exporter publishes.
+    Args:
+        mix (dict): Command -> relative weight, see parse_mix. LOAD_TEST_MIX if None.
+        rate (float): Requests per second, None for as fast as 'concurrency' threads allow.
+        interval (float): Seconds per reported window.
+        host (str): Server address, e.g. a local benchmarks.mock_server.
+    Returns:
+        dict: See LoadRecorder.report.
+    Raises:
+        ValueError: No REST port. The load test never falls back to RCON.
+    """
+    if not port:
+        raise ValueError("The load test needs the REST API, set REST_PORT.")
+    mix = mix or parse_mix(LOAD_TEST_MIX)
+    commands, weights = list(mix), list(mix.values())
+    rng = random.Random(seed)
+    client = PalworldClient(host, port, pool_size=concurrency, record_latency=False)
+    recorder = LoadRecorder(interval)
+    end_time = recorder.start_time + duration
+
+    def send(command, scheduled):
+        result = client.get(command, request_timeout)
+        recorder.record(command, time.monotonic() - scheduled, result.ok)
+
+    log_progress("load-test", "begin", f"Load testing {host}:{port} for {duration} seconds with "
+                 f"{', '.join(f'{c}={w:g}' for c, w in mix.items())}, "
+                 f"{f'{rate} req/s' if rate else 'closed loop'} on {concurrency} threads.",
+                 duration=duration, rate=rate, concurrency=concurrency)
+    try:
+        if rate:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                next_time = recorder.start_time
+                while next_time < end_time:
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(send, rng.choices(commands, weights)[0], next_time)
+                    recorder.roll()
+                    next_time += 1 / rate
+        else:
+            def worker(worker_rng):
+                while time.monotonic() < end_time:
+                    send(worker_rng.choices(commands, weights)[0], time.monotonic())
+
+            threads = [threading.Thread(target=worker, args=(random.Random(rng.random()),), daemon=True)
+                       for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(min(0.1, interval))
+                recorder.roll()
+    finally:
+        client.close()
+    recorder.roll(final=True)
+    report = recorder.report(time.monotonic() - recorder.start_time)
+    for command, summary in report["commands"].items():
+        log_info(f"{command}: {summary['requests']} requests, {summary['errors']} errors, "
+                 f"p50 {summary.get('p50_ms')} ms, p95 {summary.get('p95_ms')} ms, p99 {summary.get('p99_ms')} ms",
+                 command=command, requests=summary["requests"], errors=summary["errors"])
+    log_progress("load-test", "done", f"{report['requests']} requests in {report['duration_s']} seconds, "
+                 f"{report['requests_per_s']} req/s, error rate {report['error_rate']:.2%}",
+                 requests=report["requests"], errors=report["errors"], duration=report["duration_s"])
+    return report
@@ -1,62 +1,123 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+import threading
+
+from utility.config import *
 
 os_platform = sys.platform
 
+LOGGER_NAME = 'PalServer-Util'
 
-class NoNewlineStreamHandler(logging.StreamHandler):
-    def emit(self, record):
-        try:
-            msg = self.format(record)
-            stream = self.stream
-            stream.write(msg)
-            # Flush the stream but don't add a newline
-            stream.flush()
-        except Exception:
-            self.handleError(record)
-
-
-# Handle error messages for OS
-def log_error(message, end='\n'):
-    logger = setup_logger()
-    if not os_platform == 'win32':
-        logger.error(message, extra={'end': end})
-    else:
-        print(message, end=end)
+# Attributes every LogRecord has; anything else on a record is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
 
+_lock = threading.Lock()
+_queue = None
+_listener = None
 
-def log_info(message, end='\n'):
-    logger = setup_logger()
-    if not os_platform == 'win32':
-        logger.info(message, extra={'end': end})
-    else:
-        print(message, end=end)
 
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
 
-def setup_logger(name='PalServer-Util'):
-    # Set up logging
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
 
-    # Use the correct handler for the platform
-    if not os_platform == 'win32':
-        # Linux - systemd journal
+class TextFormatter(logging.Formatter):
+    """Plain text, with any structured fields appended as key=value."""
+
+    def format(self, record):
+        text = super().format(record)
+        fields = _fields(record)
+        if fields:
+            text += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, structured fields as top-level keys."""
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        entry.update(_fields(record))
+        return json.dumps(entry, default=str)
+
+
+def _output_handler():
+    if LOG_FORMAT in ("auto", "journal") and os_platform != 'win32':
         try:
+            # Linux - systemd journal, structured fields become journal fields (COMMAND=, BYTES=, ...)
             from systemd.journal import JournalHandler
-            handler = JournalHandler()
+            return JournalHandler()
         except ImportError:
-            # Fall back to console in systemd not available
-            handler = NoNewlineStreamHandler()
+            # Fall back to console if systemd is not available
+            pass
+    if os_platform == 'win32':
+        # Windows - bare messages on the console
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(TextFormatter('%(message)s'))
+        return handler
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
     else:
-        # Windows - console log
-        handler = NoNewlineStreamHandler()
-
-    handler.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
+        handler.setFormatter(TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
 
-    # Add handler to logger
-    if not logger.handlers:
-        logger.addHandler(handler)
 
+def setup_logger(name=LOGGER_NAME):
+    """
+    Returns the logger, setting up the logging pipeline on first use.
+      Records go through a queue to one background thread that formats and writes them, so a slow
+      journald or terminal never blocks the caller. The queue is drained when the process exits.
+    """
+    global _queue, _listener
+    # Only loaded once something is logged, a quiet 'status' never needs it
+    import logging.handlers
+    logger = logging.getLogger(name)
+    with _lock:
+        if _listener is None:
+            _queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(_queue, _output_handler())
+            _listener.start()
+            atexit.register(_listener.stop)
+        if not logger.handlers:
+            logger.setLevel(logging.INFO)
+            logger.addHandler(logging.handlers.QueueHandler(_queue))
+            logger.propagate = False
     return logger
+
+
+_logger = None
+
+
+def _log(level, message, fields):
+    global _logger
+    if _logger is None:
+        _logger = setup_logger()
+    _logger.log(level, message, extra=fields)
+
+
+def log_error(message, **fields):
+    """
+    Args:
+        message (str): Message text.
+        **fields: Structured fields, e.g. command="save", server="eu-1", duration=1.2, bytes=1024.
+    """
+    _log(logging.ERROR, message, fields)
+
+
+def log_info(message, **fields):
+    _log(logging.INFO, message, fields)
+
+
+def log_progress(operation, stage, message, **fields):
+    """
+    Logs one step of a long-running operation, e.g.
+      log_progress("backup", "compressed", "Archive written.", bytes=123456, duration=4.2)
+    The operation and stage are fields, so a reader of the journal or JSON lines can follow
+    an operation from 'begin' to 'done' or 'failed' without parsing messages.
+    """
+    _log(logging.INFO if stage != "failed" else logging.ERROR, message,
+         dict(fields, operation=operation, stage=stage))
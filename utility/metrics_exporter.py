@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utility import telemetry
+from utility.async_client import run_commands
+from utility.config import *
+from utility.logging_config import log_info, log_error
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Palworld 'metrics' fields exported as gauges
+SERVER_METRICS = {
+    "serverfps": ("palworld_server_fps", "Server frames per second"),
+    "serverframetime": ("palworld_server_frame_time_ms", "Server frame time in milliseconds"),
+    "currentplayernum": ("palworld_players_online", "Players currently online"),
+    "maxplayernum": ("palworld_players_max", "Maximum number of players"),
+    "uptime": ("palworld_uptime_seconds", "Server uptime in seconds"),
+    "days": ("palworld_world_days", "In-game days elapsed")
+}
+
+# The utility's own gauges recorded through telemetry.set_gauge()
+UTILITY_GAUGES = {
+    "backup_duration_seconds": "Duration of the last backup",
+    "backup_size_bytes": "Compressed size of the last backup",
+    "backup_downtime_seconds": "Server downtime during the last cold backup",
+    "backup_timestamp_seconds": "Unix time of the last successful backup",
+    "world_gvas_bytes": "Uncompressed size of Level.sav at the last --inspect",
+    "world_characters": "Saved characters, players and pals, at the last --inspect",
+    "world_pals": "Saved pals at the last --inspect",
+    "world_guilds": "Guilds at the last --inspect",
+    "world_bases": "Base camps at the last --inspect"
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render(results, scrape_seconds, stats):
+    """
+    Builds the Prometheus text exposition for one poll of the server.
+    Args:
+        results (dict): Command name -> CommandResult for 'metrics', 'players' and 'info'.
+        scrape_seconds (float): Time the poll took.
+        stats (dict): Output of telemetry.snapshot().
+    Returns:
+        str: Metrics text.
+    """
+    lines = []
+
+    def gauge(name, help_text, value, labels=""):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{labels} {value}")
+
+    up = all(result.ok for result in results.values())
+    gauge("palworld_up", "1 if the REST API answered every request of the last poll", int(up))
+    gauge("palworld_scrape_duration_seconds", "Time taken to poll the server", round(scrape_seconds, 6))
+
+    metrics = results["metrics"].data if results["metrics"].ok else {}
+    for key, (name, help_text) in SERVER_METRICS.items():
+        if key in metrics:
+            gauge(name, help_text, metrics[key])
+
+    info = results["info"].data if results["info"].ok else None
+    if info:
+        gauge("palworld_info", "Server version and name", 1,
+              _labels(version=info.get("version", ""), servername=info.get("servername", ""),
+                      worldguid=info.get("worldguid", "")))
+
+    players = results["players"].data.get("players", []) if results["players"].ok else []
+    if players:
+        for name, field, help_text in [("palworld_player_level", "level", "Player level"),
+                                       ("palworld_player_ping_ms", "ping", "Player ping in milliseconds")]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for player in players:
+                if field in player:
+                    lines.append(f"{name}{_labels(name=player.get('name', ''), userid=player.get('userId', ''))} "
+                                 f"{player[field]}")
+
+    for key, help_text in UTILITY_GAUGES.items():
+        if key in stats["gauges"]:
+            gauge(f"palworld_util_{key}", help_text, stats["gauges"][key])
+
+    for name, labels in stats["histograms"].items():
+        metric = f"palworld_util_{name}"
+        lines.append(f"# HELP {metric} Latency of commands sent by palworld_util")
+        lines.append(f"# TYPE {metric} histogram")
+        for command, histogram in sorted(labels.items()):
+            for bound, count in zip(telemetry.LATENCY_BUCKETS, histogram["buckets"]):
+                lines.append(f"{metric}_bucket{_labels(command=command, le=bound)} {count}")
+            lines.append(f"{metric}_bucket{_labels(command=command, le='+Inf')} {histogram['count']}")
+            lines.append(f"{metric}_sum{_labels(command=command)} {histogram['sum']}")
+            lines.append(f"{metric}_count{_labels(command=command)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def collect():
+    """
+    Polls the server once, fetching metrics, players and info concurrently.
+    Returns:
+        str: Metrics text.
+    """
+    start_time = time.monotonic()
+    results = dict(run_commands(["metrics", "players", "info"], timeout=EXPORTER_INTERVAL))
+    return render(results, time.monotonic() - start_time, telemetry.snapshot())
+
+
+def write_textfile(path, text):
+    # node_exporter may read at any time, never let it see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class _Cache:
+    def __init__(self):
+        self.text = "# No data collected yet\n"
+        self.lock = threading.Lock()
+
+
+def _poll_forever(cache, interval, textfile):
+    while True:
+        try:
+            text = collect()
+            with cache.lock:
+                cache.text = text
+            if textfile:
+                write_textfile(textfile, text)
+        except Exception as e:
+            log_error(f"Metrics poll failed: {e}")
+        time.sleep(interval)
+
+
+def serve(address=EXPORTER_ADDRESS, port=EXPORTER_PORT, interval=EXPORTER_INTERVAL, textfile=EXPORTER_TEXTFILE):
+    """
+    Serves /metrics from a cache refreshed every 'interval' seconds.
+      Scrapes never reach the game server, however many scrapers there are.
+    """
+    cache = _Cache()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            with cache.lock:
+                body = cache.text.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    threading.Thread(target=_poll_forever, args=(cache, interval, textfile), daemon=True).start()
+    server = ThreadingHTTPServer((address, port), Handler)
+    log_info(f"Serving metrics on http://{address}:{port}/metrics")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
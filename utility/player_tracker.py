@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from array import array
+from datetime import datetime
+
+from utility.config import *
+from utility.logging_config import log_info, os_platform
+
+SAMPLES_FILE = "samples.u32"  # [time, players] pairs, one per poll
+HOURLY_FILE = "hourly.u32"  # [hour start, peak, samples, sum of players] per hour
+SESSIONS_FILE = "sessions.jsonl"  # join/leave events
+ONLINE_FILE = "online.json"  # players seen by the last poll
+
+SAMPLE_FIELDS = 2
+HOURLY_FIELDS = 4
+
+
+def _read_array(path, fields):
+    values = array("I")
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # Ignore a record cut short by a crash mid-append
+            values.fromfile(f, size // (values.itemsize * fields) * fields)
+    except FileNotFoundError:
+        pass
+    return values
+
+
+def _write_array(path, values):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        values.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def _player_key(player):
+    return player.get("userId") or player.get("playerId") or player.get("name", "")
+
+
+class _Lock:
+    # Compaction rewrites the sample file, appends from other invocations must wait for it
+    def __init__(self, path):
+        self.path = f"{path}.lock"
+
+    def __enter__(self):
+        self.file = open(self.path, "w")
+        if os_platform != 'win32':
+            import fcntl
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+class PlayerTracker:
+    """
+    Records who is online from successive 'players' replies.
+      Each poll appends one 8-byte concurrency sample. Samples older than 'raw_days' are folded into
+      one 16-byte record per hour, so a year of history stays in the hundreds of kilobytes.
+      Joins and leaves are found by diffing a poll against the previous one and appended as events.
+    Args:
+        path (str): Directory holding the history files.
+        raw_days (int): Days of per-poll samples to keep before downsampling to hourly records.
+    """
+
+    def __init__(self, path=PLAYER_HISTORY_PATH, raw_days=PLAYER_RAW_DAYS):
+        self.path = path
+        self.raw_days = raw_days
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_online(self):
+        try:
+            with open(self._file(ONLINE_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update(self, players, now=None):
+        """
+        Records one poll.
+        Args:
+            players (list): The 'players' list of a players reply.
+            now (float): Unix time of the poll, the current time if None.
+        Returns:
+            list: Join/leave events, dicts with 'time', 'event', 'userId' and 'name'.
+        """
+        now = int(now or time.time())
+        os.makedirs(self.path, exist_ok=True)
+        current = {_player_key(p): p.get("name", "") for p in players}
+        with _Lock(self._file(SAMPLES_FILE)):
+            previous = self._load_online()
+            events = [{"time": now, "event": "join", "userId": key, "name": name}
+                      for key, name in current.items() if key not in previous]
+            events += [{"time": now, "event": "leave", "userId": key, "name": name}
+                       for key, name in previous.items() if key not in current]
+            if events:
+                with open(self._file(SESSIONS_FILE), "a") as f:
+                    f.writelines(json.dumps(event) + "\n" for event in events)
+                tmp_path = f"{self._file(ONLINE_FILE)}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(current, f)
+                os.replace(tmp_path, self._file(ONLINE_FILE))
+            with open(self._file(SAMPLES_FILE), "ab") as f:
+                array("I", [now, len(current)]).tofile(f)
+            with open(self._file(SAMPLES_FILE), "rb") as f:
+                oldest = array("I", f.read(array("I").itemsize))[0]
+            # Compact about once a day rather than on every poll
+            if oldest < now - (self.raw_days + 1) * 86400:
+                self._downsample(_read_array(self._file(SAMPLES_FILE), SAMPLE_FIELDS), now)
+        for event in events:
+            log_info(f"Player {event['event']}: {event['name']} ({event['userId']})")
+        return events
+
+    def _downsample(self, samples, now):
+        cutoff = (now - self.raw_days * 86400) // 3600 * 3600
+        hourly = _read_array(self._file(HOURLY_FILE), HOURLY_FIELDS)
+        folded = array("I")
+        keep = array("I")
+        for i in range(0, len(samples), SAMPLE_FIELDS):
+            sample_time, players = samples[i], samples[i + 1]
+            if sample_time >= cutoff:
+                keep.extend(samples[i:i + SAMPLE_FIELDS])
+                continue
+            hour = sample_time // 3600 * 3600
+            if folded and folded[-HOURLY_FIELDS] == hour:
+                folded[-3] = max(folded[-3], players)
+                folded[-2] += 1
+                folded[-1] += players
+            else:
+                folded.extend([hour, players, 1, players])
+        # The first folded hour may continue the last stored one
+        if hourly and folded and hourly[-HOURLY_FIELDS] == folded[0]:
+            hourly[-3] = max(hourly[-3], folded[1])
+            hourly[-2] += folded[2]
+            hourly[-1] += folded[3]
+            del folded[:HOURLY_FIELDS]
+        hourly.extend(folded)
+        _write_array(self._file(HOURLY_FILE), hourly)
+        _write_array(self._file(SAMPLES_FILE), keep)
+
+    def peak_per_hour(self, start=0, end=None):
+        """
+        Returns:
+            list: (hour start as Unix time, peak concurrent players) tuples for hours between
+              'start' and 'end', oldest first. Hours without samples are left out.
+        """
+        end = end or time.time()
+        peaks = {}
+        hourly = _read_array(self._file(HOURLY_FILE), HOURLY_FIELDS)
+        for i in range(0, len(hourly), HOURLY_FIELDS):
+            if start <= hourly[i] + 3600 and hourly[i] <= end:
+                peaks[hourly[i]] = hourly[i + 1]
+        samples = _read_array(self._file(SAMPLES_FILE), SAMPLE_FIELDS)
+        for i in range(0, len(samples), SAMPLE_FIELDS):
+            if start <= samples[i] <= end:
+                hour = samples[i] // 3600 * 3600
+                peaks[hour] = max(peaks.get(hour, 0), samples[i + 1])
+        return sorted(peaks.items())
+
+    def quiet_hours(self, days=14):
+        """
+        Ranks the hours of the day by their average peak over the last 'days' days, for picking
+        when to restart or back up.
+        Returns:
+            list: (hour of day in local time, average peak) tuples, quietest first.
+        """
+        totals = {}
+        for hour, peak in self.peak_per_hour(start=time.time() - days * 86400):
+            totals.setdefault(datetime.fromtimestamp(hour).hour, []).append(peak)
+        return sorted(((hour, sum(peaks) / len(peaks)) for hour, peaks in totals.items()),
+                      key=lambda item: (item[1], item[0]))
+
+    def sessions(self, start=0):
+        """
+        Pairs join and leave events into sessions.
+        Returns:
+            list: Dicts with 'userId', 'name', 'start' and 'end' (None if still online), oldest first.
+        """
+        open_sessions = {}
+        sessions = []
+        try:
+            with open(self._file(SESSIONS_FILE), "r") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event["event"] == "join":
+                        session = {"userId": event["userId"], "name": event["name"], "start": event["time"],
+                                   "end": None}
+                        open_sessions[event["userId"]] = session
+                        sessions.append(session)
+                    elif event["userId"] in open_sessions:
+                        open_sessions.pop(event["userId"])["end"] = event["time"]
+        except FileNotFoundError:
+            pass
+        return [s for s in sessions if (s["end"] or time.time()) >= start]
+
+
+_tracker = None
+
+
+def default_tracker():
+    global _tracker
+    if _tracker is None:
+        _tracker = PlayerTracker()
+    return _tracker
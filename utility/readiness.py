@@ -0,0 +1,112 @@
+import base64
+import random
+import socket
+import time
+
+from utility.config import *
+
+# Backoff between probes, in seconds
+INITIAL_DELAY = 0.05
+MAX_DELAY = 2.0
+
+# Timeout for a single TCP connect / API request
+PROBE_TIMEOUT = 1.0
+
+
+class ProbeResult:
+    """
+      reached: True if the server got to the expected state before the timeout.
+      elapsed: Seconds until the state was observed (or until giving up).
+      attempts: Number of probes sent.
+    """
+
+    def __init__(self, reached, elapsed, attempts):
+        self.reached = reached
+        self.elapsed = elapsed
+        self.attempts = attempts
+
+    def __bool__(self):
+        return self.reached
+
+    def __repr__(self):
+        return f"ProbeResult(reached={self.reached}, elapsed={self.elapsed:.3f}, attempts={self.attempts})"
+
+
+def tcp_probe(host, port, timeout=PROBE_TIMEOUT):
+    """
+    Returns:
+        bool: True if something accepts TCP connections on host:port.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def api_probe():
+    # Imported here, so a plain status check never loads requests
+    from utility.detect_api import execute
+    return execute("status", request_timeout=PROBE_TIMEOUT).ok
+
+
+def rest_probe(host=SERVER_IP, port=REST_PORT, user=ADMIN_USER, password=ADMIN_PASS, timeout=PROBE_TIMEOUT):
+    """
+    The REST 'status' check without requests or http.client, whose imports (ssl, email) cost more
+    than the check itself: one GET of 'info' and its status line.
+    Returns:
+        bool: True if the API answered 200.
+    """
+    auth = base64.b64encode(f"{user}:{password}".encode()).decode()
+    request = (f"GET /v1/api/info HTTP/1.1\r\nHost: {host}:{port}\r\nAuthorization: Basic {auth}\r\n"
+               f"Accept: application/json\r\nConnection: close\r\n\r\n")
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(request.encode())
+            with sock.makefile("rb") as f:
+                status_line = f.readline(1024)
+    except OSError:
+        return False
+    # e.g. b"HTTP/1.1 200 OK\r\n"
+    parts = status_line.split(None, 2)
+    return len(parts) >= 2 and parts[0].startswith(b"HTTP/") and parts[1] == b"200"
+
+
+def is_running(host=SERVER_IP, port=None, confirm=api_probe):
+    """
+    Cheap check first: a closed port means the server is down without making an API request.
+    An open port is confirmed with the API, since the port opens before the server can answer.
+    """
+    port = port or REST_PORT or RCON_PORT
+    if not tcp_probe(host, port):
+        return False
+    return confirm()
+
+
+def wait_for_state(expect_running, timeout, host=SERVER_IP, port=None, confirm=api_probe):
+    """
+    Probes the server until it is (or is not) running, with exponential backoff and jitter.
+      Returns as soon as the expected state is seen.
+    Args:
+        expect_running (bool): True to wait for the server to be up, False to wait for it to be down.
+        timeout (float): Maximum time to wait.
+        host (str): Server address.
+        port (int): Port to probe, REST_PORT (or RCON_PORT) by default.
+        confirm (callable): Returns True if the API answers.
+    Returns:
+        ProbeResult: Outcome and how long the transition took.
+    """
+    start_time = time.monotonic()
+    end_time = start_time + timeout
+    delay = INITIAL_DELAY
+    attempts = 0
+    while True:
+        attempts += 1
+        if is_running(host, port, confirm) == expect_running:
+            return ProbeResult(True, time.monotonic() - start_time, attempts)
+        remaining = end_time - time.monotonic()
+        if remaining <= 0:
+            return ProbeResult(False, time.monotonic() - start_time, attempts)
+        # Equal jitter: waiters drift out of lockstep, yet none retries sooner than half the backoff
+        time.sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(MAX_DELAY, delay * 2)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from utility import runtime_dir
+from utility.config import *
+
+enabled = True
+_directory = None
+
+
+def disable():
+    """Bypass the cache for the rest of this process, e.g. for --no-cache."""
+    global enabled
+    enabled = False
+
+
+def cache_dir():
+    """
+    Creates the cache directory on first use, readable by the current user only.
+    Returns:
+        str: The directory, None if it belongs to another user or cannot be created. The cache is
+          then bypassed, like with --no-cache.
+    """
+    global _directory
+    if _directory is None:
+        _directory = runtime_dir.private_dir(CACHE_PATH or runtime_dir.default_path(), "the response cache") or ""
+    return _directory or None
+
+
+def _entry_path(server, command):
+    key = hashlib.sha1(server.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir(), f"{key}_{command}.json")
+
+
+def load(server, command):
+    """
+    Returns:
+        tuple: (age in seconds, cached data), or (None, None) if nothing is cached.
+    """
+    try:
+        with open(_entry_path(server, command), "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    return time.time() - entry["stored"], entry["data"]
+
+
+def store(server, command, data):
+    try:
+        path = _entry_path(server, command)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stored": time.time(), "data": data}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A cache that cannot be written is just a cache miss next time
+        pass
+
+
+def invalidate(server):
+    """Drops every cached reply for a server, after a command that changes its state."""
+    # Even with --no-cache, other processes must not be served the old replies
+    if cache_dir() is None:
+        return
+    for command in CACHE_TTLS:
+        try:
+            os.remove(_entry_path(server, command))
+        except OSError:
+            pass
+
+
+def _claim_refresh(server, command):
+    # Only one process refreshes a stale entry; the claim expires in case that process dies
+    lock_path = f"{_entry_path(server, command)}.refresh"
+    try:
+        if time.time() - os.path.getmtime(lock_path) < CACHE_STALE_SECONDS:
+            return None
+        os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return lock_path
+    except OSError:
+        return None
+
+
+def _refresh(server, command, fetch, lock_path):
+    try:
+        result = fetch()
+        if result.ok:
+            store(server, command, result.data)
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def cached_get(server, command, fetch):
+    """
+    Returns a cached reply for a read-only command, fetching it when needed.
+      Fresh (younger than its CACHE_TTLS entry): served from the cache.
+      Stale (within CACHE_STALE_SECONDS past the TTL): served from the cache and refreshed in the
+        background; the process waits for the refresh before exiting.
+      Otherwise: fetched, and cached if successful.
+    Args:
+        server (str): Identifies the server, e.g. its base URL.
+        command (str): Command name.
+        fetch (callable): Sends the request, returns a CommandResult.
+    Returns:
+        CommandResult: The reply. Replies served from the cache have 'cached' set.
+    """
+    from utility.detect_api import CommandResult
+
+    ttl = CACHE_TTLS.get(command, 0)
+    if not enabled or ttl <= 0 or cache_dir() is None:
+        return fetch()
+    age, data = load(server, command)
+    if age is not None and age >= ttl + CACHE_STALE_SECONDS:
+        age = None
+    if age is None:
+        result = fetch()
+        if result.ok:
+            store(server, command, result.data)
+        return result
+    if age >= ttl:
+        lock_path = _claim_refresh(server, command)
+        if lock_path:
+            threading.Thread(target=_refresh, args=(server, command, fetch, lock_path)).start()
+    result = CommandResult(command, status=200, data=data)
+    result.cached = True
+    return result
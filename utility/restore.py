@@ -0,0 +1,154 @@
+import os
+import re
+import shutil
+import tarfile
+from datetime import datetime
+
+from utility import compression, dedup_store
+from utility.logging_config import log_info
+
+
+class RestoreError(Exception):
+    pass
+
+
+def _safe_path(target_dir, name):
+    # Never write outside the target, whatever the archive says
+    target_dir = os.path.abspath(target_dir)
+    path = os.path.normpath(os.path.join(target_dir, name))
+    if os.path.commonpath([path, target_dir]) != target_dir:
+        raise RestoreError(f"Refusing to restore {name} outside {target_dir}")
+    return path
+
+
+def extract_archive(archive_path, target_dir):
+    """
+    Extracts a whole archive into target_dir in one sequential pass, checking every file against
+    the archive's manifest as it is written.
+    Raises:
+        RestoreError: A file is damaged or missing.
+    """
+    manifest = compression.load_manifest(archive_path) or {}
+    expected_files = manifest.get("files")
+    seen = set()
+    os.makedirs(target_dir, exist_ok=True)
+    with compression.open_decompressed(archive_path) as stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            path = _safe_path(target_dir, member.name)
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if not member.isreg():
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            reader = compression.HashingReader(tar.extractfile(member))
+            with open(path, "wb") as f:
+                shutil.copyfileobj(reader, f, 1024 * 1024)
+            os.chmod(path, member.mode & 0o7777)
+            os.utime(path, (member.mtime, member.mtime))
+            seen.add(member.name)
+            if expected_files is not None:
+                expected = expected_files.get(member.name)
+                if expected is None or expected["sha256"] != reader.sha256.hexdigest():
+                    raise RestoreError(f"{member.name} in {archive_path} does not match its checksum")
+    if expected_files is not None and set(expected_files) - seen:
+        raise RestoreError(f"{archive_path} is missing {', '.join(sorted(set(expected_files) - seen))}")
+
+
+def _is_player_file(name, player_id):
+    return bool(re.search(rf"(^|/)Players/{re.escape(player_id)}\.sav$", name, re.IGNORECASE))
+
+
+def find_player_file(names, player_id):
+    """
+    Finds a player's save among archive member names, e.g. ./<world id>/Players/<player id>.sav
+    Returns:
+        str: The matching name.
+    Raises:
+        RestoreError: No match, or the player has saves in several worlds.
+    """
+    matches = [name for name in names if _is_player_file(name, player_id)]
+    if not matches:
+        raise RestoreError(f"No save for player {player_id} in this backup.")
+    if len(matches) > 1:
+        raise RestoreError(f"Player {player_id} has saves in several worlds: {', '.join(matches)}")
+    return matches[0]
+
+
+def read_player_file(backup, player_id, repo_path=None):
+    """
+    Reads one player's save out of an archive or dedup snapshot, without unpacking the rest.
+      Archives with a block index only decompress the blocks holding the file. Older archives are
+      read sequentially until the file is found.
+    Args:
+        backup (str): Archive path, or snapshot name if repo_path is given.
+    Returns:
+        tuple: (member name relative to the save directory, contents)
+    """
+    if repo_path:
+        entries = {entry["path"]: entry for entry in dedup_store.load_manifest(repo_path, backup)["files"]}
+        name = find_player_file(entries, player_id)
+        return name, dedup_store.read_file(repo_path, entries[name])
+    manifest = compression.load_manifest(backup)
+    if manifest and all("offset" in entry for entry in manifest["files"].values()):
+        name = find_player_file(manifest["files"], player_id)
+        return name, compression.read_member(backup, name, manifest)
+    with compression.open_decompressed(backup) as stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if member.isreg() and _is_player_file(member.name, player_id):
+                return member.name, tar.extractfile(member).read()
+    raise RestoreError(f"No save for player {player_id} in this backup.")
+
+
+def stage_full_restore(backup, save_dir, repo_path=None):
+    """
+    Unpacks a backup next to the save directory, on the same filesystem so it can be swapped in
+    with a rename. The live save directory is not touched.
+    Returns:
+        str: The staged copy.
+    """
+    staged = f"{os.path.normpath(save_dir)}.restore-{os.getpid()}"
+    shutil.rmtree(staged, ignore_errors=True)
+    try:
+        if repo_path:
+            dedup_store.restore_snapshot(repo_path, backup, staged)
+        else:
+            extract_archive(backup, staged)
+    except BaseException:
+        shutil.rmtree(staged, ignore_errors=True)
+        raise
+    return staged
+
+
+def swap_in(staged, save_dir):
+    """
+    Replaces the save directory with the staged copy. The previous saves are kept next to it.
+    Returns:
+        str: Where the previous saves were moved.
+    """
+    save_dir = os.path.normpath(save_dir)
+    previous = f"{save_dir}.pre-restore-{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    os.rename(save_dir, previous)
+    try:
+        os.rename(staged, save_dir)
+    except OSError:
+        os.rename(previous, save_dir)
+        raise
+    log_info(f"Previous saves kept in {previous}")
+    return previous
+
+
+def replace_file(save_dir, name, content):
+    """
+    Atomically replaces one file in the save directory.
+    """
+    path = _safe_path(save_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.restore-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path):
+        shutil.copy2(path, f"{path}.pre-restore")
+    os.replace(tmp_path, path)
@@ -0,0 +1,64 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+from utility.compression import CODEC_EXTENSIONS
+from utility.config import DAYS_TO_KEEP
+
+# Palworld_<timestamp>.<archive extension>
+BACKUP_NAME_PATTERN = re.compile(r"Palworld_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})(%s)" % "|".join(
+    re.escape(ext) for ext in CODEC_EXTENSIONS.values()))
+
+
+def list_archives(backups_path):
+    """
+    Organize backups by date using filename date.
+    Returns:
+        list: (datetime, path) tuples for every archive in 'backups_path'.
+    """
+    backups = []
+    for file in os.listdir(backups_path):
+        match = BACKUP_NAME_PATTERN.fullmatch(file)
+        if match:
+            backups.append((datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M-%S"),
+                            os.path.join(backups_path, file)))
+    return backups
+
+
+def select_old_backups(backups, days_to_keep=DAYS_TO_KEEP):
+    """
+    Applies the retention policy to a list of backups.
+      Keeps the two most recent backups from today, and the most recent backup
+      for each day within DAYS_TO_KEEP.
+    Args:
+        backups (list): (datetime, item) tuples, one per backup.
+        days_to_keep (int): Number of previous days to keep one backup for.
+    Returns:
+        list: Items that should be deleted.
+    """
+    paths_to_delete = []
+    current_date = datetime.now()
+    backups_by_day = {}
+    for backup_time, item in backups:
+        date_str = backup_time.strftime('%Y-%m-%d')
+        if date_str not in backups_by_day:
+            backups_by_day[date_str] = []
+        backups_by_day[date_str].append((backup_time, item))
+
+    # Sort backups by creation time within each day
+    for date_str in backups_by_day:
+        backups_by_day[date_str].sort()
+
+    # Keep the most recent two backups from today
+    today_str = current_date.strftime('%Y-%m-%d')
+    if today_str in backups_by_day:
+        delete_today = backups_by_day[today_str][:-2]  # Delete the rest for today
+        paths_to_delete.extend([item for _, item in delete_today])
+
+    # Keep the most recent backup for each day within the configured DAYS_TO_KEEP
+    for i in range(1, int(days_to_keep) + 1):
+        day_str = (current_date - timedelta(days=i)).strftime('%Y-%m-%d')
+        if day_str in backups_by_day:
+            delete_day = backups_by_day[day_str][:-1]  # Delete the rest for this day
+            paths_to_delete.extend([item for _, item in delete_day])
+    return paths_to_delete
@@ -0,0 +1,60 @@
+import os
+import stat
+
+from utility.logging_config import log_error
+
+
+def default_path():
+    # Per-user runtime state: the response cache and the daemon's control socket
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "palworld_util")
+
+
+def _owned(st):
+    return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+
+def is_private(path):
+    """
+    Returns:
+        bool: True if 'path' is a directory of the current user that nobody else can write to.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and _owned(st) and not st.st_mode & 0o022
+
+
+def is_own_socket(path):
+    """
+    Returns:
+        bool: True if 'path' is a socket of the current user, in a directory only that user can write to.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and _owned(st) and is_private(os.path.dirname(os.path.abspath(path)))
+
+
+def private_dir(path, purpose):
+    """
+    Creates a directory only the current user can open, or checks an existing one.
+    Args:
+        purpose (str): What the directory is for, used in the error message.
+    Returns:
+        str: The directory, None if it belongs to another user, others can write to it, or it cannot be created.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if not is_private(path):
+            # Possibly planted, or written to by others, to read or spoof what is kept there
+            log_error(f"Not using {purpose}: {path} is not a private directory of this user.")
+            return None
+        if os.lstat(path).st_mode & 0o077:
+            os.chmod(path, 0o700)
+    except OSError as e:
+        log_error(f"Not using {purpose}: {e}")
+        return None
+    return path
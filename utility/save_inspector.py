@@ -0,0 +1,383 @@
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+# .sav container: uncompressed length, compressed length, magic, save type
+SAV_MAGIC = b"PlZ"
+SAV_OODLE_MAGIC = b"PlM"
+SAV_CHUNKED_MAGIC = b"CNK"
+SAVE_TYPE_ZLIB = 0x31
+SAVE_TYPE_ZLIB_TWICE = 0x32
+
+GVAS_MAGIC = b"GVAS"
+
+# Compressed bytes decompressed per step
+READ_SIZE = 4 * 1024 * 1024
+
+GUILD_GROUP_TYPE = "EPalGroupType::Guild"
+
+
+class SaveFormatError(Exception):
+    pass
+
+
+def _sav_header(buf):
+    """
+    Returns:
+        tuple: (uncompressed length, compressed length, save type, offset of the compressed data)
+    """
+    if len(buf) < 12:
+        raise SaveFormatError("File is too short to be a Palworld save.")
+    uncompressed_len, compressed_len = struct.unpack_from("<II", buf, 0)
+    magic, save_type, offset = bytes(buf[8:11]), buf[11], 12
+    if magic == SAV_CHUNKED_MAGIC:
+        uncompressed_len, compressed_len = struct.unpack_from("<II", buf, 12)
+        magic, save_type, offset = bytes(buf[20:23]), buf[23], 24
+    if magic == SAV_OODLE_MAGIC:
+        raise SaveFormatError("Oodle-compressed saves (PlM) are not supported.")
+    if magic != SAV_MAGIC:
+        raise SaveFormatError(f"Not a Palworld save: magic {magic!r}")
+    if save_type not in (SAVE_TYPE_ZLIB, SAVE_TYPE_ZLIB_TWICE):
+        raise SaveFormatError(f"Unknown save type 0x{save_type:02x}")
+    return uncompressed_len, compressed_len, save_type, offset
+
+
+def decompress_sav(path, out_file):
+    """
+    Streams the GVAS data out of a .sav file into 'out_file', a few MB at a time.
+      Saves compressed twice are run through two chained decompressors, never held in memory.
+    Returns:
+        int: Bytes written.
+    Raises:
+        SaveFormatError: Not a Palworld save, or the compressed data is damaged.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        uncompressed_len, _, save_type, offset = _sav_header(buf)
+        stages = [zlib.decompressobj() for _ in range(1 if save_type == SAVE_TYPE_ZLIB else 2)]
+        written = 0
+        try:
+            for start in range(offset, len(buf), READ_SIZE):
+                data = buf[start:start + READ_SIZE]
+                for stage in stages:
+                    data = stage.decompress(data)
+                out_file.write(data)
+                written += len(data)
+            data = b""
+            for stage in stages:
+                data = stage.decompress(data) + stage.flush()
+            out_file.write(data)
+            written += len(data)
+        except zlib.error as e:
+            raise SaveFormatError(f"{path}: compressed data is damaged: {e}") from e
+        if not all(stage.eof for stage in stages):
+            raise SaveFormatError(f"{path}: compressed data is truncated")
+    if written != uncompressed_len:
+        raise SaveFormatError(f"{path}: expected {uncompressed_len} bytes, got {written}")
+    return written
+
+
+@contextmanager
+def open_gvas(path, temp_dir=None):
+    """
+    Memory-maps the GVAS data of a .sav file, decompressing it to a temporary file first.
+    Yields:
+        mmap: Read-only GVAS data.
+    """
+    with open(path, "rb") as f:
+        is_gvas = f.read(4) == GVAS_MAGIC
+    if is_gvas:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+        return
+    with tempfile.TemporaryFile(dir=temp_dir) as tmp:
+        decompress_sav(path, tmp)
+        tmp.flush()
+        with mmap.mmap(tmp.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def guid_hex(raw):
+    # The format of player save file names: four little-endian uint32s
+    return "".join(f"{part:08X}" for part in struct.unpack("<4I", raw))
+
+
+class GvasReader:
+    """
+    Reads GVAS values at a position in a buffer. Nothing is copied except the strings asked for.
+    """
+
+    def __init__(self, buf, pos=0):
+        self.buf = buf
+        self.pos = pos
+
+    def _unpack(self, fmt, size):
+        try:
+            value = struct.unpack_from(fmt, self.buf, self.pos)[0]
+        except struct.error as e:
+            raise SaveFormatError(f"Unexpected end of data at offset {self.pos}") from e
+        self.pos += size
+        return value
+
+    def u8(self):
+        return self._unpack("<B", 1)
+
+    def i32(self):
+        return self._unpack("<i", 4)
+
+    def u32(self):
+        return self._unpack("<I", 4)
+
+    def i64(self):
+        return self._unpack("<q", 8)
+
+    def f32(self):
+        return self._unpack("<f", 4)
+
+    def u16(self):
+        return self._unpack("<H", 2)
+
+    def read(self, size):
+        if self.pos + size > len(self.buf):
+            raise SaveFormatError(f"Unexpected end of data at offset {self.pos}")
+        data = self.buf[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def fstring(self):
+        length = self.i32()
+        if length == 0:
+            return ""
+        if length > 0:
+            return self.read(length)[:-1].decode("utf-8", "replace")
+        return self.read(-length * 2)[:-2].decode("utf-16-le", "replace")
+
+    def optional_guid(self):
+        if self.u8():
+            self.pos += 16
+
+
+def read_header(r):
+    """
+    Reads the GVAS header, leaving the reader at the first property.
+    Returns:
+        dict: Engine version and save game class.
+    """
+    if r.read(4) != GVAS_MAGIC:
+        raise SaveFormatError("Not GVAS data")
+    save_game_version = r.i32()
+    r.i32()  # package file version, UE4
+    if save_game_version >= 3:
+        r.i32()  # package file version, UE5
+    engine = f"{r.u16()}.{r.u16()}.{r.u16()}"
+    r.u32()  # changelist
+    r.fstring()  # branch
+    r.i32()  # custom version format
+    for _ in range(r.i32()):
+        r.pos += 20  # custom version guid and number
+    return {"save_game_version": save_game_version, "engine": engine, "class": r.fstring()}
+
+
+def property_header(r):
+    """
+    Reads a property's name, type and type parameters, leaving the reader at its value.
+    Returns:
+        dict: 'name', 'type', 'size' (bytes in the value) and 'start' (offset of the value),
+          plus 'struct_type', 'inner_type', 'key_type'/'value_type', 'enum_type' or 'value'
+          depending on the type. None at the end of a property list.
+    """
+    name = r.fstring()
+    if name == "None":
+        return None
+    info = {"name": name, "type": r.fstring(), "size": r.i64()}
+    prop_type = info["type"]
+    if prop_type == "StructProperty":
+        info["struct_type"] = r.fstring()
+        r.pos += 16
+        r.optional_guid()
+    elif prop_type in ("ArrayProperty", "SetProperty"):
+        info["inner_type"] = r.fstring()
+        r.optional_guid()
+    elif prop_type == "MapProperty":
+        info["key_type"] = r.fstring()
+        info["value_type"] = r.fstring()
+        r.optional_guid()
+    elif prop_type == "BoolProperty":
+        info["value"] = r.u8() != 0
+        r.optional_guid()
+    elif prop_type in ("EnumProperty", "ByteProperty"):
+        info["enum_type"] = r.fstring()
+        r.optional_guid()
+    else:
+        r.optional_guid()
+    info["start"] = r.pos
+    return info
+
+
+def iter_properties(r):
+    """
+    Walks a property list. After each property is yielded the reader is moved past its value,
+    whether or not the caller read it, so unneeded values are skipped without being decoded.
+    """
+    while True:
+        info = property_header(r)
+        if info is None:
+            return
+        yield info
+        r.pos = info["start"] + info["size"]
+
+
+def read_value(r, info):
+    """
+    Decodes a simple value: numbers, strings, names, enums, booleans and Guid structs.
+    Returns:
+        The value, or None for types that are not decoded.
+    """
+    prop_type = info["type"]
+    if prop_type == "StructProperty" and info["struct_type"] == "Guid":
+        return guid_hex(r.read(16))
+    if prop_type in ("StrProperty", "NameProperty", "EnumProperty"):
+        return r.fstring()
+    if prop_type == "IntProperty":
+        return r.i32()
+    if prop_type == "Int64Property":
+        return r.i64()
+    if prop_type == "UInt32Property":
+        return r.u32()
+    if prop_type == "FloatProperty":
+        return r.f32()
+    if prop_type == "BoolProperty":
+        return info["value"]
+    if prop_type == "ByteProperty":
+        return r.u8() if info["enum_type"] == "None" else r.fstring()
+    return None
+
+
+def read_properties(r, names):
+    """
+    Returns:
+        dict: Decoded values of the properties in 'names' found in the list at the reader.
+    """
+    values = {}
+    for info in iter_properties(r):
+        if info["name"] in names:
+            values[info["name"]] = read_value(r, info)
+    return values
+
+
+def _element_count(r, info):
+    if info["type"] == "MapProperty":
+        r.pos = info["start"] + 4  # entries to remove
+        return r.u32()
+    if info["type"] in ("ArrayProperty", "SetProperty"):
+        r.pos = info["start"] + (4 if info["type"] == "SetProperty" else 0)
+        return r.u32()
+    if info["type"] == "StructProperty":
+        # Wrapper structs such as MapObjectSaveData hold a single array or map
+        r.pos = info["start"]
+        for inner in iter_properties(r):
+            if inner["type"] in ("ArrayProperty", "MapProperty", "SetProperty"):
+                return _element_count(r, inner)
+            break
+    return None
+
+
+def _raw_data(r, values_start):
+    # Character and group RawData: a byte array that itself holds a property list
+    r.pos = values_start
+    for info in iter_properties(r):
+        if info["name"] == "RawData" and info["type"] == "ArrayProperty":
+            r.pos = info["start"] + 4
+            return True
+    return False
+
+
+def _characters(r, info, summary):
+    r.pos = info["start"] + 4
+    for _ in range(r.u32()):
+        key = read_properties(r, ["PlayerUId"])
+        value_start = r.pos
+        if _raw_data(r, value_start):
+            for prop in iter_properties(r):
+                if prop["name"] == "SaveParameter":
+                    r.pos = prop["start"]
+                    params = read_properties(r, ["IsPlayer", "NickName", "Level", "CharacterID", "OwnerPlayerUId"])
+                    if params.get("IsPlayer"):
+                        summary["players"].append({"uid": key.get("PlayerUId"), "name": params.get("NickName"),
+                                                   "level": params.get("Level", 1)})
+                    else:
+                        summary["pals"] += 1
+                        summary["pal_species"][params.get("CharacterID")] += 1
+                        owner = params.get("OwnerPlayerUId")
+                        if owner and owner.strip("0"):
+                            summary["pals_per_owner"][owner] += 1
+                    break
+        # Skip the rest of the entry's value
+        r.pos = value_start
+        for _ in iter_properties(r):
+            pass
+        summary["characters"] += 1
+
+
+def _groups(r, info, summary):
+    r.pos = info["start"] + 4
+    for _ in range(r.u32()):
+        # Group keys are bare Guids, the file does not say so
+        r.pos += 16
+        group_type = read_properties(r, ["GroupType"]).get("GroupType")
+        summary["group_types"][group_type] += 1
+
+
+def summarize(buf):
+    """
+    Walks a Level.sav's GVAS data and collects world statistics.
+      Only the properties needed are decoded; everything else is skipped using the sizes in the file.
+    Args:
+        buf: GVAS data, e.g. from open_gvas().
+    Returns:
+        dict: 'header', 'sections' (name, type, bytes, elements for each worldSaveData property),
+          'players', 'characters', 'pals', 'guilds', 'bases', 'group_types', 'pal_species',
+          'pals_per_owner' and 'gvas_bytes'.
+    """
+    r = GvasReader(buf)
+    summary = {"header": read_header(r), "gvas_bytes": len(buf), "sections": [], "players": [],
+               "characters": 0, "pals": 0, "guilds": 0, "bases": 0, "group_types": Counter(),
+               "pal_species": Counter(), "pals_per_owner": Counter()}
+    for root in iter_properties(r):
+        if root["name"] != "worldSaveData":
+            continue
+        r.pos = root["start"]
+        for info in iter_properties(r):
+            summary["sections"].append({"name": info["name"], "type": info["type"], "bytes": info["size"],
+                                        "elements": _element_count(r, info)})
+            if info["name"] == "CharacterSaveParameterMap":
+                _characters(r, info, summary)
+            elif info["name"] == "GroupSaveDataMap":
+                _groups(r, info, summary)
+            elif info["name"] == "BaseCampSaveData":
+                summary["bases"] = summary["sections"][-1]["elements"] or 0
+    summary["guilds"] = summary["group_types"][GUILD_GROUP_TYPE]
+    return summary
+
+
+def inspect_save(path, temp_dir=None):
+    """
+    Returns:
+        dict: summarize() of a Level.sav file.
+    Raises:
+        SaveFormatError: The file is not a readable Palworld save.
+    """
+    with open_gvas(path, temp_dir) as buf:
+        return summarize(buf)
+
+
+def find_level_saves(save_dir):
+    """
+    Returns:
+        list: Paths of the Level.sav files under a save directory, one per world.
+    """
+    return sorted(os.path.join(root, "Level.sav") for root, _, file_names in os.walk(save_dir)
+                  if "Level.sav" in file_names)
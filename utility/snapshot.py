@@ -0,0 +1,67 @@
+import os
+import shutil
+
+from utility.logging_config import log_info
+
+# ioctl that clones a file's extents on btrfs/xfs (Linux FICLONE)
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl  # not available on Windows
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, dst)
+
+
+def _copy_file(src, dst, method):
+    if method == "reflink":
+        _reflink(src, dst)
+    elif method == "hardlink":
+        os.link(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def snapshot_tree(src, staging_dir, method="auto"):
+    """
+    Makes a point-in-time copy of the save directory.
+    Args:
+        src (str): Save directory.
+        staging_dir (str): Destination, replaced if it already exists. Use the same filesystem
+          as 'src' for reflinks and hardlinks.
+        method (str): "reflink", "hardlink", "copy", or "auto" to try a reflink and fall back to copying.
+          Only use "hardlink" if the server replaces save files instead of rewriting them in place.
+    Returns:
+        str: The method that was used.
+    """
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+    if method == "auto":
+        method = "reflink"
+        fallback = "copy"
+    else:
+        fallback = None
+
+    for root, dir_names, file_names in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        dst_root = os.path.join(staging_dir, rel_root)
+        for dir_name in dir_names:
+            os.makedirs(os.path.join(dst_root, dir_name), exist_ok=True)
+        for file_name in file_names:
+            src_file = os.path.join(root, file_name)
+            dst_file = os.path.join(dst_root, file_name)
+            try:
+                _copy_file(src_file, dst_file, method)
+            except OSError:
+                if not fallback:
+                    raise
+                # Filesystem does not support clones, copy everything from here on
+                log_info(f"{method} is not supported for {staging_dir}, falling back to {fallback}.")
+                method, fallback = fallback, None
+                if os.path.exists(dst_file):
+                    os.remove(dst_file)
+                _copy_file(src_file, dst_file, method)
+        shutil.copystat(root, dst_root)
+    return method
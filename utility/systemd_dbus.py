@@ -0,0 +1,158 @@
+import time
+
+from utility.config import *
+
+try:
+    from jeepney import DBusAddress, DBusErrorResponse, MatchRule, Properties, new_method_call
+    from jeepney.bus_messages import message_bus
+    from jeepney.io.blocking import open_dbus_connection
+    from jeepney.wrappers import unwrap_msg
+except ImportError:
+    open_dbus_connection = None
+
+SYSTEMD_BUS_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+MANAGER_INTERFACE = "org.freedesktop.systemd1.Manager"
+UNIT_INTERFACE = "org.freedesktop.systemd1.Unit"
+
+# ActiveState values a unit settles in after each action
+SETTLED_STATES = {
+    "start": ["active"],
+    "restart": ["active"],
+    "stop": ["inactive", "failed"],
+    "kill": ["inactive", "failed"]
+}
+
+
+class SystemdError(Exception):
+    pass
+
+
+def available():
+    if SYSTEMD_BACKEND == "systemctl":
+        return False
+    return open_dbus_connection is not None
+
+
+class SystemdBus:
+    """
+    Talks to systemd's manager over D-Bus.
+      Job completion and unit state changes are received as signals, nothing is polled.
+    Args:
+        bus_address (str): D-Bus address, None for the system bus. Point it at a private bus to test
+          against a fake org.freedesktop.systemd1 service.
+    """
+
+    def __init__(self, bus_address=None):
+        self.conn = open_dbus_connection(bus=bus_address or "SYSTEM")
+        self.manager = DBusAddress(SYSTEMD_PATH, bus_name=SYSTEMD_BUS_NAME, interface=MANAGER_INTERFACE)
+        # systemd only emits JobRemoved/PropertiesChanged to subscribed clients
+        self._call(self.manager, "Subscribe")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _call(self, address, method, signature=None, body=(), timeout=30):
+        try:
+            return unwrap_msg(self.conn.send_and_get_reply(new_method_call(address, method, signature, body),
+                                                           timeout=timeout))
+        except DBusErrorResponse as e:
+            raise SystemdError(f"{method} failed: {e.name}: {e.data}") from e
+
+    def _add_match(self, rule):
+        unwrap_msg(self.conn.send_and_get_reply(message_bus.AddMatch(rule)))
+
+    def unit_path(self, unit):
+        return self._call(self.manager, "LoadUnit", "s", (unit,))[0]
+
+    def active_state(self, unit):
+        unit_address = DBusAddress(self.unit_path(unit), bus_name=SYSTEMD_BUS_NAME, interface=UNIT_INTERFACE)
+        return unwrap_msg(self.conn.send_and_get_reply(Properties(unit_address).get("ActiveState")))[0][1]
+
+    def run_job(self, action, unit, timeout):
+        """
+        Queues a start/stop/restart job and waits for systemd to report it finished.
+        Returns:
+            str: Job result: "done", "failed", "canceled", "timeout", "dependency" or "skipped".
+        """
+        method = {"start": "StartUnit", "stop": "StopUnit", "restart": "RestartUnit"}[action]
+        rule = MatchRule(type="signal", interface=MANAGER_INTERFACE, member="JobRemoved", path=SYSTEMD_PATH)
+        self._add_match(rule)
+        # Listen before queueing the job, a fast job can finish before the reply arrives
+        with self.conn.filter(rule) as signals:
+            job_path = self._call(self.manager, method, "ss", (unit, "replace"))[0]
+            end_time = time.monotonic() + timeout
+            while True:
+                try:
+                    # JobRemoved(id, job, unit, result)
+                    _, removed_job, _, result = self.conn.recv_until_filtered(
+                        signals, timeout=max(end_time - time.monotonic(), 0)).body
+                except TimeoutError:
+                    raise TimeoutError(f"{method} {unit} did not finish within {timeout} seconds.") from None
+                if removed_job == job_path:
+                    return result
+
+    def kill(self, unit, signal=9):
+        self._call(self.manager, "KillUnit", "ssi", (unit, "all", signal))
+        return True
+
+    def wait_active_state(self, unit, states, timeout):
+        """
+        Waits for the unit's ActiveState to become one of 'states'.
+        Returns:
+            str: The state reached.
+        """
+        unit_path = self.unit_path(unit)
+        rule = MatchRule(type="signal", interface="org.freedesktop.DBus.Properties", member="PropertiesChanged",
+                         path=unit_path)
+        self._add_match(rule)
+        with self.conn.filter(rule) as signals:
+            state = self.active_state(unit)
+            end_time = time.monotonic() + timeout
+            while state not in states:
+                try:
+                    interface, changed, _ = self.conn.recv_until_filtered(
+                        signals, timeout=max(end_time - time.monotonic(), 0)).body
+                except TimeoutError:
+                    raise TimeoutError(f"{unit} is still {state} after {timeout} seconds.") from None
+                if interface == UNIT_INTERFACE and "ActiveState" in changed:
+                    state = changed["ActiveState"][1]
+        return state
+
+
+def control_unit(action, unit=SERVICE_NAME, timeout=30, bus_address=SYSTEMD_BUS_ADDRESS):
+    """
+    Starts, stops, restarts or kills a unit and waits until it has settled.
+    Args:
+        action (str): "start", "stop", "restart" or "kill".
+    Returns:
+        tuple: (ok, detail), or None if D-Bus cannot be used and the caller should fall back to systemctl.
+    """
+    if not available():
+        return None
+    try:
+        with SystemdBus(bus_address) as bus:
+            if action == "kill":
+                bus.kill(unit)
+            else:
+                result = bus.run_job(action, unit, timeout)
+                if result != "done":
+                    return False, f"{action} job for {unit} finished with result '{result}'"
+            state = bus.wait_active_state(unit, SETTLED_STATES[action], timeout)
+            return state in SETTLED_STATES[action], f"{unit} is {state}"
+    except TimeoutError as e:
+        return False, str(e)
+    except OSError:
+        # No system bus to connect to: let the caller use systemctl
+        return None
+    except SystemdError as e:
+        # systemd not on this bus, or not authorized without sudo: let the caller use systemctl
+        if any(name in str(e) for name in ["AccessDenied", "InteractiveAuthorizationRequired", "ServiceUnknown"]):
+            return None
+        return False, str(e)
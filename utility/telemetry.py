@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+
+from utility.config import *
+from utility.logging_config import os_platform
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+_lock = threading.Lock()
+_gauges = {}
+_histograms = {}
+
+
+def set_gauge(name, value):
+    """
+    Records the latest value of one of the utility's own measurements, e.g. backup_duration_seconds.
+    """
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, label, value):
+    """
+    Adds one observation to a histogram, e.g. observe("command_latency_seconds", "info", 0.012)
+    """
+    with _lock:
+        histogram = _histograms.setdefault(name, {}).setdefault(label, {
+            "buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0})
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value
+
+
+def _merge(stats, gauges, histograms):
+    stats.setdefault("gauges", {}).update(gauges)
+    for name, labels in histograms.items():
+        for label, histogram in labels.items():
+            saved = stats.setdefault("histograms", {}).setdefault(name, {}).setdefault(label, {
+                "buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0})
+            saved["buckets"] = [a + b for a, b in zip(saved["buckets"], histogram["buckets"])]
+            saved["count"] += histogram["count"]
+            saved["sum"] += histogram["sum"]
+    return stats
+
+
+def load(path=TELEMETRY_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"gauges": {}, "histograms": {}}
+
+
+def flush(path=TELEMETRY_PATH):
+    """
+    Adds this process's measurements to the stats file shared by every invocation, then clears them.
+      Histograms are cumulative across runs, gauges keep the latest value.
+    """
+    with _lock:
+        if not _gauges and not _histograms:
+            return
+        gauges, histograms = dict(_gauges), {k: dict(v) for k, v in _histograms.items()}
+        _gauges.clear()
+        _histograms.clear()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "w") as lock_file:
+            if os_platform != 'win32':
+                import fcntl
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            stats = _merge(load(path), gauges, histograms)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, path)
+    except OSError:
+        # Telemetry must never break the command that produced it
+        pass
+
+
+def snapshot(path=TELEMETRY_PATH):
+    """
+    Returns:
+        dict: Saved stats merged with this process's measurements that have not been flushed yet.
+    """
+    with _lock:
+        return _merge(load(path), dict(_gauges), {k: dict(v) for k, v in _histograms.items()})
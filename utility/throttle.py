@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+
+import psutil
+
+from utility import compression
+from utility.config import *
+from utility.logging_config import log_info, log_error, log_progress, os_platform
+
+
+def lower_priority():
+    """
+    Drops the calling thread to idle CPU and I/O priority, so the game server always goes first.
+      Threads started afterwards, such as the compression workers, inherit it. Linux keeps both
+      priorities per thread; on Windows the whole process is lowered.
+    """
+    try:
+        if os_platform == 'win32':
+            process = psutil.Process()
+            process.nice(psutil.IDLE_PRIORITY_CLASS)
+            process.ionice(psutil.IOPRIO_VERYLOW)
+        else:
+            # os.nice and ioprio apply to the calling thread only
+            os.nice(19)
+            if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+                psutil.Process(threading.get_native_id()).ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (OSError, psutil.Error) as e:
+        log_error(f"Could not lower the process priority: {e}")
+
+
+def run_at_idle_priority(action):
+    """
+    Runs 'action' on a new thread at idle priority and waits for it, leaving the caller's priority alone,
+    so a long-running daemon is not slowed down for good by one backup.
+    Returns:
+        The return value of 'action', whose exceptions are raised in the caller.
+    """
+    outcome = {}
+
+    def target():
+        lower_priority()
+        try:
+            outcome["result"] = action()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name="idle-priority")
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class TokenBucket:
+    """
+    Limits a byte stream to 'rate' bytes per second, None for no limit.
+      Requests larger than the bucket are let through and paid back by sleeping, so a 4 MiB block
+      and a 16 KiB read are limited the same way.
+    """
+
+    def __init__(self, rate, burst_seconds=0.25):
+        self.lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.rate = rate
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.total = 0
+        self.started = self.last
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.rate * self.burst_seconds, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def observed_rate(self):
+        """
+        Returns:
+            float: Average bytes per second consumed so far.
+        """
+        with self.lock:
+            return self.total / max(time.monotonic() - self.started, 1e-3)
+
+    def consume(self, size):
+        with self.lock:
+            self.total += size
+            if not self.rate:
+                return
+            self._refill()
+            self.tokens -= size
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class Throttle:
+    """
+    Read and write bandwidth caps for a backup taken while the server runs, adapted to how the
+    server copes.
+      While started, the server's 'metrics' are polled every 'interval' seconds. When FPS falls
+      more than THROTTLE_FPS_DROP below the first sample, or frame time rises THROTTLE_FRAME_TIME_SPIKE
+      times above it, both caps are halved (down to THROTTLE_MIN_SCALE of their configured value).
+      While the server is healthy they recover by a tenth per poll. A cap of None has no limit until
+      the first back off, which starts from the throughput seen so far.
+    Args:
+        read_rate (int): Bytes per second read from the save directory, None for no limit.
+        write_rate (int): Bytes per second written to the archive, None for no limit.
+        fetch_metrics (callable): Returns the 'metrics' reply as a dict, None if it is unavailable.
+    """
+
+    def __init__(self, read_rate=THROTTLE_READ_BYTES_PER_SECOND, write_rate=THROTTLE_WRITE_BYTES_PER_SECOND,
+                 fetch_metrics=None, interval=THROTTLE_CHECK_INTERVAL):
+        self.read_bucket = TokenBucket(read_rate)
+        self.write_bucket = TokenBucket(write_rate)
+        self.base_rates = {self.read_bucket: read_rate, self.write_bucket: write_rate}
+        self.fetch_metrics = fetch_metrics
+        self.interval = interval
+        self.scale = 1.0
+        self.baseline = None
+        self.backoffs = 0
+        self.stopped = threading.Event()
+        self.monitor = None
+
+    def read(self, size):
+        self.read_bucket.consume(size)
+
+    def write(self, size):
+        self.write_bucket.consume(size)
+
+    def _apply_scale(self, scale):
+        self.scale = scale
+        for bucket, base_rate in self.base_rates.items():
+            if base_rate is None and scale < 1.0 and bucket.total:
+                # Uncapped so far: cap relative to what the backup has been doing
+                base_rate = self.base_rates[bucket] = bucket.observed_rate()
+            bucket.set_rate(base_rate * scale if base_rate is not None else None)
+
+    def check(self, metrics):
+        """
+        Adjusts the caps to one 'metrics' reply.
+        Returns:
+            bool: True if the server looked healthy.
+        """
+        fps, frame_time = metrics.get("serverfps"), metrics.get("serverframetime")
+        if not fps or not frame_time:
+            return True
+        if self.baseline is None:
+            self.baseline = (fps, frame_time)
+            return True
+        base_fps, base_frame_time = self.baseline
+        healthy = fps >= base_fps * (1 - THROTTLE_FPS_DROP) \
+            and frame_time <= base_frame_time * THROTTLE_FRAME_TIME_SPIKE
+        if not healthy:
+            self.backoffs += 1
+            self._apply_scale(max(THROTTLE_MIN_SCALE, self.scale / 2))
+            log_progress("backup", "throttled", f"Server at {fps} FPS ({frame_time} ms per frame), backup slowed "
+                         f"to {self.scale:.0%} of its bandwidth.", fps=fps, frame_time=frame_time, scale=self.scale)
+        elif self.scale < 1.0:
+            self._apply_scale(min(1.0, self.scale + 0.1))
+        return healthy
+
+    def _monitor(self):
+        while not self.stopped.wait(self.interval):
+            metrics = self.fetch_metrics()
+            # A missed poll leaves the caps as they are
+            if metrics is not None:
+                self.check(metrics)
+
+    def start(self):
+        """
+        Takes the baseline sample, before the backup adds any load, and starts polling.
+        """
+        if self.fetch_metrics and self.monitor is None:
+            metrics = self.fetch_metrics()
+            if metrics is None:
+                log_info("Server metrics unavailable, backup bandwidth will not adapt.")
+                return self
+            self.check(metrics)
+            self.monitor = threading.Thread(target=self._monitor, name="throttle-monitor", daemon=True)
+            self.monitor.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.monitor:
+            self.monitor.join(timeout=self.interval)
+        if self.backoffs:
+            log_info(f"Backup backed off {self.backoffs} times for server load.", count=self.backoffs)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def compress_online(input_folder, output_file, codec, level, fetch_metrics, min_free=0):
+    """
+    compression.compress_tree for a server that is running: at idle priority on THROTTLE_WORKERS
+    threads, within the THROTTLE_* bandwidth caps, backing off while 'fetch_metrics' shows the
+    server struggling.
+    Returns:
+        CompressionStats: See compress_tree, which also lists what it raises.
+    """
+    with Throttle(fetch_metrics=fetch_metrics) as limits:
+        return run_at_idle_priority(lambda: compression.compress_tree(
+            input_folder, output_file, codec, level, THROTTLE_WORKERS, min_free=min_free, throttle=limits))
@@ -0,0 +1,91 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from utility import backup_catalog, compression
+from utility.config import *
+from utility.logging_config import log_info, log_error, log_progress
+
+
+def select_for_tiering(backups, after_hours, codec, now=None):
+    """
+    Args:
+        backups (list): (datetime, path) tuples from the catalog.
+    Returns:
+        list: Paths older than 'after_hours' that are not yet stored with 'codec', oldest first.
+    """
+    cutoff = (now or datetime.now()) - timedelta(hours=after_hours)
+    return [path for created, path in backups
+            if created < cutoff and compression.codec_for_path(path) != codec]
+
+
+def tier_backup(conn, path, codec, level, workers):
+    """
+    Recompresses one archive: write the new copy under a hidden name, verify it, swap it in, then
+    delete the original. The original stays in place until the new copy is in the catalog.
+    Returns:
+        int: Bytes saved, None if the archive was not replaced.
+    """
+    old_codec = compression.codec_for_path(path)
+    stem = path[:-len(compression.CODEC_EXTENSIONS[old_codec])]
+    new_path = f"{stem}{compression.CODEC_EXTENSIONS[codec]}"
+    # Hidden name: not a backup as far as retention or a catalog rebuild are concerned
+    staging = os.path.join(os.path.dirname(path), f".{os.path.basename(new_path)}")
+    old_size = os.path.getsize(path)
+    try:
+        stats = compression.recompress_archive(path, staging, codec, level, workers, min_free=DISK_RESERVE_BYTES)
+    except (OSError, ValueError, EOFError) as e:
+        log_error(f"Could not recompress {path}: {e}")
+        return None
+    problems = compression.verify_backup(staging, stats.sha256)
+    if problems:
+        log_error(f"Recompressed copy of {path} failed verification: {'; '.join(problems)}")
+        for leftover in [staging, compression.manifest_path(staging)]:
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return None
+
+    if os.path.exists(compression.manifest_path(staging)):
+        os.replace(compression.manifest_path(staging), compression.manifest_path(new_path))
+    os.replace(staging, new_path)
+    if not backup_catalog.replace_backup(conn, path, new_path, stats.bytes_out, stats.sha256, codec):
+        # Retention removed the original while it was being recompressed
+        for leftover in [new_path, compression.manifest_path(new_path)]:
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return None
+    for old in [path, compression.manifest_path(path)]:
+        if os.path.exists(old):
+            os.remove(old)
+    log_progress("tier", "done", f"Recompressed {os.path.basename(path)} with {codec}:{stats.level}, "
+                 f"{old_size} -> {stats.bytes_out} bytes.", file=new_path, bytes=stats.bytes_out,
+                 duration=round(stats.seconds, 3))
+    return old_size - stats.bytes_out
+
+
+def tier_backups(backups_path, after_hours=TIER_AFTER_HOURS, codec=TIER_CODEC, level=TIER_LEVEL,
+                 workers=COMPRESSION_WORKERS):
+    """
+    Recompresses every catalogued archive older than 'after_hours' with the archival codec.
+      Recent backups keep their fast codec for quick restores.
+    Returns:
+        tuple: (archives recompressed, bytes saved)
+    """
+    if codec not in compression.available_codecs():
+        log_error(f"Tiering codec '{codec}' is not available.")
+        return 0, 0
+    start_time = time.monotonic()
+    conn = backup_catalog.open_catalog(backups_path)
+    try:
+        candidates = select_for_tiering(backup_catalog.list_backups(conn), after_hours, codec)
+        count, saved = 0, 0
+        for path in candidates:
+            result = tier_backup(conn, path, codec, level, workers)
+            if result is not None:
+                count += 1
+                saved += result
+    finally:
+        conn.close()
+    log_info(f"Tiering: {count} of {len(candidates)} archives recompressed, {saved} bytes saved in "
+             f"{time.monotonic() - start_time:.1f} seconds.", bytes=saved)
+    return count, saved